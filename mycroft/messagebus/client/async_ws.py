@@ -0,0 +1,343 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Messagebus client running on a Tornado IOLoop.
+
+Messages are read and dispatched on the loop itself, without the thread
+pool used by WebsocketClient, so services already running an IOLoop can
+share it with the bus. Handlers may be plain functions, which are called
+inline and must not block, or coroutines, either @gen.coroutine or native
+coroutine functions, which are scheduled on the loop. The client itself
+only uses @gen.coroutine, so it also runs on Python 3.4.
+"""
+from asyncio import iscoroutinefunction
+from collections import defaultdict
+from datetime import timedelta
+from uuid import uuid4
+
+from tornado import gen
+from tornado.concurrent import Future
+from tornado.ioloop import IOLoop
+from tornado.locks import Event
+from tornado.queues import Queue, QueueFull
+from tornado.websocket import websocket_connect
+
+from mycroft.configuration import Configuration
+from mycroft.messagebus.client.ws import WebsocketClient
+from mycroft.messagebus.codec import JsonCodec, get_codec
+from mycroft.messagebus.message import Message
+from mycroft.util import validate_param
+from mycroft.util.log import LOG
+
+
+def _is_coroutine(func):
+    return iscoroutinefunction(func) or gen.is_coroutine_function(func)
+
+
+class MessageIterator(object):
+    """Async iterator over the messages received by an AsyncWebsocketClient.
+
+    Created by AsyncWebsocketClient.messages(). Use `async for` or yield
+    next() from a coroutine. If the consumer falls more than maxsize
+    messages behind, new messages are dropped for it.
+    """
+
+    def __init__(self, client, types=None, maxsize=1000):
+        self.client = client
+        self.types = set(types) if types else None
+        self.queue = Queue(maxsize)
+
+    def put(self, message):
+        if self.types is None or message.type in self.types:
+            try:
+                self.queue.put_nowait(message)
+            except QueueFull:
+                LOG.warning('Message iterator full, dropping '
+                            '{}'.format(message.type))
+
+    def close(self):
+        """Stop receiving messages."""
+        if self in self.client.iterators:
+            self.client.iterators.remove(self)
+
+    def next(self):
+        """Get the next message.
+
+        Returns:
+            Future resolved with the next Message
+        """
+        return self.queue.get()
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        return self.next()
+
+
+class AsyncWebsocketClient(object):
+    def __init__(self, host=None, port=None, route=None, ssl=None,
+                 codec=None):
+        config = Configuration.get().get("websocket")
+        host = host or config.get("host")
+        port = port or config.get("port")
+        route = route or config.get("route")
+        ssl = ssl or config.get("ssl")
+        validate_param(host, "websocket.host")
+        validate_param(port, "websocket.port")
+        validate_param(route, "websocket.route")
+
+        self.url = WebsocketClient.build_url(host, port, route, ssl)
+        self.requested_codec = get_codec(codec or config.get("codec"))
+        if self.requested_codec is not JsonCodec:
+            self.url += "?codec=" + self.requested_codec.name
+        self.codec = JsonCodec
+
+        self.connection = None
+        self.connected_event = Event()
+        self.handlers = defaultdict(list)
+        self.iterators = []
+        self.subscriptions = set()
+        self.subscribed = False
+        self.pending_requests = {}
+        self.retry = 5
+        self.running = False
+
+    @gen.coroutine
+    def connect(self):
+        """Connect to the messagebus, retrying with backoff until it's up."""
+        while True:
+            try:
+                self.connection = yield websocket_connect(self.url)
+                break
+            except (IOError, OSError) as e:
+                LOG.warning('Could not connect to messagebus ({}), retrying '
+                            'in {} seconds'.format(repr(e), self.retry))
+                yield gen.sleep(self.retry)
+                self.retry = min(self.retry * 2, 60)
+
+        LOG.info("Connected")
+        self.retry = 5
+        self.codec = JsonCodec
+        self.connected_event.set()
+        if self.subscribed:
+            yield self._send_subscription('mycroft.bus.subscribe',
+                                          sorted(self.subscriptions),
+                                          none=not self.subscriptions)
+        self._dispatch(Message('open'))
+
+    @gen.coroutine
+    def run_forever(self):
+        """Read and dispatch messages until close() is called.
+
+        The connection is reestablished if it drops.
+        """
+        self.running = True
+        while self.running:
+            if not self.connection:
+                yield self.connect()
+            frame = yield self.connection.read_message()
+            if frame is None:
+                self.connected_event.clear()
+                self.connection = None
+                self._dispatch(Message('close'))
+                if self.running:
+                    self._dispatch(Message('reconnecting'))
+                continue
+            self.on_message(frame)
+
+    def start(self):
+        """Run the client in the background on the current IOLoop."""
+        IOLoop.current().spawn_callback(self.run_forever)
+
+    def on_message(self, frame):
+        codec = self.codec if isinstance(frame, bytes) else JsonCodec
+        try:
+            message = Message.deserialize(frame, codec, lazy=True)
+        except Exception as e:
+            LOG.error('Could not decode message: ' + repr(e))
+            return
+        if message.type == 'connected':
+            codec = get_codec((message.data or {}).get('codec'))
+            if codec is self.requested_codec:
+                self.codec = codec
+
+        if self.pending_requests:
+            self._resolve_requests(message)
+        for iterator in self.iterators:
+            iterator.put(message)
+        self._dispatch(message)
+
+    def _dispatch(self, message):
+        for handler in list(self.handlers.get(message.type, [])):
+            try:
+                if _is_coroutine(handler):
+                    IOLoop.current().spawn_callback(handler, message)
+                else:
+                    handler(message)
+            except Exception as e:
+                LOG.exception(e)
+
+    def _resolve_requests(self, message):
+        waiting = [(request_id, pending[1]) for request_id, pending
+                   in self.pending_requests.items()
+                   if pending[0] == message.type]
+        if not waiting:
+            return
+        correlation_id = (message.context or {}).get('correlation_id')
+        if correlation_id and all(request_id != correlation_id
+                                  for request_id, _ in waiting):
+            LOG.debug('No pending request for {} with correlation id '
+                      '{}'.format(message.type, correlation_id))
+            return
+        for request_id, future in waiting:
+            if correlation_id and correlation_id != request_id:
+                continue
+            if not future.done():
+                future.set_result(message)
+
+    @gen.coroutine
+    def emit(self, message):
+        """Send a message, waiting for the connection if it's down.
+
+        Args:
+            message (Message): message to send
+        """
+        yield self.connected_event.wait()
+        if self.codec.binary:
+            frame = message.serialize(self.codec)
+        else:
+            frame = message.serialize()
+        yield self.connection.write_message(frame, binary=self.codec.binary)
+
+    @gen.coroutine
+    def wait_for_response(self, message, reply_type=None, timeout=None):
+        """Send a message and wait for a response.
+
+        Replies are matched on the correlation id of the message context,
+        added unless the message already has one, falling back to the
+        message type like WebsocketClient.
+
+        Args:
+            message (Message): message to send
+            reply_type (str): the message type of the expected reply.
+                              Defaults to "<message.type>.response".
+            timeout: seconds to wait before timeout, defaults to 3
+        Returns:
+            The received message or None if the response timed out
+        """
+        context = message.context or {}
+        correlation_id = context.get('correlation_id')
+        if not correlation_id:
+            correlation_id = str(uuid4())
+            message.context = dict(context, correlation_id=correlation_id)
+        future = Future()
+        self.pending_requests[correlation_id] = (
+            reply_type or message.type + '.response', future)
+        try:
+            yield self.emit(message)
+            reply = yield gen.with_timeout(timedelta(seconds=timeout or 3.0),
+                                           future)
+            return reply
+        except gen.TimeoutError:
+            return None
+        finally:
+            self.pending_requests.pop(correlation_id, None)
+
+    def messages(self, types=None, maxsize=1000):
+        """Iterate over received messages with `async for` or next().
+
+        Args:
+            types (list): only yield these message types, default all
+            maxsize (int): messages to buffer for a slow consumer
+        Returns:
+            MessageIterator, call close() on it when done
+        """
+        iterator = MessageIterator(self, types, maxsize)
+        self.iterators.append(iterator)
+        return iterator
+
+    @gen.coroutine
+    def subscribe(self, types):
+        """Only receive messages of the given types from the service.
+
+        See WebsocketClient.subscribe()
+        """
+        if isinstance(types, str):
+            types = [types]
+        self.subscriptions.update(types)
+        self.subscribed = True
+        if self.connected_event.is_set():
+            yield self._send_subscription('mycroft.bus.subscribe',
+                                          list(types))
+
+    @gen.coroutine
+    def unsubscribe(self, types=None):
+        """Stop receiving the given message types.
+
+        See WebsocketClient.unsubscribe()
+        """
+        if isinstance(types, str):
+            types = [types]
+        if types:
+            self.subscriptions.difference_update(types)
+        else:
+            self.subscriptions.clear()
+            self.subscribed = False
+        if self.connected_event.is_set():
+            yield self._send_subscription('mycroft.bus.unsubscribe',
+                                          list(types or []),
+                                          none=self.subscribed and
+                                          not self.subscriptions)
+
+    @gen.coroutine
+    def _send_subscription(self, msg_type, types, **options):
+        data = dict(options, types=types)
+        yield self.connection.write_message(
+            Message(msg_type, data).serialize())
+
+    def on(self, event_name, func):
+        """Register a handler, either a function or a coroutine."""
+        self.handlers[event_name].append(func)
+
+    def once(self, event_name, func):
+        """Register a handler removed after its first call."""
+        if _is_coroutine(func):
+            @gen.coroutine
+            def wrapper(message):
+                self.remove(event_name, wrapper)
+                yield func(message)
+        else:
+            def wrapper(message):
+                self.remove(event_name, wrapper)
+                func(message)
+        self.on(event_name, wrapper)
+
+    def remove(self, event_name, func):
+        try:
+            self.handlers[event_name].remove(func)
+        except ValueError:
+            LOG.warning('Failed to remove event {}: {}'.format(event_name,
+                                                               str(func)))
+
+    def remove_all_listeners(self, event_name):
+        if event_name is None:
+            raise ValueError
+        self.handlers.pop(event_name, None)
+
+    def close(self):
+        self.running = False
+        if self.connection:
+            self.connection.close()
+        self.connected_event.clear()
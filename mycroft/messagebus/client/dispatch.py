@@ -0,0 +1,147 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Dispatch of received messages to handler threads.
+
+Messages are spread over lanes, each with its own worker threads, so that
+control messages like 'mycroft.stop' never queue behind slow skill
+handlers. Interactive messages like utterances, whose handlers may wait
+for other services, get a lane of their own so they neither queue behind
+regular messages nor occupy the threads of the control messages. Message
+types configured as ordered are handled one at a time in arrival order
+without blocking other types in the same lane.
+"""
+from collections import deque
+from queue import Queue
+from threading import Lock, Thread
+
+from mycroft.util.log import LOG
+
+
+class DispatchLane(object):
+    """Worker threads sharing one queue of handler calls.
+
+    Args:
+        name (str): name used in logs and queue depth reports
+        workers (int): number of handler calls run concurrently
+    """
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.queue = Queue()
+        # key -> calls waiting for the previous call with the same key
+        self.serial = {}
+        self.lock = Lock()
+        self.active = 0
+        self.threads = []
+        for i in range(max(workers, 1)):
+            t = Thread(target=self._run,
+                       name='bus-{}-{}'.format(name, i))
+            t.daemon = True
+            t.start()
+            self.threads.append(t)
+
+    def submit(self, func, args, key=None):
+        """Queue a call.
+
+        Args:
+            func: function to call
+            args (tuple): arguments for the function
+            key: calls sharing a key run one at a time in submission order
+        """
+        if key is not None:
+            with self.lock:
+                if key in self.serial:
+                    self.serial[key].append((func, args))
+                    return
+                self.serial[key] = deque()
+        self.queue.put((func, args, key))
+
+    def _run(self):
+        while True:
+            func, args, key = self.queue.get()
+            if func is None:
+                break
+            with self.lock:
+                self.active += 1
+            try:
+                func(*args)
+            except Exception as e:
+                LOG.exception(e)
+            finally:
+                with self.lock:
+                    self.active -= 1
+                    if key is not None:
+                        if self.serial[key]:
+                            # Requeue at the back so other keys get a turn
+                            call = self.serial[key].popleft()
+                            self.queue.put(call + (key,))
+                        else:
+                            del self.serial[key]
+
+    def depth(self):
+        """Number of calls waiting for a worker."""
+        with self.lock:
+            return (self.queue.qsize() +
+                    sum(len(d) for d in self.serial.values()))
+
+    def shutdown(self):
+        for _ in self.threads:
+            self.queue.put((None, None, None))
+
+
+class MessageDispatcher(object):
+    """Routes received messages to dispatch lanes.
+
+    Args:
+        config (dict): the "dispatch" section of the websocket config
+    """
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.priority_types = set(config.get('priority', []))
+        self.interactive_types = set(config.get('interactive', []))
+        self.ordered_types = set(config.get('ordered', []))
+        self.default = DispatchLane('default', config.get('workers', 10))
+        self.priority = DispatchLane('priority',
+                                     config.get('priority_workers', 2))
+        self.lanes = [self.default, self.priority]
+        self.interactive = None
+        if self.interactive_types:
+            self.interactive = DispatchLane(
+                'interactive', config.get('interactive_workers', 2))
+            self.lanes.append(self.interactive)
+
+    def dispatch(self, func, message):
+        """Call func(message.type, message) on the message's lane."""
+        if message.type in self.priority_types:
+            lane = self.priority
+        elif message.type in self.interactive_types:
+            lane = self.interactive
+        else:
+            lane = self.default
+        key = message.type if message.type in self.ordered_types else None
+        lane.submit(func, (message.type, message), key)
+
+    def queue_depth(self):
+        """Get the number of queued handler calls per lane.
+
+        Returns:
+            dict: lane name -> queued calls
+        """
+        return {lane.name: lane.depth() for lane in self.lanes}
+
+    def shutdown(self):
+        for lane in self.lanes:
+            lane.shutdown()
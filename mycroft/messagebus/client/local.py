@@ -0,0 +1,144 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""In-process messagebus transport.
+
+Services running in the same process can share an InProcessClient instead
+of each opening a websocket. Messages are handed directly to the handlers
+registered by any InProcessClient in the process, without serialization.
+Optionally a single websocket connection bridges the process to the
+messagebus service so external clients still see and reach it.
+"""
+from copy import deepcopy
+from threading import Event, Lock
+
+from pyee import EventEmitter
+
+from mycroft.configuration import Configuration
+from mycroft.messagebus.client.dispatch import MessageDispatcher
+from mycroft.messagebus.client.ws import WebsocketClient
+from mycroft.messagebus.message import Message
+
+
+class InProcessBus(object):
+    """State shared by all InProcessClients of the process."""
+    instance = None
+
+    def __init__(self):
+        config = Configuration.get().get("websocket")
+        self.emitter = EventEmitter()
+        self.dispatcher = MessageDispatcher(config.get("dispatch"))
+        self.pending_requests = {}
+        self.pending_lock = Lock()
+        self.bridge = None
+        self.bridge_lock = Lock()
+
+    @staticmethod
+    def get():
+        if not InProcessBus.instance:
+            InProcessBus.instance = InProcessBus()
+        return InProcessBus.instance
+
+    def get_bridge(self):
+        """Get the websocket bridge, creating it on first use."""
+        with self.bridge_lock:
+            if not self.bridge:
+                self.bridge = BridgeClient(self)
+            return self.bridge
+
+
+def _share_state(client, bus):
+    """Make a client use the process wide handlers and pending requests."""
+    client.emitter = bus.emitter
+    client.dispatcher = bus.dispatcher
+    client.pending_requests = bus.pending_requests
+    client.pending_lock = bus.pending_lock
+
+
+class BridgeClient(WebsocketClient):
+    """Websocket connection between the in-process bus and the service.
+
+    Messages from the service are dispatched to in-process handlers. The
+    service is asked not to echo messages sent through the bridge since
+    they were already delivered locally.
+    """
+
+    def __init__(self, bus):
+        super().__init__()
+        self.dispatcher.shutdown()
+        _share_state(self, bus)
+
+    def _restore_subscriptions(self):
+        # Before the buffered messages are flushed, they were delivered
+        # locally when they were emitted
+        self._send_subscription('mycroft.bus.subscribe', [], echo=False)
+        super()._restore_subscriptions()
+
+
+class InProcessClient(WebsocketClient):
+    """Messagebus client delivering messages within the process.
+
+    Has the same interface as WebsocketClient. All InProcessClients in a
+    process share their handlers, so a message emitted by one reaches the
+    handlers registered on any of them.
+
+    Args:
+        bridge (bool): also exchange messages with the messagebus service
+                       through a websocket shared by the process.
+    """
+
+    def __init__(self, bridge=True):
+        self.bus = InProcessBus.get()
+        _share_state(self, self.bus)
+        self.bridge = self.bus.get_bridge() if bridge else None
+        self.connected_event = Event()
+        self.connected_event.set()
+        self.started_running = False
+        self.subscriptions = set()
+        self.stopped = Event()
+
+    def emit(self, message, ttl=None):
+        # Receivers get their own copy like they would from the websocket,
+        # the sender is free to modify or reuse its message.
+        local = Message(message.type, deepcopy(message.data),
+                        deepcopy(message.context))
+        if self.emitter._events['message']:
+            self.emitter.emit('message', local.serialize())
+        if self.pending_requests:
+            self.resolve_requests(local)
+        self.dispatcher.dispatch(self.emitter.emit, local)
+        if self.bridge:
+            self.bridge.emit(message, ttl)
+
+    def subscribe(self, types):
+        """Subscriptions don't apply to in-process delivery."""
+        pass
+
+    def unsubscribe(self, types=None):
+        pass
+
+    def run_forever(self):
+        """Run the websocket bridge, or block until closed."""
+        self.started_running = True
+        if self.bridge:
+            if not self.bridge.started_running:
+                self.bridge.run_forever()
+            else:
+                self.stopped.wait()
+        else:
+            self.emitter.emit('open')
+            self.stopped.wait()
+
+    def close(self):
+        self.stopped.set()
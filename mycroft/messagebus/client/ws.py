@@ -14,22 +14,26 @@
 #
 import json
 import time
-from multiprocessing.pool import ThreadPool
-from threading import Event
+from collections import deque
+from concurrent.futures import CancelledError, Future, TimeoutError
+from threading import Event, Lock
 import traceback
+from uuid import uuid4
 
 from pyee import EventEmitter
-from websocket import (WebSocketApp, WebSocketConnectionClosedException,
-                       WebSocketException)
+from websocket import ABNF, WebSocketApp, WebSocketConnectionClosedException
 
 from mycroft.configuration import Configuration
+from mycroft.messagebus.client.dispatch import MessageDispatcher
+from mycroft.messagebus.codec import JsonCodec, get_codec
 from mycroft.messagebus.message import Message
 from mycroft.util import validate_param, create_echo_function
 from mycroft.util.log import LOG
 
 
 class WebsocketClient(object):
-    def __init__(self, host=None, port=None, route=None, ssl=None):
+    def __init__(self, host=None, port=None, route=None, ssl=None,
+                 codec=None):
 
         config = Configuration.get().get("websocket")
         host = host or config.get("host")
@@ -41,12 +45,31 @@ class WebsocketClient(object):
         validate_param(route, "websocket.route")
 
         self.url = WebsocketClient.build_url(host, port, route, ssl)
+        # Binary codec to ask the service for, json until it's accepted
+        self.requested_codec = get_codec(codec or config.get("codec"))
+        if self.requested_codec is not JsonCodec:
+            self.url += "?codec=" + self.requested_codec.name
+        self.codec = JsonCodec
         self.emitter = EventEmitter()
         self.client = self.create_client()
-        self.pool = ThreadPool(10)
+        self.dispatcher = MessageDispatcher(config.get("dispatch"))
         self.retry = 5
         self.connected_event = Event()
+        self.closed_event = Event()
         self.started_running = False
+        self.subscriptions = set()
+        # True from subscribe() until unsubscribe() without types, the
+        # subscriptions may be empty meaning no messages at all
+        self.subscribed = False
+        # Messages emitted while disconnected, (message, expiry time)
+        buffer_config = config.get("outbound_buffer", {})
+        self.outbound = deque()
+        self.outbound_size = buffer_config.get("size", 1000)
+        self.outbound_ttl = buffer_config.get("ttl", 10)
+        self.send_lock = Lock()
+        # Outstanding requests, correlation id -> (reply type, Future)
+        self.pending_requests = {}
+        self.pending_lock = Lock()
 
     @staticmethod
     def build_url(host, port, route, ssl):
@@ -60,16 +83,36 @@ class WebsocketClient(object):
 
     def on_open(self, ws):
         LOG.info("Connected")
-        self.connected_event.set()
+        # Codec is negotiated again for every connection
+        self.codec = JsonCodec
+        # Send what was emitted while disconnected before any new messages
+        with self.send_lock:
+            self._restore_subscriptions()
+            if self._flush():
+                self.connected_event.set()
         self.emitter.emit("open")
         # Restore reconnect timer to 5 seconds on sucessful connect
         self.retry = 5
 
+    def _restore_subscriptions(self):
+        """Send the subscriptions to the service after (re)connecting.
+
+        The service forgets them when the connection drops. Called before
+        the buffered messages are flushed, so these are already routed
+        according to the subscription.
+        """
+        if self.subscribed:
+            self._send_subscription('mycroft.bus.subscribe',
+                                    sorted(self.subscriptions),
+                                    none=not self.subscriptions)
+
     def on_close(self, ws):
+        self.connected_event.clear()
         self.emitter.emit("close")
 
     def on_error(self, ws, error):
-        """ On error start trying to reconnect to the websocket. """
+        """ On error close the connection, run_forever() reconnects. """
+        self.connected_event.clear()
         if isinstance(error, WebSocketConnectionClosedException):
             LOG.warning('Could not send message because connection has closed')
         else:
@@ -82,37 +125,179 @@ class WebsocketClient(object):
         except Exception as e:
             LOG.error('Exception closing websocket: ' + repr(e))
 
-        LOG.warning("WS Client will reconnect in %d seconds." % self.retry)
-        time.sleep(self.retry)
-        self.retry = min(self.retry * 2, 60)
+    def on_message(self, ws, message):
         try:
-            self.emitter.emit('reconnecting')
-            self.client = self.create_client()
-            self.run_forever()
-        except WebSocketException:
-            pass
+            if isinstance(message, bytes):
+                parsed_message = Message.deserialize(message, self.codec)
+                # 'message' listeners expect a json string
+                if self.emitter._events.get('message'):
+                    self.emitter.emit('message', parsed_message.serialize())
+            else:
+                self.emitter.emit('message', message)
+                # Payload is decoded by the first handler reading it
+                parsed_message = Message.deserialize(message, lazy=True)
+                if parsed_message.type == 'connected':
+                    self.handle_connected(parsed_message)
+        except ValueError as e:
+            LOG.error('Could not decode message: ' + repr(e))
+            return
+        if self.pending_requests:
+            self.resolve_requests(parsed_message)
+        # Nothing to do for types without handlers
+        if self.emitter._events.get(parsed_message.type):
+            self.dispatcher.dispatch(self.emitter.emit, parsed_message)
+
+    def handle_connected(self, message):
+        """Switch to the codec accepted by the service.
+
+        Older services don't report a codec and keep talking json.
+        """
+        codec = get_codec((message.data or {}).get('codec'))
+        if codec is self.requested_codec:
+            self.codec = codec
 
-    def on_message(self, ws, message):
-        self.emitter.emit('message', message)
-        parsed_message = Message.deserialize(message)
-        self.pool.apply_async(
-            self.emitter.emit, (parsed_message.type, parsed_message))
-
-    def emit(self, message):
-        if not self.connected_event.wait(10):
-            if not self.started_running:
-                raise ValueError('You must execute run_forever() '
-                                 'before emitting messages')
-            self.connected_event.wait()
+    def emit(self, message, ttl=None):
+        """Send a message without waiting for the connection.
 
+        While disconnected messages are buffered and sent in order when
+        the connection is (re)established. Buffered messages older than
+        their ttl are dropped, as is the oldest message when the buffer is
+        full.
+
+        Args:
+            message (Message): message to send
+            ttl (float): seconds to keep the message while disconnected,
+                         defaults to websocket.outbound_buffer.ttl
+        """
+        with self.send_lock:
+            if self.connected_event.is_set() and not self.outbound:
+                if self._send(message):
+                    return
+            if len(self.outbound) >= self.outbound_size:
+                dropped = self.outbound.popleft()[0]
+                LOG.warning('Outbound buffer full, dropping {} '
+                            'message'.format(getattr(dropped, 'type', '')))
+            if ttl is None:
+                ttl = self.outbound_ttl
+            expires = time.monotonic() + ttl
+            self.outbound.append((message, expires))
+
+    def _send(self, message):
+        """Write a message to the websocket.
+
+        Returns:
+            bool: False if the connection was closed
+        """
         try:
-            if hasattr(message, 'serialize'):
+            if hasattr(message, 'serialize') and self.codec.binary:
+                self.client.send(message.serialize(self.codec),
+                                 ABNF.OPCODE_BINARY)
+            elif hasattr(message, 'serialize'):
                 self.client.send(message.serialize())
             else:
                 self.client.send(json.dumps(message.__dict__))
         except WebSocketConnectionClosedException:
-            LOG.warning('Could not send {} message because connection '
-                        'has been closed'.format(message.type))
+            self.connected_event.clear()
+            return False
+        return True
+
+    def _flush(self):
+        """Send buffered messages that haven't expired, oldest first.
+
+        Must be called holding send_lock.
+
+        Returns:
+            bool: True if the buffer was emptied
+        """
+        now = time.monotonic()
+        expired = []
+        try:
+            while self.outbound:
+                message, expires = self.outbound[0]
+                if expires < now:
+                    expired.append(getattr(message, 'type', ''))
+                elif not self._send(message):
+                    return False
+                self.outbound.popleft()
+            return True
+        finally:
+            if expired:
+                LOG.warning('Dropped {} expired outbound messages: {}'.format(
+                    len(expired), ', '.join(sorted(set(expired)))))
+
+    def request(self, message, reply_type=None):
+        """Send a message and return a Future for the reply.
+
+        A correlation id is added to the message context unless it already
+        has one, e.g. when passing on a request of another client. Replies
+        created with Message.reply()/response() carry it back and only
+        resolve the request they belong to. Replies without a correlation
+        id (e.g. built from scratch by older code) resolve every pending
+        request waiting for that message type.
+
+        Cancelling the Future drops the pending request.
+
+        Args:
+            message (Message): message to send
+            reply_type (str): the message type of the expected reply.
+                              Defaults to "<message.type>.response". A
+                              tuple of types if the reply can be one of
+                              several, e.g. a response or an error.
+        Returns:
+            concurrent.futures.Future resolving to the reply Message
+        """
+        context = message.context or {}
+        correlation_id = context.get('correlation_id')
+        if not correlation_id:
+            correlation_id = str(uuid4())
+            message.context = dict(context, correlation_id=correlation_id)
+        reply_types = reply_type or message.type + '.response'
+        if isinstance(reply_types, str):
+            reply_types = (reply_types,)
+        future = Future()
+        with self.pending_lock:
+            self.pending_requests[correlation_id] = (tuple(reply_types),
+                                                     future)
+        future.add_done_callback(
+            lambda f: self._drop_request(correlation_id))
+        self.emit(message)
+        return future
+
+    def _drop_request(self, correlation_id):
+        with self.pending_lock:
+            self.pending_requests.pop(correlation_id, None)
+
+    def resolve_requests(self, message):
+        """Complete the pending requests answered by a received message.
+
+        Called from the receive thread before normal handler dispatch.
+
+        Args:
+            message (Message): received message
+        """
+        waiting = []
+        with self.pending_lock:
+            for request_id, pending in self.pending_requests.items():
+                if message.type in pending[0]:
+                    waiting.append((request_id, pending[1]))
+        if not waiting:
+            return
+        # Only replies to requests get their context decoded
+        correlation_id = (message.context or {}).get('correlation_id')
+        if correlation_id and all(request_id != correlation_id
+                                  for request_id, _ in waiting):
+            LOG.debug('No pending request for {} with correlation id '
+                      '{}'.format(message.type, correlation_id))
+            return
+        for request_id, future in waiting:
+            if correlation_id and correlation_id != request_id:
+                continue
+            if not future.done():
+                try:
+                    future.set_result(message)
+                except Exception:
+                    # Cancelled or resolved by another thread meanwhile
+                    pass
 
     def wait_for_response(self, message, reply_type=None, timeout=None):
         """Send a message and wait for a response.
@@ -125,31 +310,61 @@ class WebsocketClient(object):
         Returns:
             The received message or None if the response timed out
         """
-        response = []
+        future = self.request(message, reply_type)
+        try:
+            return future.result(timeout or 3.0)
+        except (TimeoutError, CancelledError):
+            future.cancel()
+            return None
 
-        def handler(message):
-            """Receive response data."""
-            response.append(message)
+    def subscribe(self, types):
+        """Only receive messages of the given types from the service.
 
-        # Setup response handler
-        self.once(reply_type or message.type + '.response', handler)
-        # Send request
-        self.emit(message)
-        # Wait for response
-        start_time = time.monotonic()
-        while len(response) == 0:
-            time.sleep(0.2)
-            if time.monotonic() - start_time > (timeout or 3.0):
-                try:
-                    self.remove(reply_type, handler)
-                except (ValueError, KeyError):
-                    # ValueError occurs on pyee 1.0.1 removing handlers
-                    # registered with once.
-                    # KeyError may theoretically occur if the event occurs as
-                    # the handler is removed
-                    pass
-                return None
-        return response[0]
+        Until the first call the service routes every message to this
+        client. Types ending with '*' match on prefix, e.g. 'enclosure.*'.
+        Subscriptions are restored automatically after a reconnect.
+
+        Args:
+            types (list): message types or prefix patterns to receive
+        """
+        if isinstance(types, str):
+            types = [types]
+        self.subscriptions.update(types)
+        self.subscribed = True
+        if self.connected_event.is_set():
+            self._send_subscription('mycroft.bus.subscribe', list(types))
+
+    def unsubscribe(self, types=None):
+        """Stop receiving the given message types.
+
+        Dropping the last subscribed type leaves the client subscribed to
+        nothing, it doesn't receive all messages again.
+
+        Args:
+            types (list): message types or patterns to drop, if omitted
+                          the subscription is cleared and the client
+                          receives all messages again.
+        """
+        if isinstance(types, str):
+            types = [types]
+        if types:
+            self.subscriptions.difference_update(types)
+        else:
+            self.subscriptions.clear()
+            self.subscribed = False
+        if self.connected_event.is_set():
+            self._send_subscription('mycroft.bus.unsubscribe',
+                                    list(types or []),
+                                    none=self.subscribed and
+                                    not self.subscriptions)
+
+    def _send_subscription(self, msg_type, types, **options):
+        data = dict(options, types=types)
+        try:
+            self.client.send(Message(msg_type, data).serialize())
+        except WebSocketConnectionClosedException:
+            LOG.warning('Could not update subscription, connection '
+                        'has been closed')
 
     def on(self, event_name, func):
         self.emitter.on(event_name, func)
@@ -196,10 +411,28 @@ class WebsocketClient(object):
         self.emitter.remove_all_listeners(event_name)
 
     def run_forever(self):
+        """Run the connection, reconnecting with backoff until closed."""
         self.started_running = True
-        self.client.run_forever()
+        while not self.closed_event.is_set():
+            try:
+                self.client.run_forever()
+            except Exception as e:
+                # Keep reconnecting whatever went wrong with this connection
+                LOG.exception('Websocket error: ' + repr(e))
+            self.connected_event.clear()
+            if self.closed_event.is_set():
+                break
+
+            LOG.warning("WS Client will reconnect in %d seconds." %
+                        self.retry)
+            if self.closed_event.wait(self.retry):
+                break
+            self.retry = min(self.retry * 2, 60)
+            self.emitter.emit('reconnecting')
+            self.client = self.create_client()
 
     def close(self):
+        self.closed_event.set()
         self.client.close()
         self.connected_event.clear()
 
@@ -0,0 +1,110 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Wire formats for messagebus frames.
+
+JSON is always available and is what every connection starts with. Compact
+binary codecs are used when both ends support them, the client asks for one
+in the connection url ('?codec=msgpack') and the service confirms it in the
+data of the initial 'connected' message.
+"""
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+
+class JsonCodec(object):
+    """Default text codec, understood by every client."""
+    name = 'json'
+    binary = False
+
+    @staticmethod
+    def dumps(obj):
+        return json.dumps(obj)
+
+    @staticmethod
+    def loads(value):
+        return json.loads(value)
+
+
+class MsgpackCodec(object):
+    """MessagePack codec, requires the msgpack package."""
+    name = 'msgpack'
+    binary = True
+
+    @staticmethod
+    def dumps(obj):
+        return msgpack.packb(obj, use_bin_type=True)
+
+    @staticmethod
+    def loads(value):
+        return msgpack.unpackb(value, raw=False)
+
+
+class CborCodec(object):
+    """CBOR codec, requires the cbor2 package."""
+    name = 'cbor'
+    binary = True
+
+    @staticmethod
+    def dumps(obj):
+        return cbor2.dumps(obj)
+
+    @staticmethod
+    def loads(value):
+        return cbor2.loads(value)
+
+
+DEFAULT_CODEC = JsonCodec
+
+_codecs = {JsonCodec.name: JsonCodec}
+if msgpack:
+    _codecs[MsgpackCodec.name] = MsgpackCodec
+if cbor2:
+    _codecs[CborCodec.name] = CborCodec
+
+
+def register_codec(codec):
+    """Make a codec available for negotiation.
+
+    Args:
+        codec: object with name, binary, dumps(obj) and loads(value)
+    """
+    _codecs[codec.name] = codec
+
+
+def get_codec(name):
+    """Get a codec by name.
+
+    Args:
+        name (str): codec name, e.g. 'json' or 'msgpack'
+
+    Returns:
+        The codec, or the JSON codec if the name is unknown or the backing
+        package isn't installed.
+    """
+    return _codecs.get(name or DEFAULT_CODEC.name, DEFAULT_CODEC)
+
+
+def available_codecs():
+    """List the names of the codecs usable in this process."""
+    return list(_codecs)
@@ -14,8 +14,33 @@
 #
 import json
 import re
+from json.decoder import scanstring
+from threading import Lock
 from mycroft.util.parse import normalize
 
+# Start of every frame produced by Message.serialize() with json
+_TYPE_PREFIX = '{"type": "'
+
+
+def peek_type(value):
+    """Get the message type from a json frame without decoding it.
+
+    Only frames starting with the type, as written by Message.serialize(),
+    can be peeked.
+
+    Args:
+        value (str): json string received from the websocket
+
+    Returns:
+        str: the message type or None if it couldn't be found cheaply
+    """
+    if isinstance(value, str) and value.startswith(_TYPE_PREFIX):
+        try:
+            return scanstring(value, len(_TYPE_PREFIX))[0]
+        except ValueError:
+            pass
+    return None
+
 
 class Message(object):
     """Holds and manipulates data sent over the websocket
@@ -41,23 +66,31 @@ class Message(object):
         self.data = data
         self.context = context
 
-    def serialize(self):
+    def serialize(self, codec=None):
         """This returns a string of the message info.
 
         This makes it easy to send over a websocket. This uses
         json dumps to generate the string with type, data and context
 
+        Args:
+            codec: codec from mycroft.messagebus.codec to encode with,
+                   defaults to json.
+
         Returns:
-            str: a json string representation of the message.
+            str: a json string representation of the message, or bytes
+                 if a binary codec was requested.
         """
-        return json.dumps({
+        obj = {
             'type': self.type,
             'data': self.data,
             'context': self.context
-        })
+        }
+        if codec:
+            return codec.dumps(obj)
+        return json.dumps(obj)
 
     @staticmethod
-    def deserialize(value):
+    def deserialize(value, codec=None, lazy=False):
         """This takes a string and constructs a message object.
 
         This makes it easy to take strings from the websocket and create
@@ -66,13 +99,21 @@ class Message(object):
 
         Args:
             value(str): This is the json string received from the websocket
+            codec: codec from mycroft.messagebus.codec that encoded the
+                   value, defaults to json.
+            lazy (bool): if possible only read the type now and decode
+                         data and context when first accessed.
 
         Returns:
             Message: message object constructed from the json string passed
             int the function.
             value(str): This is the string received from the websocket
         """
-        obj = json.loads(value)
+        if lazy and not (codec and codec.binary):
+            msg_type = peek_type(value)
+            if msg_type is not None:
+                return LazyMessage(value, msg_type)
+        obj = codec.loads(value) if codec else json.loads(value)
         return Message(obj.get('type'), obj.get('data'), obj.get('context'))
 
     def reply(self, type, data=None, context=None):
@@ -164,3 +205,64 @@ class Message(object):
                 # Substitute only whole words matching the token
                 utt = re.sub(r'\b' + token.get("key", "") + r"\b", "", utt)
         return normalize(utt)
+
+
+class LazyMessage(Message):
+    """Message decoded from json on first access of data or context.
+
+    Keeps the received frame so a message that is only routed or forwarded
+    is never decoded, and can be serialized again by returning the frame
+    as long as it wasn't modified.
+
+    Attributes:
+        type (str): type of data sent within the message.
+    """
+
+    def __init__(self, frame, type):
+        self._frame = frame
+        self._frame_type = type
+        self._decoded = False
+        self._data = None
+        self._context = None
+        self.type = type
+
+    # Handlers on different threads may access the message at once
+    _decode_lock = Lock()
+
+    def _decode(self):
+        if self._decoded:
+            return
+        with self._decode_lock:
+            if not self._decoded:
+                obj = json.loads(self._frame)
+                self._data = obj.get('data') or {}
+                self._context = obj.get('context')
+                self._decoded = True
+                self._frame = None
+
+    @property
+    def data(self):
+        self._decode()
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._decode()
+        self._data = value
+
+    @property
+    def context(self):
+        self._decode()
+        return self._context
+
+    @context.setter
+    def context(self, value):
+        self._decode()
+        self._context = value
+
+    def serialize(self, codec=None):
+        frame = self._frame
+        if (frame is not None and not codec and
+                self.type == self._frame_type):
+            return frame
+        return super().serialize(codec)
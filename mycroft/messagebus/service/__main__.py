@@ -25,6 +25,19 @@ settings = {
 }
 
 
+def create_app(route, **overrides):
+    """ Create the Tornado application serving the messagebus.
+
+    Args:
+        route (str): websocket route, e.g. '/core'
+        overrides: Tornado application settings replacing the defaults
+    """
+    routes = [
+        (route, WebsocketEventHandler)
+    ]
+    return web.Application(routes, **dict(settings, **overrides))
+
+
 def main():
     import tornado.options
     reset_sigint_handler()
@@ -46,10 +59,7 @@ def main():
     validate_param(port, "websocket.port")
     validate_param(route, "websocket.route")
 
-    routes = [
-        (route, WebsocketEventHandler)
-    ]
-    application = web.Application(routes, **settings)
+    application = create_app(route)
     application.listen(port, host)
     create_daemon(ioloop.IOLoop.instance().start)
 
@@ -15,10 +15,14 @@
 import json
 import sys
 import traceback
+from collections import deque
 
 import tornado.websocket
 from pyee import EventEmitter
+from tornado.ioloop import IOLoop
 
+from mycroft.configuration import Configuration
+from mycroft.messagebus.codec import JsonCodec, get_codec
 from mycroft.messagebus.message import Message
 from mycroft.util.log import LOG
 
@@ -27,46 +31,272 @@ EventBusEmitter = EventEmitter()
 
 client_connections = []
 
+# Slow consumer counters for the whole service
+bus_stats = {'dropped': 0, 'disconnected': 0}
+
+SUBSCRIBE = 'mycroft.bus.subscribe'
+UNSUBSCRIBE = 'mycroft.bus.unsubscribe'
+STATS = 'mycroft.bus.stats'
+
+DROP_OLDEST = 'drop_oldest'
+DROP_TYPE = 'drop_type'
+DISCONNECT = 'disconnect'
+
+
+class Subscription(object):
+    """ Set of message types a connection wants delivered.
+
+    Entries ending in '*' are treated as prefix patterns, for example
+    'enclosure.*' matches every message type starting with 'enclosure.'.
+    Until types are added, or after clear(), the subscription matches
+    everything so clients that never subscribe keep receiving all
+    messages. Removing the last type leaves an active subscription that
+    matches nothing.
+    """
+
+    def __init__(self):
+        self.types = set()
+        self.prefixes = ()
+        self.active = False
+
+    def add(self, types):
+        if types:
+            self.active = True
+        for t in types:
+            if t.endswith('*'):
+                if t[:-1] not in self.prefixes:
+                    self.prefixes += (t[:-1],)
+            else:
+                self.types.add(t)
+
+    def remove(self, types):
+        for t in types:
+            if t.endswith('*'):
+                self.prefixes = tuple(p for p in self.prefixes
+                                      if p != t[:-1])
+            else:
+                self.types.discard(t)
+
+    def clear(self):
+        self.types = set()
+        self.prefixes = ()
+        self.active = False
+
+    def __bool__(self):
+        return self.active
+
+    def matches(self, msg_type):
+        """ Check if a message type should be delivered.
+
+        Args:
+            msg_type (str): type of the message to route
+
+        Returns:
+            bool: True if the message should be sent to the connection
+        """
+        if not self.active:
+            return True
+        return msg_type in self.types or msg_type.startswith(self.prefixes)
+
 
 class WebsocketEventHandler(tornado.websocket.WebSocketHandler):
     def __init__(self, application, request, **kwargs):
         tornado.websocket.WebSocketHandler.__init__(
             self, application, request, **kwargs)
         self.emitter = EventBusEmitter
+        self.subscription = Subscription()
+        # Send messages back to the connection they came from
+        self.echo = True
+        self.codec = JsonCodec
+
+        # Frames waiting for the previous write to be flushed
+        config = Configuration.get().get('websocket', {})
+        queue_config = config.get('send_queue', {})
+        self.send_queue = deque()
+        self.send_queue_size = queue_config.get('size', 1000)
+        self.send_policy = queue_config.get('policy', DROP_OLDEST)
+        self.drop_types = set(queue_config.get('drop_types', []))
+        self.write_pending = False
+        self.stats = {'sent': 0, 'dropped': 0, 'max_queued': 0}
 
     def on(self, event_name, handler):
         self.emitter.on(event_name, handler)
 
     def on_message(self, message):
         # LOG.debug(message)
+        # Text frames are always json, binary frames use the codec
+        # negotiated for this connection.
+        codec = self.codec if isinstance(message, bytes) else JsonCodec
         try:
-            deserialized_message = Message.deserialize(message)
+            # Frames are fully decoded here, so invalid json is rejected
+            # and clients can trust the frames they receive. The received
+            # frame is still forwarded as is to connections using its codec.
+            deserialized_message = Message.deserialize(message, codec)
         except:
             return
 
+        msg_type = deserialized_message.type
+        if msg_type in (SUBSCRIBE, UNSUBSCRIBE):
+            self.handle_subscription(deserialized_message)
+            return
+        elif msg_type == STATS:
+            self.handle_stats(deserialized_message)
+            return
+
         try:
-            self.emitter.emit(deserialized_message.type, deserialized_message)
+            self.emitter.emit(msg_type, deserialized_message)
         except Exception as e:
             LOG.exception(e)
             traceback.print_exc(file=sys.stdout)
             pass
 
+        # Encode at most once per codec in use, reusing the received frame
+        frames = {codec.name: message}
+        for client in client_connections:
+            if client is self and not self.echo:
+                continue
+            if client.subscription.matches(msg_type):
+                client_codec = client.codec
+                if client_codec.name not in frames:
+                    frames[client_codec.name] = \
+                        deserialized_message.serialize(client_codec)
+                client.send(frames[client_codec.name], client_codec.binary,
+                            msg_type)
+
+    def send(self, frame, binary, msg_type):
+        """ Write a frame, queueing it while an earlier write is pending.
+
+        Tornado buffers writes without limit, so only one write is handed
+        to it until flushed and the rest wait in a bounded queue. When the
+        queue is full the configured slow consumer policy applies.
+
+        Args:
+            frame (str/bytes): encoded message
+            binary (bool): True if frame should be sent as a binary frame
+            msg_type (str): type of the message, used for drop_type policy
+        """
+        if not self.write_pending:
+            self._write(frame, binary)
+            return
+
+        if len(self.send_queue) >= self.send_queue_size:
+            if not self._make_room(msg_type):
+                return
+        self.send_queue.append((frame, binary, msg_type))
+        self.stats['max_queued'] = max(self.stats['max_queued'],
+                                       len(self.send_queue))
+
+    def _make_room(self, msg_type):
+        """ Apply the slow consumer policy to a full queue.
+
+        Returns:
+            bool: True if the new message should be queued
+        """
+        if self.send_policy == DISCONNECT:
+            LOG.warning('Closing connection to slow bus client '
+                        '{}'.format(self.request.remote_ip))
+            bus_stats['disconnected'] += 1
+            self.send_queue.clear()
+            self.close()
+            return False
+
+        self.stats['dropped'] += 1
+        bus_stats['dropped'] += 1
+        if self.send_policy == DROP_TYPE:
+            if msg_type in self.drop_types:
+                return False
+            for i, queued in enumerate(self.send_queue):
+                if queued[2] in self.drop_types:
+                    del self.send_queue[i]
+                    return True
+        # Drop oldest, also used when no droppable type is queued
+        self.send_queue.popleft()
+        return True
+
+    def _write(self, frame, binary):
+        try:
+            future = self.write_message(frame, binary=binary)
+        except tornado.websocket.WebSocketClosedError:
+            return
+        self.stats['sent'] += 1
+        if future is not None and not future.done():
+            self.write_pending = True
+            IOLoop.current().add_future(future, self._on_written)
+
+    def _on_written(self, future):
+        self.write_pending = False
+        while self.send_queue and not self.write_pending:
+            frame, binary, _ = self.send_queue.popleft()
+            self._write(frame, binary)
+
+    def handle_subscription(self, message):
+        """ Update the message types routed to this connection.
+
+        Subscription messages are consumed by the service and never
+        forwarded to other clients.
+
+        Args:
+            message (Message): subscribe/unsubscribe message, data should
+                               contain a list of message types in 'types'.
+                               Unsubscribing without types clears the
+                               subscription. A 'none' value of True
+                               keeps the subscription active without
+                               types, so no messages are routed to the
+                               connection. An 'echo' value of False
+                               stops the connection's own messages from
+                               being sent back to it.
+        """
+        data = message.data or {}
+        if 'echo' in data:
+            self.echo = bool(data['echo'])
+        types = data.get('types')
+        if isinstance(types, str):
+            types = [types]
+        if message.type == SUBSCRIBE:
+            self.subscription.add(types or [])
+        elif types:
+            self.subscription.remove(types)
+        else:
+            self.subscription.clear()
+        if data.get('none'):
+            self.subscription.active = True
+
+    def handle_stats(self, message):
+        """ Reply with the send queue counters of all connections.
+
+        Args:
+            message (Message): stats request, the reply is a response
+                               message sent only to the requester.
+        """
+        connections = []
         for client in client_connections:
-            client.write_message(message)
+            stats = dict(client.stats)
+            stats['queued'] = len(client.send_queue)
+            stats['remote'] = client.request.remote_ip
+            stats['subscribed'] = bool(client.subscription)
+            connections.append(stats)
+        data = dict(bus_stats, connections=connections)
+        self.emit(message.response(data))
 
     def open(self):
-        self.write_message(Message("connected").serialize())
+        self.codec = get_codec(self.get_argument('codec', None))
+        # The greeting is always json, it tells the client which codec
+        # was accepted for the rest of the connection.
+        self.write_message(Message("connected",
+                                   {'codec': self.codec.name}).serialize())
         client_connections.append(self)
 
     def on_close(self):
         client_connections.remove(self)
+        self.send_queue.clear()
 
     def emit(self, channel_message):
         if (hasattr(channel_message, 'serialize') and
                 callable(getattr(channel_message, 'serialize'))):
-            self.write_message(channel_message.serialize())
+            self.send(channel_message.serialize(self.codec),
+                      self.codec.binary, channel_message.type)
         else:
-            self.write_message(json.dumps(channel_message))
+            self.send(json.dumps(channel_message), False, None)
 
     def check_origin(self, origin):
         return True
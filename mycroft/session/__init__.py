@@ -50,6 +50,19 @@ class Session(object):
         return "{%s,%d}" % (str(self.session_id), self.touch_time)
 
 
+def get_session_id(message):
+    """
+    Get the id of the session a message belongs to, set by endpoints serving
+    several sessions from one skills process.
+
+    :param message: message with the 'session' in its context
+    :return: the session id or None for messages without one
+    """
+    if message.context:
+        return message.context.get('session')
+    return None
+
+
 class SessionManager(object):
     """
     Keeps track of the current active session
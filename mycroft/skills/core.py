@@ -21,6 +21,7 @@ import csv
 import inspect
 import os
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from inspect import signature
 from datetime import datetime, timedelta
 
@@ -39,6 +40,8 @@ from mycroft.dialog import DialogLoader
 from mycroft.filesystem import FileSystemAccess
 from mycroft.messagebus.message import Message
 from mycroft.metrics import report_metric, report_timing, Stopwatch
+from mycroft.skills.handler_stats import handler_stats
+from mycroft.skills.handler_watchdog import handler_watchdog
 from mycroft.skills.settings import SkillSettings
 from mycroft.skills.skill_data import (load_vocabulary, load_regex, to_alnum,
                                        munge_regex, munge_intent_parser)
@@ -70,6 +73,25 @@ def dig_for_message():
             return l['message']
 
 
+def create_reply(msg_type, data):
+    """ Create a message as reply to the message being handled, if any.
+
+    The reply keeps the context of the handled message, including the
+    session, so the intent service applies it to the right session.
+
+    Args:
+        msg_type (str): type of the message
+        data (dict): data of the message
+
+    Returns:
+        Message: the new message
+    """
+    message = dig_for_message()
+    if message:
+        return message.reply(msg_type, data)
+    return Message(msg_type, data)
+
+
 def unmunge_message(message, skill_id):
     """ Restore message keywords by removing the Letterified skill ID.
 
@@ -339,6 +361,14 @@ class MycroftSkill(object):
 
         self.gui = SkillGUI(self)
 
+        # Handlers run on threads of their own, a slow skill doesn't block
+        # the messagebus client or other skills
+        handler_config = Configuration.get().get('skills', {})
+        self.handler_executor = ThreadPoolExecutor(
+            max_workers=max(1, handler_config.get('handler_workers', 2)))
+        #: Seconds after which a running handler is reported as slow
+        self.handler_timeout = handler_config.get('handler_timeout', 30)
+
         self._bus = None
         self._enclosure = None
         self.bind(bus)
@@ -423,15 +453,16 @@ class MycroftSkill(object):
         if bus:
             self._bus = bus
             self._enclosure = EnclosureAPI(bus, self.name)
-            self.add_event('mycroft.stop', self.__handle_stop)
-            self.add_event('mycroft.skill.enable_intent',
-                           self.handle_enable_intent)
-            self.add_event('mycroft.skill.disable_intent',
-                           self.handle_disable_intent)
-            self.add_event("mycroft.skill.set_cross_context",
-                           self.handle_set_cross_context)
-            self.add_event("mycroft.skill.remove_cross_context",
-                           self.handle_remove_cross_context)
+            # Handled right away, even if all handler threads are busy
+            self._add_event('mycroft.stop', self.__handle_stop, queued=False)
+            self._add_event('mycroft.skill.enable_intent',
+                            self.handle_enable_intent, queued=False)
+            self._add_event('mycroft.skill.disable_intent',
+                            self.handle_disable_intent, queued=False)
+            self._add_event("mycroft.skill.set_cross_context",
+                            self.handle_set_cross_context, queued=False)
+            self._add_event("mycroft.skill.remove_cross_context",
+                            self.handle_remove_cross_context, queued=False)
             name = 'mycroft.skills.settings.update'
             func = self.settings.run_poll
             bus.on(name, func)
@@ -666,8 +697,8 @@ class MycroftSkill(object):
         This enables converse method to be called even without skill being
         used in last 5 minutes.
         """
-        self.bus.emit(Message('active_skill_request',
-                              {"skill_id": self.skill_id}))
+        self.bus.emit(create_reply('active_skill_request',
+                                   {"skill_id": self.skill_id}))
 
     def _register_decorated(self):
         """ Register all intent handlers that are decorated with an intent.
@@ -833,6 +864,9 @@ class MycroftSkill(object):
     def add_event(self, name, handler, handler_info=None, once=False):
         """ Create event handler for executing intent
 
+        The handler runs on the skill's handler_executor. If it runs longer
+        than handler_timeout seconds mycroft.skill.handler.timeout is sent.
+
         Args:
             name (string): IntentParser name
             handler (func): Method to call
@@ -841,10 +875,35 @@ class MycroftSkill(object):
             once (bool, optional): Event handler will be removed after it has
                                    been run once.
         """
+        self._add_event(name, handler, handler_info, once)
+
+    def _add_event(self, name, handler, handler_info=None, once=False,
+                   queued=True):
+        """ Create event handler, see add_event.
+
+        Args:
+            queued (bool): run the handler on the handler_executor instead of
+                           the thread delivering the message
+        """
+
+        def on_timeout(message, handler_name):
+            LOG.warning('{} is still running after {} seconds'.format(
+                handler_name, self.handler_timeout))
+            handler_stats.record_timeout(self.skill_id, handler_name)
+            self.bus.emit(message.reply('mycroft.skill.handler.timeout',
+                                        {'skill_id': str(self.skill_id),
+                                         'name': handler_name,
+                                         'timeout': self.handler_timeout}))
 
         def wrapper(message):
             skill_data = {'name': get_handler_name(handler)}
             stopwatch = Stopwatch()
+            failed = False
+            deadline = None
+            if self.handler_timeout:
+                deadline = handler_watchdog.watch(
+                    self.handler_timeout, on_timeout,
+                    (message, skill_data['name']))
             try:
                 message = unmunge_message(message, self.skill_id)
                 # Indicate that the skill handler is starting
@@ -866,6 +925,7 @@ class MycroftSkill(object):
                     self.settings.store()  # Store settings if they've changed
 
             except Exception as e:
+                failed = True
                 # Convert "MyFancySkill" to "My Fancy Skill" for speaking
                 handler_name = camel_case_split(self.name)
                 msg_data = {'skill': handler_name}
@@ -875,6 +935,11 @@ class MycroftSkill(object):
                 # append exception information in message
                 skill_data['exception'] = repr(e)
             finally:
+                if deadline:
+                    handler_watchdog.cancel(deadline)
+                if stopwatch.time is not None:
+                    handler_stats.record(self.skill_id, skill_data['name'],
+                                         stopwatch.time, failed)
                 # Indicate that the skill handler has completed
                 if handler_info:
                     msg_type = handler_info + '.complete'
@@ -886,12 +951,19 @@ class MycroftSkill(object):
                     report_timing(context['ident'], 'skill_handler', stopwatch,
                                   {'handler': handler.__name__})
 
+        def submit(message):
+            try:
+                self.handler_executor.submit(wrapper, message)
+            except RuntimeError:
+                pass  # The skill has been shut down
+
         if handler:
+            func = submit if queued else wrapper
             if once:
-                self.bus.once(name, wrapper)
+                self.bus.once(name, func)
             else:
-                self.bus.on(name, wrapper)
-            self.events.append((name, wrapper))
+                self.bus.on(name, func)
+            self.events.append((name, func))
 
     def remove_event(self, name):
         """ Removes an event from bus emitter and events list
@@ -1093,9 +1165,9 @@ class MycroftSkill(object):
 
         origin = origin or ''
         context = to_alnum(self.skill_id) + context
-        self.bus.emit(Message('add_context',
-                              {'context': context, 'word': word,
-                               'origin': origin}))
+        self.bus.emit(create_reply('add_context',
+                                   {'context': context, 'word': word,
+                                    'origin': origin}))
 
     def handle_set_cross_context(self, message):
         """
@@ -1124,9 +1196,9 @@ class MycroftSkill(object):
                 context:    Keyword
                 word:       word connected to keyword
         """
-        self.bus.emit(Message("mycroft.skill.set_cross_context",
-                              {"context": context, "word": word,
-                               "origin": self.skill_id}))
+        self.bus.emit(create_reply("mycroft.skill.set_cross_context",
+                                   {"context": context, "word": word,
+                                    "origin": self.skill_id}))
 
     def remove_cross_skill_context(self, context):
         """
@@ -1134,8 +1206,8 @@ class MycroftSkill(object):
         """
         if not isinstance(context, str):
             raise ValueError('context should be a string')
-        self.bus.emit(Message("mycroft.skill.remove_cross_context",
-                              {"context": context}))
+        self.bus.emit(create_reply("mycroft.skill.remove_cross_context",
+                                   {"context": context}))
 
     def remove_context(self, context):
         """
@@ -1144,7 +1216,7 @@ class MycroftSkill(object):
         if not isinstance(context, str):
             raise ValueError('context should be a string')
         context = to_alnum(self.skill_id) + context
-        self.bus.emit(Message('remove_context', {'context': context}))
+        self.bus.emit(create_reply('remove_context', {'context': context}))
 
     def register_vocabulary(self, entity, entity_type):
         """ Register a word to a keyword
@@ -1295,6 +1367,7 @@ class MycroftSkill(object):
         for e, f in self.events:
             self.bus.remove(e, f)
         self.events = []  # Remove reference to wrappers
+        self.handler_executor.shutdown(wait=False)
 
         self.bus.emit(
             Message("detach_skill", {"skill_id": str(self.skill_id) + ":"}))
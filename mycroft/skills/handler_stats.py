@@ -0,0 +1,123 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Local statistics of skill handler calls.
+
+Every process running skills keeps one HandlerStats instance. Send
+'mycroft.skill.handler.stats', optionally with a skill_id, to get the
+statistics in a 'mycroft.skill.handler.stats.response' message from each
+of these processes.
+"""
+from collections import deque
+from math import ceil
+from threading import Lock
+
+
+def _percentile(sorted_values, percent):
+    """ Nearest rank percentile of a sorted list. """
+    rank = ceil(percent / 100 * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
+
+
+class _HandlerCounters(object):
+    def __init__(self, samples):
+        self.count = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.durations = deque(maxlen=samples)
+
+    def report(self):
+        durations = sorted(self.durations)
+        report = {
+            'count': self.count,
+            'failures': self.failures,
+            'timeouts': self.timeouts
+        }
+        if durations:
+            report.update({
+                'p50': _percentile(durations, 50),
+                'p99': _percentile(durations, 99),
+                'max': durations[-1]
+            })
+        return report
+
+
+class HandlerStats(object):
+    """ Call count, duration and failures per skill and handler.
+
+    Args:
+        samples (int): number of recent durations kept per handler for the
+                       percentiles
+    """
+
+    def __init__(self, samples=1000):
+        self.samples = samples
+        self.skills = {}  # skill_id: {handler name: _HandlerCounters}
+        self.lock = Lock()
+
+    def _counters(self, skill_id, handler):
+        """ Get the counters of a handler. Must be called with the lock. """
+        handlers = self.skills.setdefault(str(skill_id), {})
+        if handler not in handlers:
+            handlers[handler] = _HandlerCounters(self.samples)
+        return handlers[handler]
+
+    def record(self, skill_id, handler, duration, failed=False):
+        """ Record a completed handler call.
+
+        Args:
+            skill_id (str): id of the skill
+            handler (str): name of the handler
+            duration (float): seconds the handler ran
+            failed (bool): True if the handler raised an exception
+        """
+        with self.lock:
+            counters = self._counters(skill_id, handler)
+            counters.count += 1
+            counters.durations.append(duration)
+            if failed:
+                counters.failures += 1
+
+    def record_timeout(self, skill_id, handler):
+        """ Record a handler call exceeding the deadline. """
+        with self.lock:
+            self._counters(skill_id, handler).timeouts += 1
+
+    def report(self, skill_id=None):
+        """ Get the statistics.
+
+        Args:
+            skill_id (str): only report this skill
+
+        Returns:
+            dict: skill_id: handler name: dict with count, failures, timeouts
+                  and the p50, p99 and max duration in seconds
+        """
+        with self.lock:
+            return {skill: {handler: counters.report()
+                            for handler, counters in handlers.items()}
+                    for skill, handlers in self.skills.items()
+                    if skill_id is None or skill == str(skill_id)}
+
+    def bind(self, bus):
+        """ Answer statistics requests on the messagebus. """
+        def handle_request(message):
+            skill_id = message.data.get('skill_id')
+            bus.emit(message.reply('mycroft.skill.handler.stats.response',
+                                   {'skills': self.report(skill_id)}))
+        bus.on('mycroft.skill.handler.stats', handle_request)
+
+
+# Statistics of the skills running in this process
+handler_stats = HandlerStats()
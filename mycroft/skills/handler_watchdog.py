@@ -0,0 +1,110 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Deadlines of running skill handlers.
+
+A single thread per process keeps the deadlines of all running handlers in
+a heap and calls the timeout callback of the ones running past it, instead
+of starting a timer thread for every handler call.
+"""
+import heapq
+import time
+from itertools import count
+from threading import Condition, Thread
+
+from mycroft.util.log import LOG
+
+
+class _Deadline(object):
+    __slots__ = ('callback', 'args', 'cancelled')
+
+    def __init__(self, callback, args):
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+
+class HandlerWatchdog(object):
+    """ Calls a callback for handlers still running at their deadline. """
+
+    def __init__(self):
+        self.heap = []  # [(deadline, sequence number, _Deadline)]
+        self.cancelled = 0
+        self.sequence = count()
+        self.condition = Condition()
+        self.thread = None
+
+    def watch(self, timeout, callback, args=()):
+        """ Start watching a handler call.
+
+        Args:
+            timeout (float): seconds until callback(*args) is called
+            callback (callable): called on the watchdog thread, must not
+                                 block
+
+        Returns:
+            object to pass to cancel() once the handler completed
+        """
+        entry = _Deadline(callback, args)
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            if self.thread is None:
+                self.thread = Thread(target=self._run, daemon=True,
+                                     name='HandlerWatchdog')
+                self.thread.start()
+            heapq.heappush(self.heap, (deadline, next(self.sequence), entry))
+            if self.heap[0][2] is entry:
+                self.condition.notify()
+        return entry
+
+    def cancel(self, entry):
+        """ Stop watching a handler call. """
+        with self.condition:
+            if entry.cancelled:
+                return
+            entry.cancelled = True
+            self.cancelled += 1
+            # Entries are removed lazily, unless they make up most of the heap
+            if self.cancelled > 64 and self.cancelled * 2 > len(self.heap):
+                self.heap = [item for item in self.heap
+                             if not item[2].cancelled]
+                heapq.heapify(self.heap)
+                self.cancelled = 0
+
+    def _run(self):
+        while True:
+            with self.condition:
+                expired = []
+                now = time.monotonic()
+                while self.heap and (self.heap[0][2].cancelled or
+                                     self.heap[0][0] <= now):
+                    _, _, entry = heapq.heappop(self.heap)
+                    if entry.cancelled:
+                        self.cancelled -= 1
+                    else:
+                        entry.cancelled = True
+                        expired.append(entry)
+                if not expired:
+                    timeout = self.heap[0][0] - now if self.heap else None
+                    self.condition.wait(timeout)
+                    continue
+            for entry in expired:
+                try:
+                    entry.callback(*entry.args)
+                except Exception:
+                    LOG.exception('Handler timeout callback failed')
+
+
+# Deadlines of the skill handlers running in this process
+handler_watchdog = HandlerWatchdog()
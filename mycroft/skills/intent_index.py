@@ -0,0 +1,122 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from collections import OrderedDict
+from threading import Lock
+
+
+def intent_skill_id(intent_name):
+    """ Get the skill id from an intent name on the form skill_id:name. """
+    return intent_name.split(':', 1)[0]
+
+
+class IntentIndex(object):
+    """ Registered intents indexed by intent name and by skill id.
+
+    Registering, detaching and listing the intents of a skill cost the same
+    no matter how many intents are registered in total. Iterating yields
+    the intents in registration order, like the list of intent parsers in
+    the Adapt engine, which the index can stand in for.
+    """
+
+    def __init__(self):
+        self.intents = OrderedDict()  # intent name: intent
+        self.skills = {}  # skill_id: OrderedDict of intent names
+        self.lock = Lock()
+        self._snapshot = ()
+
+    def add(self, name, intent=None):
+        """ Add an intent, replacing any intent with the same name.
+
+        Args:
+            name (str): intent name, prefixed with the skill id
+            intent: object to store, e.g. an Adapt intent parser
+        """
+        with self.lock:
+            self.intents[name] = intent
+            skill_intents = self.skills.setdefault(intent_skill_id(name),
+                                                   OrderedDict())
+            skill_intents[name] = None
+            self._snapshot = None
+
+    def append(self, intent_parser):
+        """ Add an Adapt intent parser, keyed on its name. """
+        self.add(intent_parser.name, intent_parser)
+
+    def remove(self, name):
+        """ Remove an intent.
+
+        Args:
+            name (str): intent name
+        Returns:
+            True if the intent was registered
+        """
+        with self.lock:
+            if name not in self.intents:
+                return False
+            del self.intents[name]
+            skill_id = intent_skill_id(name)
+            skill_intents = self.skills[skill_id]
+            del skill_intents[name]
+            if not skill_intents:
+                del self.skills[skill_id]
+            self._snapshot = None
+            return True
+
+    def remove_skill(self, skill_id):
+        """ Remove all intents of a skill.
+
+        Args:
+            skill_id (str): skill id, with or without the trailing ':' the
+                            detach_skill message uses
+        Returns:
+            list of the removed intent names
+        """
+        skill_id = intent_skill_id(skill_id)
+        with self.lock:
+            names = list(self.skills.pop(skill_id, ()))
+            for name in names:
+                del self.intents[name]
+            if names:
+                self._snapshot = None
+            return names
+
+    def get(self, name, default=None):
+        """ Get the object stored for an intent. """
+        return self.intents.get(name, default)
+
+    def skill_intents(self, skill_id):
+        """ List the intent names of a skill in registration order. """
+        with self.lock:
+            return list(self.skills.get(skill_id, ()))
+
+    def names(self):
+        """ List all intent names in registration order. """
+        with self.lock:
+            return list(self.intents)
+
+    def __contains__(self, name):
+        return name in self.intents
+
+    def __len__(self):
+        return len(self.intents)
+
+    def __iter__(self):
+        # Iterate over an immutable snapshot so intents can be added and
+        # removed while an utterance is being matched on another thread.
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self.lock:
+                snapshot = self._snapshot = tuple(self.intents.values())
+        return iter(snapshot)
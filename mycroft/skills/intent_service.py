@@ -13,6 +13,12 @@
 # limitations under the License.
 #
 import time
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError, ThreadPoolExecutor, \
+    TimeoutError
+from copy import deepcopy
+from itertools import islice
+from threading import Lock
 from adapt.context import ContextManagerFrame
 from adapt.engine import IntentDeterminationEngine
 from adapt.intent import IntentBuilder
@@ -20,9 +26,11 @@ from adapt.intent import IntentBuilder
 from mycroft.configuration import Configuration
 from mycroft.messagebus.message import Message
 from mycroft.skills.core import open_intent_envelope
+from mycroft.skills.intent_index import IntentIndex
 from mycroft.util.log import LOG
 from mycroft.util.parse import normalize
 from mycroft.metrics import report_timing, Stopwatch
+from mycroft.session import get_session_id
 from mycroft.skills.padatious_service import PadatiousService
 
 
@@ -45,23 +53,80 @@ def workaround_one_of_context(best_intent):
     return best_intent
 
 
+def _context_keyword(entity):
+    """ Get the keyword of a context entity. """
+    return entity['data'][0][1]
+
+
 class ContextManager(object):
     """
     ContextManager
     Use to track context throughout the course of a conversational session.
     How to manage a session's lifecycle is not captured here.
+
+    Frames are kept newest first and dropped once they expire. Each keyword
+    is indexed to the frames holding it.
     """
 
     def __init__(self, timeout):
-        self.frame_stack = []
+        self.frame_stack = deque()  # (frame, timestamp), newest first
+        self.keywords = {}  # keyword: deque of frames, newest first
         self.timeout = timeout * 60  # minutes to seconds
+        self.lock = Lock()
 
     def clear_context(self):
-        self.frame_stack = []
+        with self.lock:
+            self.frame_stack = deque()
+            self.keywords = {}
 
     def remove_context(self, context_id):
-        self.frame_stack = [(f, t) for (f, t) in self.frame_stack
-                            if context_id in f.entities[0].get('data', [])]
+        """ Remove all frames holding a keyword.
+
+        Args:
+            context_id (str): the keyword
+        """
+        with self.lock:
+            frames = self.keywords.pop(context_id, None)
+            if not frames:
+                return
+            removed = set(id(frame) for frame in frames)
+            self.frame_stack = deque((f, t) for (f, t) in self.frame_stack
+                                     if id(f) not in removed)
+            for frame in frames:
+                for keyword in self._frame_keywords(frame):
+                    if keyword in self.keywords:
+                        self._unindex(keyword, frame)
+
+    def _frame_keywords(self, frame):
+        keywords = set()
+        for entity in frame.entities:
+            try:
+                keywords.add(_context_keyword(entity))
+            except (IndexError, KeyError, TypeError):
+                pass
+        return keywords
+
+    def _index(self, keyword, frame):
+        frames = self.keywords.setdefault(keyword, deque())
+        if not frames or frames[0] is not frame:
+            frames.appendleft(frame)
+
+    def _unindex(self, keyword, frame):
+        frames = self.keywords[keyword]
+        if frames[-1] is frame:
+            frames.pop()
+        else:
+            frames.remove(frame)
+        if not frames:
+            del self.keywords[keyword]
+
+    def _evict(self):
+        """ Drop expired frames, the oldest are last in the stack. """
+        expiry = time.time() - self.timeout
+        while self.frame_stack and self.frame_stack[-1][1] <= expiry:
+            frame, _ = self.frame_stack.pop()
+            for keyword in self._frame_keywords(frame):
+                self._unindex(keyword, frame)
 
     def inject_context(self, entity, metadata=None):
         """
@@ -75,18 +140,22 @@ class ContextManager(object):
         """
         metadata = metadata or {}
         try:
+            keyword = _context_keyword(entity)
+        except (IndexError, KeyError):
+            return
+        with self.lock:
             if len(self.frame_stack) > 0:
                 top_frame = self.frame_stack[0]
             else:
                 top_frame = None
             if top_frame and top_frame[0].metadata_matches(metadata):
-                top_frame[0].merge_context(entity, metadata)
+                frame = top_frame[0]
+                frame.merge_context(entity, metadata)
             else:
                 frame = ContextManagerFrame(entities=[entity],
                                             metadata=metadata.copy())
-                self.frame_stack.insert(0, (frame, time.time()))
-        except (IndexError, KeyError):
-            pass
+                self.frame_stack.appendleft((frame, time.time()))
+            self._index(keyword, frame)
 
     def get_context(self, max_frames=None, missing_entities=None):
         """ Constructs a list of entities from the context.
@@ -99,60 +168,94 @@ class ContextManager(object):
         Returns:
             list: a list of entities
         """
-        missing_entities = missing_entities or []
-
-        relevant_frames = [frame[0] for frame in self.frame_stack if
-                           time.time() - frame[1] < self.timeout]
-        if not max_frames or max_frames > len(relevant_frames):
-            max_frames = len(relevant_frames)
-
-        missing_entities = list(missing_entities)
-        context = []
+        with self.lock:
+            self._evict()
+            if not max_frames or max_frames > len(self.frame_stack):
+                max_frames = len(self.frame_stack)
+            frames = [frame for frame, _ in
+                      islice(self.frame_stack, max_frames)]
+            newest = {keyword: self.keywords[keyword][0]
+                      for keyword in missing_entities or []
+                      if keyword in self.keywords}
+
+        # Frames get less relevant the further back they are, each change
+        # of origin adds a level
+        depths = {}
         last = ''
         depth = 0
-        for i in range(max_frames):
-            frame_entities = [entity.copy() for entity in
-                              relevant_frames[i].entities]
-            for entity in frame_entities:
-                entity['confidence'] = entity.get('confidence', 1.0) \
-                    / (2.0 + depth)
-            context += frame_entities
-
-            # Update depth
-            if entity['origin'] != last or entity['origin'] == '':
+        for frame in frames:
+            depths[id(frame)] = depth
+            origin = frame.entities[-1].get('origin', '')
+            if origin != last or origin == '':
                 depth += 1
-            last = entity['origin']
-            print(depth)
+            last = origin
 
-        result = []
-        if len(missing_entities) > 0:
-            for entity in context:
-                if entity.get('data') in missing_entities:
-                    result.append(entity)
-                    # NOTE: this implies that we will only ever get one
-                    # of an entity kind from context, unless specified
-                    # multiple times in missing_entities. Cannot get
-                    # an arbitrary number of an entity kind.
-                    missing_entities.remove(entity.get('data'))
-        else:
-            result = context
+        def entity_in_context(entity, frame):
+            entity = entity.copy()
+            entity['confidence'] = entity.get('confidence', 1.0) \
+                / (2.0 + depths[id(frame)])
+            return entity
 
         # Only use the latest instance of each keyword
-        stripped = []
-        processed = []
-        for f in result:
-            keyword = f['data'][0][1]
-            if keyword not in processed:
-                stripped.append(f)
-                processed.append(keyword)
-        result = stripped
+        result = []
+        if missing_entities:
+            # NOTE: this implies that we will only ever get one
+            # of an entity kind from context.
+            for keyword in OrderedDict.fromkeys(missing_entities):
+                frame = newest.get(keyword)
+                if frame is None or id(frame) not in depths:
+                    continue  # Not in context or too far back
+                for entity in frame.entities:
+                    if _context_keyword(entity) == keyword:
+                        result.append(entity_in_context(entity, frame))
+                        break
+        else:
+            processed = set()
+            for frame in frames:
+                for entity in frame.entities:
+                    keyword = _context_keyword(entity)
+                    if keyword not in processed:
+                        result.append(entity_in_context(entity, frame))
+                        processed.add(keyword)
         return result
 
 
+class IntentSession(object):
+    """
+    Conversational state of one session, context frames and active skills.
+    """
+
+    def __init__(self, session_id, context_timeout):
+        self.session_id = session_id
+        self.context_manager = ContextManager(context_timeout)
+        self.active_skills = []  # [skill_id , timestamp]
+        self.touch_time = time.time()
+
+    def touch(self):
+        self.touch_time = time.time()
+
+    def expired(self, ttl):
+        return time.time() - self.touch_time > ttl
+
+
 class IntentService(object):
     def __init__(self, bus):
-        self.config = Configuration.get().get('context', {})
+        config = Configuration.get()
+        self.config = config.get('context', {})
         self.engine = IntentDeterminationEngine()
+        # Index the Adapt parsers by name and skill for fast detaching
+        self.engine.intent_parsers = IntentIndex()
+        # Recent intent results, keyed by utterance, language, context and
+        # registry version
+        self.intent_cache = OrderedDict()
+        self.intent_cache_lock = Lock()
+        self.intent_cache_size = config.get('skills', {}).get(
+            'intent_cache_size', 100)
+        # Confidence at which the remaining utterance hypotheses are skipped
+        self.early_exit_confidence = config.get('skills', {}).get(
+            'early_exit_confidence', 0.95)
+        # Bumped on every change of the registered vocabulary and intents
+        self.registry_version = 0
 
         # Dictionary for translating a skill id to a name
         self.skill_names = {}
@@ -161,7 +264,11 @@ class IntentService(object):
         self.context_max_frames = self.config.get('max_frames', 3)
         self.context_timeout = self.config.get('timeout', 2)
         self.context_greedy = self.config.get('greedy', False)
-        self.context_manager = ContextManager(self.context_timeout)
+        # Context and converse state per session, messages without a session
+        # share the session None, which never expires
+        self.sessions = {}
+        self.sessions_lock = Lock()
+        self.session_ttl = config.get('session', {}).get('ttl', 180)
         self.bus = bus
         self.bus.on('register_vocab', self.handle_register_vocab)
         self.bus.on('register_intent', self.handle_register_intent)
@@ -173,19 +280,18 @@ class IntentService(object):
         self.bus.on('remove_context', self.handle_remove_context)
         self.bus.on('clear_context', self.handle_clear_context)
         # Converse method
-        self.bus.on('skill.converse.response', self.handle_converse_response)
-        self.bus.on('skill.converse.error', self.handle_converse_error)
         self.bus.on('mycroft.speech.recognition.unknown', self.reset_converse)
         self.bus.on('mycroft.skills.loaded', self.update_skill_name_dict)
 
         def add_active_skill_handler(message):
-            self.add_active_skill(message.data['skill_id'])
+            self.add_active_skill(message.data['skill_id'],
+                                  get_session_id(message))
         self.bus.on('active_skill_request', add_active_skill_handler)
-        self.active_skills = []  # [skill_id , timestamp]
         self.converse_timeout = 5  # minutes to prune active_skills
-        self.waiting_for_converse = False
-        self.converse_result = False
-        self.converse_skill_id = ""
+        # Seconds to wait for all converse responses of an utterance
+        self.converse_response_timeout = 5
+        # Padatious runs here while Adapt runs on the bus handler thread
+        self.padatious_executor = ThreadPoolExecutor(max_workers=2)
 
     def update_skill_name_dict(self, message):
         """
@@ -205,54 +311,109 @@ class IntentService(object):
         """
         return self.skill_names.get(skill_id, skill_id)
 
+    def get_session(self, session_id=None):
+        """ Get the state of a session, starting it if needed.
+
+        Args:
+            session_id: session id from the message context
+
+        Returns:
+            (IntentSession) the session state
+        """
+        with self.sessions_lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                session = IntentSession(session_id, self.context_timeout)
+                self.sessions[session_id] = session
+            session.touch()
+            return session
+
+    def evict_sessions(self):
+        """ Forget sessions idle for longer than the session ttl. """
+        with self.sessions_lock:
+            expired = [session_id for session_id, session in
+                       self.sessions.items()
+                       if session_id is not None and
+                       session.expired(self.session_ttl)]
+            for session_id in expired:
+                LOG.debug('Session {} expired'.format(session_id))
+                del self.sessions[session_id]
+
     def reset_converse(self, message):
         """Let skills know there was a problem with speech recognition"""
         lang = message.data.get('lang', "en-us")
-        for skill in self.active_skills:
-            self.do_converse(None, skill[0], lang)
-
-    def do_converse(self, utterances, skill_id, lang):
-        self.waiting_for_converse = True
-        self.converse_result = False
-        self.converse_skill_id = skill_id
-        self.bus.emit(Message("skill.converse.request", {
-            "skill_id": skill_id, "utterances": utterances, "lang": lang}))
-        start_time = time.time()
-        t = 0
-        while self.waiting_for_converse and t < 5:
-            t = time.time() - start_time
-            time.sleep(0.1)
-        self.waiting_for_converse = False
-        self.converse_skill_id = ""
-        return self.converse_result
-
-    def handle_converse_error(self, message):
-        skill_id = message.data["skill_id"]
-        if message.data["error"] == "skill id does not exist":
-            self.remove_active_skill(skill_id)
-        if skill_id == self.converse_skill_id:
-            self.converse_result = False
-            self.waiting_for_converse = False
-
-    def handle_converse_response(self, message):
-        skill_id = message.data["skill_id"]
-        if skill_id == self.converse_skill_id:
-            self.converse_result = message.data.get("result", False)
-            self.waiting_for_converse = False
-
-    def remove_active_skill(self, skill_id):
-        for skill in self.active_skills:
+        session_id = get_session_id(message)
+        session = self.get_session(session_id)
+        self.converse_all(None, [skill[0] for skill in session.active_skills],
+                          lang, session_id)
+
+    def do_converse(self, utterances, skill_id, lang, session_id=None):
+        return self.converse_all(utterances, [skill_id], lang,
+                                 session_id) is not None
+
+    def converse_all(self, utterances, skill_ids, lang, session_id=None):
+        """ Ask several skills at once if they want to handle an utterance.
+
+        All skills are queried together and the first skill in skill_ids
+        answering True wins. The round ends as soon as the winner is known,
+        or when converse_response_timeout expires.
+
+        The responses resolve bus requests on the receive thread, so they
+        aren't queued behind the handler waiting for them.
+
+        Args:
+            utterances (list): utterances to converse with, None if speech
+                               recognition failed.
+            skill_ids (list): skill ids, highest priority first
+            lang (str): language of the utterances
+            session_id: session the utterances belong to
+
+        Returns:
+            (str) skill_id of the skill handling the utterance or None
+        """
+        if not skill_ids:
+            return None
+        context = {'session': session_id} if session_id is not None else None
+        requests = [(skill_id, self.bus.request(
+            Message("skill.converse.request", {
+                "skill_id": skill_id, "utterances": utterances,
+                "lang": lang}, context),
+            ("skill.converse.response", "skill.converse.error")))
+            for skill_id in skill_ids]
+
+        deadline = time.monotonic() + self.converse_response_timeout
+        winner = None
+        # A skill only wins once all skills before it declined
+        for skill_id, request in requests:
+            try:
+                reply = request.result(max(deadline - time.monotonic(), 0))
+            except (TimeoutError, CancelledError):
+                continue  # Didn't answer in time, counts as not handling it
+            if reply.type == "skill.converse.error":
+                if reply.data.get("error") == "skill id does not exist":
+                    self.remove_active_skill(skill_id, session_id)
+            elif reply.data.get("result", False):
+                winner = skill_id
+                break
+        for _, request in requests:
+            request.cancel()
+        return winner
+
+    def remove_active_skill(self, skill_id, session_id=None):
+        active_skills = self.get_session(session_id).active_skills
+        for skill in active_skills:
             if skill[0] == skill_id:
-                self.active_skills.remove(skill)
+                active_skills.remove(skill)
 
-    def add_active_skill(self, skill_id):
+    def add_active_skill(self, skill_id, session_id=None):
         # search the list for an existing entry that already contains it
         # and remove that reference
-        self.remove_active_skill(skill_id)
+        self.remove_active_skill(skill_id, session_id)
         # add skill with timestamp to start of skill_list
-        self.active_skills.insert(0, [skill_id, time.time()])
+        self.get_session(session_id).active_skills.insert(
+            0, [skill_id, time.time()])
 
-    def update_context(self, intent):
+    def update_context(self, intent, session_id=None):
         """ Updates context with keyword from the intent.
 
         NOTE: This method currently won't handle one_of intent keywords
@@ -261,15 +422,17 @@ class IntentService(object):
 
         Args:
             intent: Intent to scan for keywords
+            session_id: session the intent was matched in
         """
+        context_manager = self.get_session(session_id).context_manager
         for tag in intent['__tags__']:
             if 'entities' not in tag:
                 continue
             context_entity = tag['entities'][0]
             if self.context_greedy:
-                self.context_manager.inject_context(context_entity)
+                context_manager.inject_context(context_entity)
             elif context_entity['data'][0][1] in self.context_keywords:
-                self.context_manager.inject_context(context_entity)
+                context_manager.inject_context(context_entity)
 
     def send_metrics(self, intent, context, stopwatch):
         """
@@ -310,17 +473,22 @@ class IntentService(object):
             # Get language of the utterance
             lang = message.data.get('lang', "en-us")
             utterances = message.data.get('utterances', '')
+            session_id = get_session_id(message)
+            self.evict_sessions()
 
             stopwatch = Stopwatch()
             with stopwatch:
                 # Give active skills an opportunity to handle the utterance
-                converse = self._converse(utterances, lang)
+                converse = self._converse(utterances, lang, session_id)
 
                 if not converse:
                     # No conversation, use intent system to handle utterance
-                    intent = self._adapt_intent_match(utterances, lang)
-                    padatious_intent = PadatiousService.instance.calc_intent(
-                                        utterances[0])
+                    # evaluating Adapt and Padatious at the same time.
+                    ident = message.context.get('ident') \
+                        if message.context else None
+                    intent, padatious_intent, padatious_index = \
+                        self._match_intents(utterances, lang, ident,
+                                            session_id)
 
             if converse:
                 # Report that converse handled the intent and return
@@ -336,59 +504,166 @@ class IntentService(object):
             else:
                 # Allow fallback system to handle utterance
                 # NOTE: Padatious intents are handled this way, too
+                if padatious_intent and padatious_intent.conf >= 0.5:
+                    # Pass on the hypothesis Padatious matched
+                    utterance = utterances[padatious_index]
+                else:
+                    utterance = utterances[0]
                 reply = message.reply('intent_failure',
-                                      {'utterance': utterances[0],
+                                      {'utterance': utterance,
                                        'lang': lang})
             self.bus.emit(reply)
             self.send_metrics(intent, message.context, stopwatch)
         except Exception as e:
             LOG.exception(e)
 
-    def _converse(self, utterances, lang):
+    def _converse(self, utterances, lang, session_id=None):
         """ Give active skills a chance at the utterance
 
         Args:
             utterances (list):  list of utterances
             lang (string):      4 letter ISO language code
+            session_id:         session the utterances belong to
 
         Returns:
             bool: True if converse handled it, False if  no skill processes it
         """
+        session = self.get_session(session_id)
 
         # check for conversation time-out
-        self.active_skills = [skill for skill in self.active_skills
-                              if time.time() - skill[
-                                  1] <= self.converse_timeout * 60]
+        session.active_skills = [skill for skill in session.active_skills
+                                 if time.time() - skill[
+                                     1] <= self.converse_timeout * 60]
 
         # check if any skill wants to handle utterance
-        for skill in self.active_skills:
-            if self.do_converse(utterances, skill[0], lang):
-                # update timestamp, or there will be a timeout where
-                # intent stops conversing whether its being used or not
-                self.add_active_skill(skill[0])
-                return True
+        skill_id = self.converse_all(utterances,
+                                     [skill[0] for skill in
+                                      session.active_skills], lang,
+                                     session_id)
+        if skill_id:
+            # update timestamp, or there will be a timeout where
+            # intent stops conversing whether its being used or not
+            self.add_active_skill(skill_id, session_id)
+            return True
         return False
 
-    def _adapt_intent_match(self, utterances, lang):
+    def _intent_cache_key(self, utterances, lang, context_manager):
+        """ Build the intent cache key for an utterance.
+
+        Args:
+            utterances (list):  list of utterances
+            lang (string):      4 letter ISO language code
+            context_manager (ContextManager): context of the session
+
+        Returns:
+            hashable key covering everything the intent match depends on
+        """
+        context = tuple((str(entity.get('data')), entity.get('key'),
+                         entity.get('confidence'))
+                        for entity in context_manager.get_context())
+        return (tuple(normalize(u, lang) for u in utterances), lang, context,
+                self.registry_version,
+                getattr(PadatiousService.instance, 'model_version', None))
+
+    def _match_intents(self, utterances, lang, ident, session_id=None):
+        """ Find the Adapt and Padatious intents matching the utterances.
+
+        Adapt and Padatious are evaluated at the same time, each scoring all
+        utterance hypotheses and keeping its most confident match. Results
+        are cached so repeated utterances skip both engines, as long as the
+        context and the registered intents are unchanged.
+
+        Args:
+            utterances (list):  list of utterances
+            lang (string):      4 letter ISO language code
+            ident:              ident from the utterance message context
+            session_id:         session the utterances belong to
+
+        Returns:
+            tuple of the Adapt intent (or None), the Padatious match data and
+            the index of the utterance Padatious matched
+        """
+        context_manager = self.get_session(session_id).context_manager
+        key = self._intent_cache_key(utterances, lang, context_manager)
+        with self.intent_cache_lock:
+            cached = self.intent_cache.get(key)
+            if cached:
+                self.intent_cache.move_to_end(key)
+
+        if cached:
+            intent, index, padatious_intent, padatious_index = cached
+            # Callers may modify the results, keep the cached ones intact
+            intent = deepcopy(intent)
+            padatious_intent = deepcopy(padatious_intent)
+            if intent:
+                intent['utterance'] = utterances[index]
+            # Let the fallback reuse the result like after a real match
+            PadatiousService.instance.remember_result(
+                utterances[padatious_index], ident, padatious_intent)
+        else:
+            padatious_future = self.padatious_executor.submit(
+                PadatiousService.instance.match_utterances,
+                utterances, ident, self.early_exit_confidence)
+            intent, index = self._adapt_determine_intent(utterances, lang,
+                                                         context_manager)
+            padatious_intent, padatious_index = padatious_future.result()
+            # Without a Padatious result the worker failed, try again next
+            # time instead of caching the missing match
+            if padatious_intent is not None:
+                with self.intent_cache_lock:
+                    self.intent_cache[key] = (deepcopy(intent), index,
+                                              deepcopy(padatious_intent),
+                                              padatious_index)
+                    while len(self.intent_cache) > self.intent_cache_size:
+                        self.intent_cache.popitem(last=False)
+
+        if intent:
+            self._activate_adapt_intent(intent, session_id)
+        return intent, padatious_intent, padatious_index
+
+    def _adapt_intent_match(self, utterances, lang, session_id=None):
         """ Run the Adapt engine to search for an matching intent
 
         Args:
             utterances (list):  list of utterances
             lang (string):      4 letter ISO language code
+            session_id:         session the utterances belong to
 
         Returns:
             Intent structure, or None if no match was found.
         """
+        context_manager = self.get_session(session_id).context_manager
+        best_intent, _ = self._adapt_determine_intent(utterances, lang,
+                                                      context_manager)
+        if best_intent:
+            return self._activate_adapt_intent(best_intent, session_id)
+
+    def _adapt_determine_intent(self, utterances, lang, context_manager):
+        """ Determine the Adapt intent without updating any state.
+
+        All utterance hypotheses are scored and the most confident match
+        wins. Scoring stops early once a match reaches
+        early_exit_confidence.
+
+        Args:
+            utterances (list):  list of utterances
+            lang (string):      4 letter ISO language code
+            context_manager (ContextManager): context of the session
+
+        Returns:
+            tuple of the intent structure, or None if no match was found,
+            and the index of the matching utterance.
+        """
         best_intent = None
-        for utterance in utterances:
+        index = None
+        best_confidence = 0.0
+        for i, utterance in enumerate(utterances):
             try:
                 # normalize() changes "it's a boy" to "it is boy", etc.
-                best_intent = next(self.engine.determine_intent(
+                intent = next(self.engine.determine_intent(
                     normalize(utterance, lang), 100,
                     include_tags=True,
-                    context_manager=self.context_manager))
-                # TODO - Should Adapt handle this?
-                best_intent['utterance'] = utterance
+                    context_manager=context_manager))
             except StopIteration:
                 # don't show error in log
                 continue
@@ -396,18 +671,37 @@ class IntentService(object):
                 LOG.exception(e)
                 continue
 
-        if best_intent and best_intent.get('confidence', 0.0) > 0.0:
-            self.update_context(best_intent)
-            # update active skills
-            skill_id = best_intent['intent_type'].split(":")[0]
-            self.add_active_skill(skill_id)
-            # adapt doesn't handle context injection for one_of keywords
-            # correctly. Workaround this issue if possible.
-            try:
-                best_intent = workaround_one_of_context(best_intent)
-            except LookupError:
-                LOG.error('Error during workaround_one_of_context')
-            return best_intent
+            confidence = intent.get('confidence', 0.0)
+            if confidence > best_confidence:
+                # TODO - Should Adapt handle this?
+                intent['utterance'] = utterance
+                best_intent, index, best_confidence = intent, i, confidence
+                if confidence >= self.early_exit_confidence:
+                    break
+
+        return best_intent, index
+
+    def _activate_adapt_intent(self, best_intent, session_id=None):
+        """ Update context and active skills for a matched Adapt intent.
+
+        Args:
+            best_intent: Intent structure from the Adapt engine
+            session_id: session the intent was matched in
+
+        Returns:
+            The intent structure
+        """
+        self.update_context(best_intent, session_id)
+        # update active skills
+        skill_id = best_intent['intent_type'].split(":")[0]
+        self.add_active_skill(skill_id, session_id)
+        # adapt doesn't handle context injection for one_of keywords
+        # correctly. Workaround this issue if possible.
+        try:
+            best_intent = workaround_one_of_context(best_intent)
+        except LookupError:
+            LOG.error('Error during workaround_one_of_context')
+        return best_intent
 
     def handle_register_vocab(self, message):
         start_concept = message.data.get('start')
@@ -419,23 +713,22 @@ class IntentService(object):
         else:
             self.engine.register_entity(
                 start_concept, end_concept, alias_of=alias_of)
+        self.registry_version += 1
 
     def handle_register_intent(self, message):
         intent = open_intent_envelope(message)
         self.engine.register_intent_parser(intent)
+        self.registry_version += 1
 
     def handle_detach_intent(self, message):
         intent_name = message.data.get('intent_name')
-        new_parsers = [
-            p for p in self.engine.intent_parsers if p.name != intent_name]
-        self.engine.intent_parsers = new_parsers
+        self.engine.intent_parsers.remove(intent_name)
+        self.registry_version += 1
 
     def handle_detach_skill(self, message):
         skill_id = message.data.get('skill_id')
-        new_parsers = [
-            p for p in self.engine.intent_parsers if
-            not p.name.startswith(skill_id)]
-        self.engine.intent_parsers = new_parsers
+        self.engine.intent_parsers.remove_skill(skill_id)
+        self.registry_version += 1
 
     def handle_add_context(self, message):
         """ Add context
@@ -456,7 +749,8 @@ class IntentService(object):
         entity['match'] = word
         entity['key'] = word
         entity['origin'] = origin
-        self.context_manager.inject_context(entity)
+        self.get_session(get_session_id(message)).context_manager\
+            .inject_context(entity)
 
     def handle_remove_context(self, message):
         """ Remove specific context
@@ -466,8 +760,10 @@ class IntentService(object):
         """
         context = message.data.get('context')
         if context:
-            self.context_manager.remove_context(context)
+            self.get_session(get_session_id(message)).context_manager\
+                .remove_context(context)
 
     def handle_clear_context(self, message):
         """ Clears all keywords from context """
-        self.context_manager.clear_context()
+        self.get_session(get_session_id(message)).context_manager\
+            .clear_context()
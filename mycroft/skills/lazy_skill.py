@@ -0,0 +1,225 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Register skills at startup and import them when they are first used.
+
+Adapt intents are built in the skill's Python code, so a skill has to be
+loaded once before it can be loaded lazily. What it registered is then
+written to a manifest. On the next start the vocabulary, regex, intents and
+events of the skill are registered from the manifest and the skill module is
+imported when the first message for one of its events arrives.
+"""
+import json
+from os import listdir, makedirs
+from os.path import dirname, exists, join, splitext
+from threading import Lock
+
+from adapt.intent import Intent
+
+from mycroft.messagebus.message import Message
+from mycroft.skills.skill_data import load_regex, load_vocabulary
+from mycroft.util.log import LOG
+
+# Events every skill listens to, they don't need the skill to be loaded
+COMMON_EVENTS = {
+    'mycroft.stop',
+    'mycroft.skill.enable_intent',
+    'mycroft.skill.disable_intent',
+    'mycroft.skill.set_cross_context',
+    'mycroft.skill.remove_cross_context',
+    'mycroft.skills.settings.update'
+}
+
+
+def skill_data_dir(skill_path, kind, lang):
+    """ Find the vocab or regex directory of a skill like MycroftSkill. """
+    for directory in (join(skill_path, kind, lang),
+                      join(skill_path, 'locale', lang)):
+        if exists(directory):
+            return directory
+    return None
+
+
+def create_manifest(skill, modified, lang):
+    """ Describe what a loaded skill has registered.
+
+    A skill can only be loaded lazily if all events it listens to, apart
+    from the common ones, are its own intents and scheduled events. Skills
+    with fallbacks or repeating events have to run from the start.
+
+    Args:
+        skill (MycroftSkill): initialized skill
+        modified (float): modification time of the skill files
+        lang (str): language the data files were loaded for
+
+    Returns:
+        dict: the manifest
+    """
+    prefix = str(skill.skill_id) + ':'
+    lazy = not (skill.scheduled_repeats or
+                getattr(skill, 'instance_fallback_handlers', None))
+    events = []
+    for name, _ in skill.events:
+        if name.startswith(prefix):
+            if name not in events:
+                events.append(name)
+        elif name not in COMMON_EVENTS:
+            lazy = False
+
+    adapt_intents = []
+    padatious_intents = []
+    for _, intent in skill.registered_intents:
+        if isinstance(intent, Intent):
+            adapt_intents.append(intent.__dict__)
+        else:
+            padatious_intents.append(intent)
+
+    # Entities are looked up next to the .intent files using them
+    entities = {}
+    for intent in padatious_intents:
+        directory = dirname(intent['file_name'])
+        for f in sorted(listdir(directory)):
+            if f.endswith('.entity'):
+                entities[prefix + splitext(f)[0]] = join(directory, f)
+
+    return {
+        'name': skill.name,
+        'modified': modified,
+        'lang': lang,
+        'lazy': lazy,
+        'events': events,
+        'adapt_intents': adapt_intents,
+        'padatious_intents': padatious_intents,
+        'padatious_entities': [{'name': name, 'file_name': file_name}
+                               for name, file_name in entities.items()]
+    }
+
+
+def save_manifest(file_name, manifest):
+    try:
+        if not exists(dirname(file_name)):
+            makedirs(dirname(file_name))
+        with open(file_name, 'w') as f:
+            json.dump(manifest, f)
+    except (OSError, TypeError, ValueError):
+        LOG.exception('Could not write skill manifest ' + file_name)
+
+
+def load_manifest(file_name, modified, lang):
+    """ Read a manifest if it is still valid.
+
+    Returns:
+        dict: the manifest or None if the skill changed since it was written
+    """
+    try:
+        with open(file_name) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('modified') != modified or manifest.get('lang') != lang:
+        return None
+    return manifest
+
+
+class LazySkill(object):
+    """ Stand-in for a skill that hasn't been imported yet.
+
+    Registers the data files and intents of the skill from its manifest
+    and listens to the skill's events. The first event loads the skill and
+    is then passed to the handlers of the loaded skill, without sending it
+    over the messagebus again.
+
+    Args:
+        manifest (dict): manifest created by create_manifest()
+        path (str): skill directory
+        skill_id (str): skill id
+        bus: Mycroft messagebus connection
+        loader (callable): loads the skill, returning the MycroftSkill
+                           instance or None on failure
+    """
+    reload_skill = True
+
+    def __init__(self, manifest, path, skill_id, bus, loader):
+        self.name = manifest['name']
+        self.manifest = manifest
+        self.path = path
+        self.skill_id = skill_id
+        self.bus = bus
+        self.loader = loader
+        self.instance = None
+        self.loaded = False
+        self.lock = Lock()
+        self.events = []
+
+    def register(self):
+        """ Register the skill's data, intents and events. """
+        lang = self.manifest['lang']
+        vocab_dir = skill_data_dir(self.path, 'vocab', lang)
+        if vocab_dir:
+            load_vocabulary(vocab_dir, self.bus, self.skill_id)
+        regex_dir = skill_data_dir(self.path, 'regex', lang)
+        if regex_dir:
+            load_regex(regex_dir, self.bus, self.skill_id)
+
+        for intent in self.manifest['adapt_intents']:
+            self.bus.emit(Message('register_intent', intent))
+        for entity in self.manifest['padatious_entities']:
+            self.bus.emit(Message('padatious:register_entity', entity))
+        for intent in self.manifest['padatious_intents']:
+            self.bus.emit(Message('padatious:register_intent', intent))
+
+        for name in self.manifest['events']:
+            self.bus.on(name, self.handle_event)
+            self.events.append(name)
+
+    def _remove_events(self):
+        for name in self.events:
+            self.bus.remove(name, self.handle_event)
+        self.events = []
+
+    def handle_event(self, message):
+        """ Load the skill and pass the message on to it. """
+        with self.lock:
+            if not self.loaded:
+                LOG.info('Loading {} for {}'.format(self.name, message.type))
+                self.instance = self.loader()
+                self.loaded = True
+                # The loaded skill listens to the events from now on
+                self._remove_events()
+                if self.instance is None:
+                    self.detach()
+        if self.instance is not None:
+            self._deliver(message)
+
+    def _deliver(self, message):
+        """ Hand a message to the loaded skill's handlers. """
+        if hasattr(self.instance, 'dispatch'):
+            # Running in a skill host, with handlers on its own connection
+            self.instance.dispatch(message)
+        else:
+            self.bus.emitter.emit(message.type, message)
+
+    def converse(self, utterances, lang='en-us'):
+        return False
+
+    def detach(self):
+        self.bus.emit(Message('detach_skill',
+                              {'skill_id': str(self.skill_id) + ':'}))
+
+    def default_shutdown(self):
+        """ Remove the registrations, the skill won't be loaded anymore. """
+        with self.lock:
+            self.loaded = True
+            self._remove_events()
+        self.detach()
@@ -12,8 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+from collections import OrderedDict
+from hashlib import md5
 from subprocess import call
-from threading import Event
+from threading import Event, Lock
 from time import time as get_time, sleep
 
 from os.path import expanduser, isfile
@@ -21,7 +23,10 @@ from pkg_resources import get_distribution
 
 from mycroft.configuration import Configuration
 from mycroft.messagebus.message import Message
+from mycroft.session import get_session_id
 from mycroft.skills.core import FallbackSkill
+from mycroft.skills.intent_index import IntentIndex
+from mycroft.skills.padatious_worker import PadatiousWorker, WorkerError
 from mycroft.util.log import LOG
 
 
@@ -38,7 +43,7 @@ class PadatiousService(FallbackSkill):
         intent_cache = expanduser(self.config['intent_cache'])
 
         try:
-            from padatious import IntentContainer
+            import padatious
         except ImportError:
             LOG.error('Padatious not installed. Please re-run dev_setup.sh')
             try:
@@ -48,7 +53,8 @@ class PadatiousService(FallbackSkill):
                 pass
             return
 
-        self.container = IntentContainer(intent_cache)
+        # Training and matching run in a separate process
+        self.container = PadatiousWorker(intent_cache)
 
         self._bus = bus
         self.bus.on('padatious:register_intent', self.register_intent)
@@ -63,18 +69,29 @@ class PadatiousService(FallbackSkill):
         self.train_delay = self.config['train_delay']
         self.train_time = get_time() + self.train_delay
 
-        self.registered_intents = []
+        self.registered_intents = IntentIndex()  # name: file hash
+        self.registered_entities = IntentIndex()  # name: file hash
+        # Bumped every time training completes
+        self.model_version = 0
+
+        # Results of recent utterances, reused by the fallback handler
+        self.intent_results = OrderedDict()  # (ident, utterance): result
+        self.intent_results_lock = Lock()
 
     def train(self, message=None):
         if message is None:
             single_thread = False
         else:
             single_thread = message.data.get('single_thread', False)
-        self.finished_training_event.clear()
 
+        # Intents are matched with the previous model until training is done
         LOG.info('Training... (single_thread={})'.format(single_thread))
-        self.container.train(single_thread=single_thread)
-        LOG.info('Training complete.')
+        untrained = self.container.train(single_thread=single_thread)
+        LOG.info('Training complete, {} intents and entities '
+                 'retrained.'.format(untrained))
+        with self.intent_results_lock:
+            self.intent_results.clear()
+        self.model_version += 1
 
         self.finished_training_event.set()
         self.finished_initial_train = True
@@ -90,20 +107,35 @@ class PadatiousService(FallbackSkill):
             self.train_time = -1.0
             self.train()
 
-    def __detach_intent(self, intent_name):
-        self.registered_intents.remove(intent_name)
-        self.container.remove_intent(intent_name)
-
     def handle_detach_intent(self, message):
-        self.__detach_intent(message.data.get('intent_name'))
+        intent_name = message.data.get('intent_name')
+        if self.registered_intents.remove(intent_name):
+            self.container.remove_intent(intent_name)
 
     def handle_detach_skill(self, message):
         skill_id = message.data['skill_id']
-        remove_list = [i for i in self.registered_intents if skill_id in i]
-        for i in remove_list:
-            self.__detach_intent(i)
-
-    def _register_object(self, message, object_name, register_func):
+        for intent_name in self.registered_intents.remove_skill(skill_id):
+            self.container.remove_intent(intent_name)
+
+    @staticmethod
+    def _file_hash(file_name):
+        with open(file_name, 'rb') as f:
+            return md5(f.read()).hexdigest()
+
+    def _register_object(self, message, object_name, registered,
+                         register_func, remove_func):
+        """ Load an intent or entity file into the container.
+
+        Files registered again with unchanged content are skipped, so
+        reloading a skill doesn't lead to retraining.
+
+        Args:
+            message (Message): registration message
+            object_name (str): 'intent' or 'entity'
+            registered (IntentIndex): registered names and their file hashes
+            register_func: container method loading the file
+            remove_func: container method unloading an outdated version
+        """
         file_name = message.data['file_name']
         name = message.data['name']
 
@@ -113,16 +145,28 @@ class PadatiousService(FallbackSkill):
             LOG.warning('Could not find file ' + file_name)
             return
 
+        file_hash = self._file_hash(file_name)
+        old_hash = registered.get(name)
+        if old_hash == file_hash:
+            LOG.debug('Padatious ' + object_name + ' unchanged: ' + name)
+            return
+        if old_hash is not None:
+            remove_func(name)
+
         register_func(name, file_name)
+        registered.add(name, file_hash)
         self.train_time = get_time() + self.train_delay
         self.wait_and_train()
 
     def register_intent(self, message):
-        self.registered_intents.append(message.data['name'])
-        self._register_object(message, 'intent', self.container.load_intent)
+        self._register_object(message, 'intent', self.registered_intents,
+                              self.container.load_intent,
+                              self.container.remove_intent)
 
     def register_entity(self, message):
-        self._register_object(message, 'entity', self.container.load_entity)
+        self._register_object(message, 'entity', self.registered_entities,
+                              self.container.load_entity,
+                              self.container.remove_entity)
 
     def handle_fallback(self, message):
         if not self.finished_training_event.is_set():
@@ -131,16 +175,74 @@ class PadatiousService(FallbackSkill):
 
         utt = message.data.get('utterance')
         LOG.debug("Padatious fallback attempt: " + utt)
-        data = self.calc_intent(utt)
-        if data.conf < 0.5:
+        ident = message.context.get('ident') if message.context else None
+        with self.intent_results_lock:
+            data = self.intent_results.pop((ident, utt), None)
+        if data is None:
+            data = self.calc_intent(utt)
+        if data is None or data.conf < 0.5:
             return False
 
         data.matches['utterance'] = utt
 
-        self.service.add_active_skill(data.name.split(':')[0])
+        self.service.add_active_skill(data.name.split(':')[0],
+                                      get_session_id(message))
 
         self.bus.emit(message.reply(data.name, data=data.matches))
         return True
 
     def calc_intent(self, utt):
-        return self.container.calc_intent(utt)
+        """ Calculate the intent of an utterance.
+
+        Returns:
+            padatious MatchData or None if the worker failed, which is
+            treated as no match
+        """
+        try:
+            return self.container.calc_intent(utt)
+        except WorkerError as e:
+            LOG.error('Padatious could not match "{}": {}'.format(utt, e))
+            return None
+
+    def match_utterances(self, utterances, ident=None, threshold=1.0):
+        """ Calculate the intent of utterances handled by IntentService.
+
+        Every hypothesis is scored and the most confident match is kept so
+        the fallback handler doesn't need to calculate it again if no Adapt
+        intent matches.
+
+        Args:
+            utterances (list): alternative transcriptions of the utterance
+            ident: ident from the utterance message context
+            threshold (float): stop scoring once a match is this confident
+        Returns:
+            tuple of the best padatious match data and the index of its
+            utterance, the match data is None if the worker failed
+        """
+        best, index = None, 0
+        for i, utt in enumerate(utterances):
+            data = self.calc_intent(utt)
+            if data is None:
+                return None, 0  # Don't wait for the worker again
+            if best is None or data.conf > best.conf:
+                best, index = data, i
+            if best.conf >= threshold:
+                break
+        if best is not None:
+            self.remember_result(utterances[index], ident, best)
+        return best, index
+
+    def remember_result(self, utt, ident, data):
+        """ Keep a match result for the fallback handler.
+
+        Args:
+            utt (str): utterance the result belongs to
+            ident: ident from the utterance message context
+            data: the padatious match data
+        """
+        # Results from before training finished would be stale
+        if self.finished_training_event.is_set():
+            with self.intent_results_lock:
+                self.intent_results[(ident, utt)] = data
+                while len(self.intent_results) > 10:
+                    self.intent_results.popitem(last=False)
@@ -0,0 +1,266 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Padatious training and inference in a separate process.
+
+The worker process keeps the registered intent and entity files. Training
+builds a new IntentContainer from them in the background, while intents
+are still calculated with the previously trained container. Once training
+completes the new container replaces the old one.
+"""
+import atexit
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError
+from itertools import count
+from multiprocessing import get_context
+from threading import Lock, Thread
+
+from mycroft.util.log import LOG
+
+INTENT = 'intent'
+ENTITY = 'entity'
+
+
+class WorkerError(Exception):
+    """ The Padatious worker failed to handle a request. """
+    pass
+
+
+class _Worker(object):
+    """ Runs in the worker process, serving requests from the pipe. """
+
+    def __init__(self, conn, cache_dir):
+        self.conn = conn
+        self.cache_dir = cache_dir
+        self.files = OrderedDict()  # (INTENT or ENTITY, name): file name
+        self.container = None  # The last trained container
+        self.send_lock = Lock()
+        self.train_lock = Lock()
+
+    def reply(self, request_id, result=None, error=None):
+        if request_id is not None:
+            with self.send_lock:
+                self.conn.send((request_id, result, error))
+
+    def run(self):
+        while True:
+            try:
+                request_id, command, args = self.conn.recv()
+            except (EOFError, OSError):
+                break  # The skills process is gone
+            try:
+                if command == 'add':
+                    kind, name, file_name = args
+                    self.files[(kind, name)] = file_name
+                elif command == 'remove':
+                    self.files.pop(tuple(args), None)
+                elif command == 'train':
+                    Thread(target=self.train, args=(request_id,) + args,
+                           daemon=True).start()
+                elif command == 'calc_intent':
+                    self.reply(request_id, self.calc_intent(*args))
+                else:
+                    self.reply(request_id,
+                               error='Unknown command ' + str(command))
+            except Exception as e:
+                LOG.exception('Padatious worker failed on ' + command)
+                self.reply(request_id, error=repr(e))
+
+    def calc_intent(self, utt):
+        from padatious.match_data import MatchData
+        container = self.container
+        if container is None:
+            return MatchData('', '')
+        return container.calc_intent(utt)
+
+    def train(self, request_id, single_thread):
+        """ Train a new container and swap it in. """
+        from padatious import IntentContainer
+        try:
+            with self.train_lock:
+                container = IntentContainer(self.cache_dir)
+                for (kind, name), file_name in list(self.files.items()):
+                    try:
+                        if kind == INTENT:
+                            container.load_intent(name, file_name)
+                        else:
+                            container.load_entity(name, file_name)
+                    except Exception:
+                        LOG.exception('Could not load ' + file_name)
+                # Models of unchanged files are loaded from the cache, only
+                # new and changed ones are trained.
+                untrained = (len(container.intents.objects_to_train) +
+                             len(container.entities.objects_to_train))
+                # Don't start training processes just to compile matchers
+                container.train(single_thread=single_thread or untrained == 0)
+                self.container = container
+            self.reply(request_id, untrained)
+        except Exception as e:
+            LOG.exception('Padatious training failed')
+            self.reply(request_id, error=repr(e))
+
+
+def _worker_main(conn, cache_dir):
+    _Worker(conn, cache_dir).run()
+
+
+class PadatiousWorker(object):
+    """ Padatious IntentContainer running in a separate process.
+
+    Provides the container methods used by PadatiousService. The worker
+    process is restarted, with all files registered again, if it dies.
+
+    Args:
+        cache_dir (str): directory for the trained models
+        timeout (float): seconds to wait for an intent calculation
+    """
+
+    def __init__(self, cache_dir, timeout=5.0):
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.files = OrderedDict()  # (INTENT or ENTITY, name): file name
+        self.trained = False
+        self.request_ids = count()
+        self.pending = {}  # request id: Future
+        self.lock = Lock()
+        self.process = None
+        self.conn = None
+        with self.lock:
+            self._start()
+        # Runs before multiprocessing waits for its processes on exit
+        atexit.register(self.shutdown)
+
+    def _start(self):
+        """ Start the worker process and send it the registered files.
+
+        Must be called with the lock held.
+        """
+        # Requests sent to a previous worker will never be answered
+        for future in self.pending.values():
+            future.set_exception(WorkerError('Padatious worker stopped'))
+        self.pending = {}
+
+        # A clean process, forking the skills service while one of its
+        # threads holds a lock could leave the lock held in the child
+        context = get_context('spawn')
+        self.conn, child_conn = context.Pipe()
+        # Not a daemon, padatious trains in processes of its own
+        self.process = context.Process(target=_worker_main,
+                                       args=(child_conn, self.cache_dir))
+        self.process.start()
+        child_conn.close()
+        Thread(target=self._read_replies, args=(self.conn,),
+               daemon=True).start()
+        for (kind, name), file_name in self.files.items():
+            self.conn.send((None, 'add', (kind, name, file_name)))
+        if self.trained:
+            self.conn.send((None, 'train', (False,)))
+
+    def _read_replies(self, conn):
+        while True:
+            try:
+                request_id, result, error = conn.recv()
+            except (EOFError, OSError, TypeError):
+                # TypeError if shutdown() closes the pipe during recv()
+                break
+            with self.lock:
+                future = self.pending.pop(request_id, None)
+            if future is None:
+                continue  # The caller gave up waiting
+            if error:
+                future.set_exception(WorkerError(error))
+            else:
+                future.set_result(result)
+        # The worker is gone, fail the requests still waiting for it
+        with self.lock:
+            if conn is not self.conn:
+                return  # Already replaced
+            pending, self.pending = self.pending, {}
+        for future in pending.values():
+            future.set_exception(WorkerError('Padatious worker stopped'))
+
+    def _send(self, command, *args, reply=False):
+        """ Send a request to the worker, restarting it if it died.
+
+        Returns:
+            tuple of request id and Future for the reply if reply is True
+        """
+        with self.lock:
+            if not self.process.is_alive():
+                LOG.warning('Padatious worker died, restarting')
+                self._start()
+            request_id = future = None
+            if reply:
+                request_id = next(self.request_ids)
+                future = self.pending[request_id] = Future()
+            try:
+                self.conn.send((request_id, command, args))
+            except (OSError, ValueError) as e:
+                self.pending.pop(request_id, None)
+                raise WorkerError('Padatious worker unreachable') from e
+        return request_id, future
+
+    def _add(self, kind, name, file_name):
+        self.files[(kind, name)] = file_name
+        self._send('add', kind, name, file_name)
+
+    def _remove(self, kind, name):
+        self.files.pop((kind, name), None)
+        self._send('remove', kind, name)
+
+    def load_intent(self, name, file_name):
+        self._add(INTENT, name, file_name)
+
+    def load_entity(self, name, file_name):
+        self._add(ENTITY, name, file_name)
+
+    def remove_intent(self, name):
+        self._remove(INTENT, name)
+
+    def remove_entity(self, name):
+        self._remove(ENTITY, name)
+
+    def train(self, single_thread=False):
+        """ Train the registered files, returning when training is done.
+
+        Intents are calculated with the previous model until then.
+
+        Returns:
+            (int) number of intents and entities that had to be trained
+        """
+        _, future = self._send('train', single_thread, reply=True)
+        untrained = future.result()
+        self.trained = True
+        return untrained
+
+    def calc_intent(self, utt):
+        """ Calculate the intent of an utterance with the latest model.
+
+        Returns:
+            padatious MatchData
+        """
+        request_id, future = self._send('calc_intent', utt, reply=True)
+        try:
+            return future.result(self.timeout)
+        except TimeoutError as e:
+            with self.lock:
+                self.pending.pop(request_id, None)
+            raise WorkerError('Padatious worker did not answer') from e
+
+    def shutdown(self):
+        with self.lock:
+            self.conn.close()
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
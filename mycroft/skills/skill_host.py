@@ -0,0 +1,341 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Processes running skills outside of the skills service process.
+
+A skill host connects to the messagebus on its own. Skills loaded in it
+register their intents and receive their messages over that connection
+like any skill, while the skills service keeps the intent services, the
+event scheduler and the SkillManager. A skill crashing or hanging its host
+doesn't affect intent handling or the skills in other hosts.
+"""
+import atexit
+import signal
+from concurrent.futures import Future, TimeoutError
+from itertools import count
+from multiprocessing import get_context
+from threading import Lock, Thread
+
+from mycroft.messagebus.message import Message
+from mycroft.util.log import LOG
+
+from .core import FallbackSkill, create_skill_descriptor, load_skill
+from .handler_stats import handler_stats
+from .lazy_skill import create_manifest
+
+
+class SkillHostError(Exception):
+    """ The skill host failed to handle a request. """
+    pass
+
+
+class SkillHostTimeout(SkillHostError):
+    """ The skill host didn't answer a request in time. """
+    pass
+
+
+class _Host(object):
+    """ Runs in the skill host process, serving requests from the pipe. """
+
+    def __init__(self, conn, bus):
+        self.conn = conn
+        self.bus = bus
+        self.skills = {}  # skill_id: MycroftSkill
+        self.lock = Lock()
+
+    def reply(self, request_id, result=None, error=None):
+        if request_id is not None:
+            with self.lock:
+                self.conn.send((request_id, result, error))
+
+    def run(self):
+        while True:
+            try:
+                request = self.conn.recv()
+            except (EOFError, OSError):
+                break  # The skills service is gone or stopping the host
+            # Slow skill loads don't delay converse requests
+            Thread(target=self.handle, args=request, daemon=True).start()
+
+        with self.lock:
+            skills, self.skills = self.skills, {}
+        for instance in skills.values():
+            try:
+                instance.default_shutdown()
+            except Exception:
+                LOG.exception('Shutting down skill: ' + instance.name)
+
+    def handle(self, request_id, command, args):
+        try:
+            result = getattr(self, 'do_' + command)(*args)
+        except Exception as e:
+            LOG.exception('Skill host failed on ' + command)
+            self.reply(request_id, error=repr(e))
+        else:
+            self.reply(request_id, result)
+
+    def do_load(self, skill_path, skill_id, modified, lang,
+                blacklisted_skills):
+        instance = load_skill(create_skill_descriptor(skill_path), self.bus,
+                              skill_id, blacklisted_skills)
+        if instance is None:
+            return None
+        info = {'name': instance.name, 'reload_skill': instance.reload_skill}
+        if isinstance(instance, FallbackSkill):
+            # Fallbacks are called by the skills service, not over the bus
+            instance.default_shutdown()
+            info['fallback'] = True
+            return info
+        with self.lock:
+            self.skills[skill_id] = instance
+        info['manifest'] = create_manifest(instance, modified, lang)
+        return info
+
+    def do_shutdown(self, skill_id):
+        with self.lock:
+            instance = self.skills.pop(skill_id, None)
+        if instance:
+            instance.default_shutdown()
+
+    def do_dispatch(self, frame):
+        message = Message.deserialize(frame)
+        self.bus.emitter.emit(message.type, message)
+
+    def do_converse(self, skill_id, utterances, lang):
+        instance = self.skills.get(skill_id)
+        return bool(instance and instance.converse(utterances, lang))
+
+
+def _host_main(conn, connect_timeout):
+    from mycroft.configuration import Configuration
+    from mycroft.messagebus.client.ws import WebsocketClient
+    from mycroft.util import create_daemon
+
+    # Stopped by the skills service, not by Ctrl+C on the terminal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    bus = WebsocketClient()
+    Configuration.init(bus)
+    handler_stats.bind(bus)
+    create_daemon(bus.run_forever)
+    if not bus.connected_event.wait(connect_timeout):
+        LOG.warning('Skill host not connected to the messagebus yet')
+    _Host(conn, bus).run()
+
+
+class RemoteSkill(object):
+    """ Skill loaded in a skill host.
+
+    Stands in for the MycroftSkill instance in the SkillManager.
+    """
+
+    def __init__(self, host, skill_id, info):
+        self.host = host
+        self.skill_id = skill_id
+        self.name = info['name']
+        self.reload_skill = info['reload_skill']
+        self.fallback = info.get('fallback', False)
+        self.manifest = info.get('manifest')
+
+    def converse(self, utterances, lang='en-us'):
+        return self.host.call('converse', self.skill_id, utterances, lang,
+                              timeout=self.host.timeout)
+
+    def dispatch(self, message):
+        """ Pass a message to the handlers in the host process only. """
+        self.host.send('dispatch', message.serialize())
+
+    def default_shutdown(self):
+        self.host.unload(self.skill_id)
+
+
+class SkillHost(object):
+    """ Process hosting skills, started when the first skill is loaded.
+
+    Args:
+        index (int): number of the host
+        on_exit (callable): called with the host and the ids of its skills
+                            when the process stopped unexpectedly or was
+                            restarted because a skill hung while loading
+        timeout (float): seconds to wait for a converse request
+        load_timeout (float): seconds to wait for a skill to load
+    """
+
+    def __init__(self, index, on_exit, timeout=5.0, load_timeout=60.0):
+        self.index = index
+        self.on_exit = on_exit
+        self.timeout = timeout
+        self.load_timeout = load_timeout
+        self.skills = {}  # skill_id: RemoteSkill
+        self.request_ids = count()
+        self.pending = {}  # request id: Future
+        self.lock = Lock()
+        self.process = None
+        self.conn = None
+        atexit.register(self.stop)
+
+    def _start(self):
+        """ Start the host process. Must be called with the lock held. """
+        # A clean process, the skills service has threads running
+        context = get_context('spawn')
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_host_main,
+                                       args=(child_conn, self.timeout),
+                                       name='SkillHost-{}'.format(self.index))
+        self.process.start()
+        child_conn.close()
+        LOG.info('Started skill host {} (pid {})'.format(self.index,
+                                                         self.process.pid))
+        Thread(target=self._read_replies, args=(self.conn,),
+               daemon=True).start()
+
+    def _read_replies(self, conn):
+        while True:
+            try:
+                request_id, result, error = conn.recv()
+            except (EOFError, OSError):
+                break
+            with self.lock:
+                future = self.pending.pop(request_id, None)
+            if future is None:
+                continue  # The caller gave up waiting
+            if error:
+                future.set_exception(SkillHostError(error))
+            else:
+                future.set_result(result)
+
+        with self.lock:
+            if conn is not self.conn:
+                return  # Stopped or restarted on purpose
+            # The next request starts a new process instead of using the
+            # closed pipe, even if the dead one hasn't been reaped yet
+            process, self.process = self.process, None
+            self.conn = None
+            pending, self.pending = self.pending, {}
+            skills, self.skills = self.skills, {}
+        conn.close()
+        if process:
+            process.join(1)
+        for future in pending.values():
+            future.set_exception(SkillHostError('Skill host stopped'))
+        LOG.error('Skill host {} stopped unexpectedly'.format(self.index))
+        self.on_exit(self, list(skills))
+
+    def _stop(self):
+        """ Stop the host process. Must be called with the lock held.
+
+        Returns:
+            list: ids of the skills that were running in the host
+        """
+        conn, self.conn = self.conn, None
+        process, self.process = self.process, None
+        pending, self.pending = self.pending, {}
+        skills, self.skills = self.skills, {}
+        for future in pending.values():
+            future.set_exception(SkillHostError('Skill host stopped'))
+        if conn:
+            conn.close()  # Lets the host shut down its skills
+        if process:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+        return list(skills)
+
+    def _send(self, command, args, reply):
+        with self.lock:
+            if self.process is None or not self.process.is_alive():
+                self._start()
+            request_id = future = None
+            if reply:
+                request_id = next(self.request_ids)
+                future = self.pending[request_id] = Future()
+            try:
+                self.conn.send((request_id, command, args))
+            except (OSError, ValueError) as e:
+                self.pending.pop(request_id, None)
+                raise SkillHostError('Skill host unreachable') from e
+        return request_id, future
+
+    def call(self, command, *args, timeout=None):
+        """ Run a command in the host and wait for the result. """
+        request_id, future = self._send(command, args, True)
+        try:
+            return future.result(timeout)
+        except TimeoutError as e:
+            with self.lock:
+                self.pending.pop(request_id, None)
+            raise SkillHostTimeout('Skill host {} did not answer {}'.format(
+                self.index, command)) from e
+
+    def send(self, command, *args):
+        """ Run a command in the host without waiting for it. """
+        try:
+            self._send(command, args, False)
+        except SkillHostError:
+            LOG.exception('Failed to send {} to skill host {}'.format(
+                command, self.index))
+
+    def load(self, skill_path, skill_id, modified, lang,
+             blacklisted_skills=None):
+        """ Load a skill in the host.
+
+        If the skill doesn't finish loading within load_timeout seconds the
+        host is restarted, a hanging skill would block it otherwise. The
+        other skills of the host are passed to on_exit to load them again.
+
+        Returns:
+            RemoteSkill: the loaded skill or None on failure. Fallback skills
+                         are shut down again and have fallback set, they
+                         have to be loaded in the skills service.
+        """
+        try:
+            info = self.call('load', skill_path, skill_id, modified, lang,
+                             blacklisted_skills, timeout=self.load_timeout)
+        except SkillHostTimeout:
+            LOG.error('{} did not load within {} seconds, restarting skill '
+                      'host {}'.format(skill_id, self.load_timeout,
+                                       self.index))
+            self.on_exit(self, self.restart())
+            return None
+        except SkillHostError:
+            LOG.exception('Failed to load skill: ' + skill_id)
+            return None
+        if info is None:
+            return None
+        skill = RemoteSkill(self, skill_id, info)
+        if not skill.fallback:
+            with self.lock:
+                self.skills[skill_id] = skill
+        return skill
+
+    def unload(self, skill_id):
+        """ Shut down a skill in the host. """
+        with self.lock:
+            if self.skills.pop(skill_id, None) is None:
+                return
+        self._send('shutdown', (skill_id,), False)
+
+    def restart(self):
+        """ Restart the host process.
+
+        Returns:
+            list: ids of the skills that were running in the host
+        """
+        with self.lock:
+            skills = self._stop()
+            self._start()
+        return skills
+
+    def stop(self):
+        with self.lock:
+            self._stop()
@@ -16,6 +16,7 @@ import gc
 import json
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from glob import glob
 from itertools import chain
 
@@ -33,6 +34,11 @@ from mycroft.util.log import LOG
 from mycroft.api import DeviceApi, is_paired
 
 from .core import load_skill, create_skill_descriptor, MainModule
+from .handler_stats import handler_stats
+from .lazy_skill import LazySkill, create_manifest, load_manifest, \
+    save_manifest
+from .skill_host import RemoteSkill, SkillHost
+from .skill_watcher import SkillWatcher
 
 
 DEBUG = Configuration.get().get("debug", False)
@@ -85,6 +91,26 @@ class SkillManager(Thread):
         self.loaded_skills = {}
         self.bus = bus
         self.enclosure = EnclosureAPI(bus)
+        # Skills are imported and initialized on these threads
+        self.load_executor = ThreadPoolExecutor(
+            max_workers=max(1, skills_config.get('load_workers', 4)))
+
+        # Skills registered at startup but imported on first use
+        self.lazy_load = skills_config.get('lazy_load', False)
+        self.manifest_dir = expanduser(
+            skills_config.get('manifest_cache', '~/.mycroft/skill_manifests'))
+
+        # Processes the skills are spread over, none to run them here
+        self.hosts = [SkillHost(i, self._host_stopped,
+                                load_timeout=skills_config.get(
+                                    'host_load_timeout', 60))
+                      for i in range(skills_config.get('hosts', 0))]
+
+        # Skill directories reported as changed by the watcher
+        self.watcher = None
+        self.changed_skills = set()
+        self.changed_lock = Lock()
+        self._wake_event = Event()
 
         # Schedule install/update of default skill
         self.msm = self.create_msm()
@@ -113,6 +139,10 @@ class SkillManager(Thread):
         bus.on('skillmanager.deactivate', self.deactivate_skill)
         bus.on('skillmanager.keep', self.deactivate_except)
         bus.on('skillmanager.activate', self.activate_skill)
+        bus.on('skillmanager.restart_host', self.restart_host)
+
+        # Statistics of the handlers of the skills in this process
+        handler_stats.bind(bus)
 
     @staticmethod
     def get_lock():
@@ -174,6 +204,7 @@ class SkillManager(Thread):
 
     def schedule_now(self, message=None):
         self.next_download = time.time() - 1
+        self._wake_event.set()
 
     @staticmethod
     @property
@@ -360,24 +391,156 @@ class SkillManager(Thread):
                                    "id": skill["id"]}))
 
         skill["loaded"] = True
-        desc = create_skill_descriptor(skill_path)
-        skill["instance"] = load_skill(desc,
-                                       self.bus, skill["id"],
-                                       BLACKLISTED_SKILLS)
-
         skill["last_modified"] = modified
-        if skill['instance'] is not None:
+        lazy_skill = self._create_lazy_skill(skill_path, skill)
+        if lazy_skill:
+            skill["instance"] = lazy_skill
+            lazy_skill.register()
             self.bus.emit(Message('mycroft.skills.loaded',
                                   {'path': skill_path,
                                    'id': skill['id'],
-                                   'name': skill['instance'].name,
+                                   'name': lazy_skill.name,
                                    'modified': modified}))
             return True
+        return self._load_skill_instance(skill_path, skill) is not None
+
+    def _load_skill_instance(self, skill_path, skill):
+        """ Import and initialize a skill.
+
+        Arguments:
+            skill_path: skill directory
+            skill: entry of the skill in loaded_skills
+
+        Returns:
+            MycroftSkill: the loaded skill or None on failure
+        """
+        lang = Configuration.get().get('lang')
+        instance = None
+        if self.hosts:
+            host = min(self.hosts, key=lambda h: len(h.skills))
+            instance = host.load(skill_path, skill["id"],
+                                 skill["last_modified"], lang,
+                                 BLACKLISTED_SKILLS)
+        if not self.hosts or (instance is not None and instance.fallback):
+            # Fallbacks are run by the intent failure handler in this process
+            desc = create_skill_descriptor(skill_path)
+            instance = load_skill(desc, self.bus, skill["id"],
+                                  BLACKLISTED_SKILLS)
+        skill["instance"] = instance
+        if instance is not None:
+            if self.lazy_load:
+                if isinstance(instance, RemoteSkill):
+                    manifest = instance.manifest
+                else:
+                    manifest = create_manifest(instance,
+                                               skill["last_modified"], lang)
+                save_manifest(self._manifest_file(skill), manifest)
+            self.bus.emit(Message('mycroft.skills.loaded',
+                                  {'path': skill_path,
+                                   'id': skill['id'],
+                                   'name': instance.name,
+                                   'modified': skill["last_modified"]}))
         else:
             self.bus.emit(Message('mycroft.skills.loading_failure',
                                   {'path': skill_path,
                                    'id': skill['id']}))
-        return False
+        return instance
+
+    def _manifest_file(self, skill):
+        return join(self.manifest_dir, skill["id"] + '.json')
+
+    def _create_lazy_skill(self, skill_path, skill):
+        """ Create a stand-in for the skill if it can be loaded on demand.
+
+        Returns:
+            LazySkill or None if the skill has to be loaded now
+        """
+        if not self.lazy_load or skill["id"] in BLACKLISTED_SKILLS:
+            return None
+        manifest = load_manifest(self._manifest_file(skill),
+                                 skill["last_modified"],
+                                 Configuration.get().get('lang'))
+        if not manifest or not manifest['lazy']:
+            return None
+        LOG.info('Registered {}, loading it on first use'.format(skill["id"]))
+        return LazySkill(manifest, skill_path, skill["id"], self.bus,
+                         lambda: self._load_skill_instance(skill_path, skill))
+
+    def _load_skills(self, skill_paths):
+        """ Load or reload skills on the worker pool.
+
+        Skills are independent from each other, so they are loaded in
+        parallel, bounded by the load_workers setting.
+
+        Arguments:
+            skill_paths: list of skill directories
+
+        Returns:
+            bool: True if any skill was loaded or reloaded
+        """
+        results = self.load_executor.map(self._load_or_reload_skill,
+                                         skill_paths)
+        return any(list(results))
+
+    def _start_watcher(self):
+        """ Start watching the skills directory for changes.
+
+        Returns:
+            SkillWatcher or None if the skills have to be polled instead
+        """
+        if not skills_config.get('watch', True):
+            return None
+        try:
+            watcher = SkillWatcher(self.msm.skills_dir, self._queue_changed,
+                                   skills_config.get('watch_debounce', 1.0))
+        except OSError as e:
+            LOG.warning('Can\'t watch the skills directory ({}), polling '
+                        'for changes instead'.format(repr(e)))
+            return None
+        watcher.start()
+        return watcher
+
+    def _queue_changed(self, skill_paths):
+        """ Queue skill directories to be checked by the main loop. """
+        with self.changed_lock:
+            self.changed_skills.update(p.rstrip('/') for p in skill_paths)
+            self._wake_event.set()
+
+    def _take_changed(self):
+        """ Get and clear the queued skill directories. """
+        with self.changed_lock:
+            changed, self.changed_skills = self.changed_skills, set()
+            self._wake_event.clear()
+        return changed
+
+    def _host_stopped(self, host, skill_ids):
+        """ Load the skills of a stopped skill host again.
+
+        Arguments:
+            host: the SkillHost
+            skill_ids: ids of the skills that were running in it
+        """
+        paths = []
+        for path, skill in list(self.loaded_skills.items()):
+            instance = skill.get('instance')
+            if (isinstance(instance, RemoteSkill) and
+                    instance.host is host and skill['id'] in skill_ids):
+                # The skill couldn't remove its intents itself
+                self.bus.emit(Message('detach_skill',
+                                      {'skill_id': skill['id'] + ':'}))
+                skill['loaded'] = False
+                paths.append(path)
+        LOG.info('Reloading {} skills of skill host {}'.format(len(paths),
+                                                               host.index))
+        self._queue_changed(paths)
+
+    def restart_host(self, message):
+        """ Restart a skill host and the skills running in it. """
+        try:
+            host = self.hosts[message.data.get('host', 0)]
+            self._host_stopped(host, host.restart())
+        except Exception as e:
+            LOG.error('Couldn\'t restart skill host, {}'.format(repr(e)))
 
     def load_priority(self):
         skills = {skill.name: skill for skill in self.msm.list()}
@@ -408,29 +571,43 @@ class SkillManager(Thread):
         # check if skill updates are enabled
         update = Configuration.get()["skills"]["auto_update"]
 
-        # Scan the file folder that contains Skills.  If a Skill is updated,
-        # unload the existing version from memory and reload from the disk.
+        # Skill directories changed on disk are reported by the watcher,
+        # falling back to scanning the skills folder every 2 seconds. When a
+        # Skill is updated, unload the existing version from memory and
+        # reload from the disk.
+        self.watcher = self._start_watcher()
+        full_scan = True
         while not self._stop_event.is_set():
             # Update skills once an hour if update is enabled
             if time.time() >= self.next_download and update:
                 self.download_skills()
-
-            # Look for recently changed skill(s) needing a reload
-            # checking skills dir and getting all skills there
-            skill_paths = glob(join(self.msm.skills_dir, '*/'))
-            still_loading = False
-            for skill_path in skill_paths:
-                still_loading = (
-                        self._load_or_reload_skill(skill_path) or
-                        still_loading
-                )
-            if not has_loaded and not still_loading and len(skill_paths) > 0:
-                has_loaded = True
-                self.bus.emit(Message('mycroft.skills.initialized'))
-
-            self._unload_removed(skill_paths)
-            # Pause briefly before beginning next scan
-            time.sleep(2)
+                full_scan = True
+
+            watching = self.watcher is not None and self.watcher.is_alive()
+            changed = self._take_changed()
+            if full_scan or not watching or changed:
+                skill_paths = glob(join(self.msm.skills_dir, '*/'))
+                if full_scan or not watching:
+                    self._load_skills(skill_paths)
+                else:
+                    self._load_skills([p for p in skill_paths
+                                       if p.rstrip('/') in changed])
+                if not has_loaded and len(skill_paths) > 0:
+                    # All skills are loaded once the first batch is done
+                    has_loaded = True
+                    self.bus.emit(Message('mycroft.skills.initialized'))
+                self._unload_removed(skill_paths)
+            full_scan = False
+
+            if watching:
+                # Sleep until something changed or the next update is due
+                timeout = 60
+                if update:
+                    timeout = min(timeout, self.next_download - time.time())
+                self._wake_event.wait(max(timeout, 0))
+            else:
+                # Pause briefly before beginning next scan
+                time.sleep(2)
 
     def send_skill_list(self, message=None):
         """
@@ -488,6 +665,7 @@ class SkillManager(Thread):
         if not self.loaded_skills[skill].get('active', True):
             self.loaded_skills[skill]['loaded'] = False
             self.loaded_skills[skill]['active'] = True
+            self._queue_changed([skill])
 
     def activate_skill(self, message):
         """ Activate a deactivated skill. """
@@ -508,8 +686,13 @@ class SkillManager(Thread):
     def stop(self):
         """ Tell the manager to shutdown """
         self._stop_event.set()
+        self._wake_event.set()
+        if self.watcher:
+            self.watcher.stop()
+        self.load_executor.shutdown(wait=False)
 
-        # Do a clean shutdown of all skills
+        # Do a clean shutdown of all skills, the skill hosts shut down the
+        # skills still running in them when stopped
         for name, skill_info in self.loaded_skills.items():
             instance = skill_info.get('instance')
             if instance:
@@ -517,6 +700,8 @@ class SkillManager(Thread):
                     instance.default_shutdown()
                 except Exception:
                     LOG.exception('Shutting down skill: ' + name)
+        for host in self.hosts:
+            host.stop()
 
     def handle_converse_request(self, message):
         """ Check if the targeted skill id can handle conversation
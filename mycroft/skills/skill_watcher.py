@@ -0,0 +1,239 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Detect changed skills with inotify instead of rescanning the disk.
+
+Every directory of every skill is watched, skipping the same hidden
+directories and files as the modification time check of the SkillManager.
+Changes are collected until the skills directory has been quiet for a
+moment, so a git pull touching many files results in a single reload.
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+from os.path import isdir, join
+from threading import Event, Thread
+
+from mycroft.util.log import LOG
+
+# Event masks from <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF |
+              IN_ONLYDIR)
+
+# struct inotify_event: wd, mask, cookie, len, followed by the name
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def _ignored(name):
+    """ Files and directories that never cause a skill to be reloaded. """
+    return (name.startswith('.') or name.endswith('.pyc') or
+            name in ('settings.json', '__pycache__'))
+
+
+class Inotify(object):
+    """ Minimal inotify binding using the C library.
+
+    Raises:
+        OSError: if inotify isn't available on this system
+    """
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library('c')
+        if libc_name is None:
+            raise OSError(errno.ENOSYS, 'C library not found')
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self.libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, 'inotify is not supported')
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            self._raise_error()
+
+    @staticmethod
+    def _raise_error(path=None):
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error), path)
+
+    def add_watch(self, path, mask):
+        """ Watch a directory.
+
+        Returns:
+            int: watch descriptor
+        """
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            self._raise_error(path)
+        return wd
+
+    def read(self, timeout):
+        """ Read the pending events, waiting at most timeout seconds.
+
+        Returns:
+            list of (watch descriptor, mask, name) tuples
+        """
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        pos = 0
+        while pos + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, pos)
+            pos += EVENT_HEADER.size
+            name = os.fsdecode(data[pos:pos + length].rstrip(b'\0'))
+            pos += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class SkillWatcher(Thread):
+    """ Report the skill directories changed on disk.
+
+    Args:
+        skills_dir (str): directory the skills are installed in
+        callback (callable): called with a set of changed skill directories
+                             once no changes were seen for debounce seconds
+        debounce (float): seconds to wait for more changes
+        max_delay (float): seconds after which changes are reported even if
+                           the skills keep changing
+
+    Raises:
+        OSError: if the skills directory can't be watched
+    """
+
+    def __init__(self, skills_dir, callback, debounce=1.0, max_delay=10.0):
+        super(SkillWatcher, self).__init__()
+        self.daemon = True
+        self.skills_dir = skills_dir.rstrip('/')
+        self.callback = callback
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._stop_event = Event()
+        self.watches = {}  # watch descriptor: (skill dir, watched dir)
+        self.inotify = Inotify()
+        try:
+            self.root = self.inotify.add_watch(self.skills_dir, WATCH_MASK)
+            for skill_dir in self.skill_dirs():
+                self._watch_tree(skill_dir, skill_dir)
+        except OSError:
+            self.inotify.close()
+            raise
+
+    def skill_dirs(self):
+        """ List the skill directories. """
+        return [join(self.skills_dir, name)
+                for name in os.listdir(self.skills_dir)
+                if not _ignored(name) and isdir(join(self.skills_dir, name))]
+
+    def _watch_tree(self, skill_dir, directory):
+        """ Watch a directory of a skill and its subdirectories. """
+        for root, dirs, _ in os.walk(directory):
+            dirs[:] = [d for d in dirs if not _ignored(d)]
+            try:
+                wd = self.inotify.add_watch(root, WATCH_MASK)
+            except OSError as e:
+                if e.errno in (errno.ENOENT, errno.ENOTDIR):
+                    continue  # Removed in the meantime
+                raise
+            self.watches[wd] = (skill_dir, root)
+
+    def _handle_event(self, wd, mask, name):
+        """ Update the watches for an event.
+
+        Returns:
+            iterable of the skill directories changed by the event
+        """
+        if mask & IN_Q_OVERFLOW:
+            LOG.warning('Skill change events were lost, checking all skills')
+            return self.skill_dirs()
+        if mask & IN_IGNORED:
+            self.watches.pop(wd, None)  # The directory is gone
+            return ()
+
+        if wd == self.root:
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                LOG.warning('Skills directory removed, stopping watcher')
+                self._stop_event.set()
+                return ()
+            if not mask & IN_ISDIR or _ignored(name):
+                return ()
+            skill_dir = join(self.skills_dir, name)
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                self._watch_tree(skill_dir, skill_dir)
+            return (skill_dir,)
+
+        if wd not in self.watches:
+            return ()
+        skill_dir, directory = self.watches[wd]
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            return (skill_dir,)
+        if _ignored(name):
+            return ()
+        if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+            self._watch_tree(skill_dir, join(directory, name))
+        return (skill_dir,)
+
+    def run(self):
+        changed = set()
+        first_change = last_change = 0
+        try:
+            while not self._stop_event.is_set():
+                if changed:
+                    now = time.monotonic()
+                    timeout = min(last_change + self.debounce,
+                                  first_change + self.max_delay) - now
+                else:
+                    timeout = 1.0
+                for wd, mask, name in self.inotify.read(max(timeout, 0)):
+                    skill_dirs = self._handle_event(wd, mask, name)
+                    if skill_dirs:
+                        last_change = time.monotonic()
+                        if not changed:
+                            first_change = last_change
+                        changed.update(skill_dirs)
+
+                now = time.monotonic()
+                if changed and (now >= last_change + self.debounce or
+                                now >= first_change + self.max_delay):
+                    self.callback(changed)
+                    changed = set()
+        except Exception:
+            LOG.exception('Skill watcher failed')
+        finally:
+            self.inotify.close()
+
+    def stop(self):
+        self._stop_event.set()
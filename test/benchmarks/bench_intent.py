@@ -0,0 +1,311 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Intent matching latency benchmark.
+
+Loads the vocab, regex, .intent and .entity files of a directory of skills
+into IntentService and PadatiousService, connected by an in-process bus
+without any websocket, then replays an utterance corpus. Skills are added
+in steps, after each step the corpus is replayed and the latency of
+normalize(), the context lookup, Adapt, Padatious and the complete
+utterance handling is reported together with the process memory.
+
+No skill code is run. Every .voc file gets an Adapt intent requiring that
+vocabulary, standing in for the intents skills build in Python.
+
+Usage:
+    python -m test.benchmarks.bench_intent --skills /opt/mycroft/skills \\
+        --corpus utterances.txt --steps 4 -o report.json
+    python -m test.benchmarks.bench_intent --generate 80 --steps 4
+"""
+import argparse
+import gc
+import json
+import platform
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import Future
+from os import listdir, makedirs, walk
+from os.path import basename, isdir, join, splitext
+
+import psutil
+from adapt.intent import IntentBuilder
+from pyee import EventEmitter
+
+from mycroft.configuration import Configuration
+from mycroft.messagebus.message import Message
+from mycroft.skills.intent_service import IntentService
+from mycroft.skills.lazy_skill import skill_data_dir
+from mycroft.skills.padatious_service import PadatiousService
+from mycroft.skills.skill_data import (load_regex, load_vocabulary,
+                                       munge_intent_parser)
+from mycroft.util.parse import normalize
+from test.benchmarks.bench_messagebus import percentile
+
+
+class DirectBus(EventEmitter):
+    """Bus delivering messages synchronously to handlers in this process."""
+
+    def emit(self, message, *args):
+        if isinstance(message, Message):
+            super().emit(message.type, message)
+        else:
+            super().emit(message, *args)  # pyee internal events
+
+    def request(self, message, reply_types):
+        """Send a request, the reply is delivered before emit returns."""
+        future = Future()
+
+        def resolve(reply):
+            if not future.done():
+                future.set_result(reply)
+        for reply_type in reply_types:
+            self.on(reply_type, resolve)
+        self.emit(message)
+        for reply_type in reply_types:
+            self.remove_listener(reply_type, resolve)
+        return future
+
+
+def generate_skills(directory, count, lang):
+    """Write count synthetic skills with vocab and intent files."""
+    for i in range(count):
+        vocab_dir = join(directory, 'skill-{}'.format(i), 'vocab', lang)
+        makedirs(vocab_dir)
+        for j in range(3):
+            with open(join(vocab_dir, 'Keyword{}.voc'.format(j)), 'w') as f:
+                f.write('keyword{0}x{1}\nalias{0}x{1}\n'.format(i, j))
+        with open(join(vocab_dir, 'ask.intent'), 'w') as f:
+            f.write('ask skill {0} about {{thing}}\n'
+                    'what does skill {0} say about {{thing}}\n'
+                    'tell me something from skill {0}\n'.format(i))
+        with open(join(vocab_dir, 'thing.entity'), 'w') as f:
+            f.write('weather\nnews\ntime\n')
+
+
+def data_files(directory, extension):
+    for path, _, files in walk(directory):
+        for f in sorted(files):
+            if f.endswith(extension):
+                yield join(path, f)
+
+
+class SkillLoader(object):
+    """Register the intent data of skills on the bus."""
+
+    def __init__(self, bus, lang):
+        self.bus = bus
+        self.lang = lang
+        self.adapt_intents = 0
+        self.padatious_intents = 0
+        self.corpus = []
+
+    def load(self, skill_dir):
+        skill_id = basename(skill_dir)
+        vocab_dir = skill_data_dir(skill_dir, 'vocab', self.lang)
+        if vocab_dir:
+            load_vocabulary(vocab_dir, self.bus, skill_id)
+            for path in data_files(vocab_dir, '.voc'):
+                self.register_adapt_intent(path, skill_id)
+            for path in data_files(vocab_dir, '.entity'):
+                self.bus.emit(Message('padatious:register_entity', {
+                    'file_name': path,
+                    'name': skill_id + ':' + splitext(basename(path))[0]}))
+            for path in data_files(vocab_dir, '.intent'):
+                self.bus.emit(Message('padatious:register_intent', {
+                    'file_name': path,
+                    'name': skill_id + ':' + basename(path)}))
+                self.padatious_intents += 1
+                self.add_to_corpus(path)
+        regex_dir = skill_data_dir(skill_dir, 'regex', self.lang)
+        if regex_dir:
+            load_regex(regex_dir, self.bus, skill_id)
+
+    def register_adapt_intent(self, path, skill_id):
+        vocab = splitext(basename(path))[0]
+        intent = IntentBuilder(vocab + 'Intent').require(vocab).build()
+        munge_intent_parser(intent, intent.name, skill_id)
+        self.bus.emit(Message('register_intent', intent.__dict__))
+        self.adapt_intents += 1
+        with open(path) as f:
+            for line in f:
+                if line.strip() and not line.startswith('#'):
+                    self.corpus.append(line.split('|')[0].strip())
+                    break
+
+    def add_to_corpus(self, path):
+        """Use example sentences of a .intent file as utterances."""
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#') and '(' not in line:
+                    self.corpus.append(re.sub(r'{\w+}', 'the weather',
+                                              line))
+
+
+class Measurement(object):
+    """Latencies of one stage of intent matching."""
+
+    def __init__(self):
+        self.times = []
+
+    def __call__(self, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        self.times.append(time.perf_counter() - start)
+        return result
+
+    def report(self):
+        if not self.times:
+            return None
+        latencies = [t * 1000 for t in self.times]
+        return {
+            'count': len(latencies),
+            'per_second': len(latencies) / max(sum(self.times), 1e-9),
+            'latency_ms': {
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'max': max(latencies)
+            }
+        }
+
+
+def replay(intent_service, padatious, corpus, lang, repeat):
+    """Match every utterance of the corpus repeat times, stage by stage."""
+    stages = {name: Measurement() for name in
+              ('normalize', 'context', 'adapt', 'padatious', 'utterance')}
+    context_manager = intent_service.get_session().context_manager
+    for _ in range(repeat):
+        for utt in corpus:
+            stages['normalize'](normalize, utt, lang)
+            stages['context'](context_manager.get_context)
+            stages['adapt'](intent_service._adapt_determine_intent, [utt],
+                            lang, context_manager)
+            if padatious:
+                stages['padatious'](padatious.calc_intent, utt)
+                stages['utterance'](intent_service.handle_utterance,
+                                    Message('recognizer_loop:utterance',
+                                            {'utterances': [utt],
+                                             'lang': lang}))
+    return {name: stage.report() for name, stage in stages.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--skills', help='directory of skills to load')
+    parser.add_argument('--generate', type=int, default=0,
+                        help='generate this many synthetic skills instead')
+    parser.add_argument('--corpus',
+                        help='file with one utterance per line, by default '
+                             'the example sentences of the skills are used')
+    parser.add_argument('--lang', default='en-us')
+    parser.add_argument('--steps', type=int, default=4,
+                        help='number of steps to add the skills in')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='times the corpus is replayed per step')
+    parser.add_argument('-o', '--output', help='write JSON report here')
+    args = parser.parse_args(argv)
+
+    temp_dir = tempfile.mkdtemp(prefix='bench_intent')
+    skills_dir = args.skills
+    if args.generate:
+        skills_dir = join(temp_dir, 'skills')
+        generate_skills(skills_dir, args.generate, args.lang)
+    if not skills_dir:
+        parser.error('--skills or --generate is required')
+    skill_dirs = sorted(join(skills_dir, d) for d in listdir(skills_dir)
+                        if isdir(join(skills_dir, d)))
+
+    # Keep the Padatious models out of the real intent cache
+    Configuration.get()['padatious']['intent_cache'] = join(temp_dir,
+                                                            'intent_cache')
+    bus = DirectBus()
+
+    def converse_request(message):
+        # No skills are running to converse, answer like the skill manager
+        bus.emit(message.reply('skill.converse.response',
+                               {'skill_id': message.data['skill_id'],
+                                'result': False}))
+    bus.on('skill.converse.request', converse_request)
+    intent_service = IntentService(bus)
+    # Measure the engines, not the intent cache
+    intent_service.intent_cache_size = 0
+    padatious = PadatiousService(bus, intent_service)
+    if not hasattr(padatious, 'container'):
+        print('Padatious is not installed, only measuring Adapt',
+              file=sys.stderr)
+        padatious = None
+    loader = SkillLoader(bus, args.lang)
+
+    process = psutil.Process()
+    gc.collect()
+    results = []
+    rss_start = process.memory_info().rss
+    steps = max(1, min(args.steps, len(skill_dirs)))
+    for step in range(1, steps + 1):
+        start = len(skill_dirs) * (step - 1) // steps
+        end = len(skill_dirs) * step // steps
+        load_start = time.perf_counter()
+        for skill_dir in skill_dirs[start:end]:
+            loader.load(skill_dir)
+        load_time = time.perf_counter() - load_start
+        train_time = None
+        if padatious:
+            train_start = time.perf_counter()
+            padatious.train()
+            train_time = time.perf_counter() - train_start
+
+        if args.corpus:
+            with open(args.corpus) as f:
+                corpus = [line.strip() for line in f if line.strip()]
+        else:
+            corpus = loader.corpus
+
+        gc.collect()
+        rss = process.memory_info().rss
+        result = {
+            'skills': end,
+            'adapt_intents': loader.adapt_intents,
+            'padatious_intents': loader.padatious_intents,
+            'utterances': len(corpus),
+            'load_seconds': load_time,
+            'train_seconds': train_time,
+            'rss': rss,
+            'rss_growth': rss - rss_start,
+            'stages': replay(intent_service, padatious, corpus, args.lang,
+                             args.repeat)
+        }
+        results.append(result)
+        print(json.dumps(result), file=sys.stderr)
+
+    report = {
+        'benchmark': 'intent',
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': psutil.cpu_count(),
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == '__main__':
+    main()
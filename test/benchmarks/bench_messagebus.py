@@ -0,0 +1,227 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Messagebus throughput and latency benchmark.
+
+Starts the messagebus service on a loopback port in a child process,
+attaches WebsocketClients and floods them with messages, once for every
+combination of fan-out (number of receiving clients), payload size and
+handler cost. Results are printed as JSON and optionally written to a file.
+
+Usage:
+    python -m test.benchmarks.bench_messagebus --clients 1,4,8 \\
+        --sizes 100,10000 --costs 0,0.001 --messages 2000 -o report.json
+"""
+import argparse
+import json
+import platform
+import socket
+import sys
+import time
+from multiprocessing import Process
+from threading import Event, Lock, Thread
+
+import psutil
+
+from mycroft.messagebus.client.ws import WebsocketClient
+from mycroft.messagebus.message import Message
+
+HOST = '127.0.0.1'
+ROUTE = '/core'
+
+
+def serve(port):
+    """Run the messagebus service, target of the service process."""
+    from tornado import ioloop
+    from mycroft.messagebus.service.__main__ import create_app
+    create_app(ROUTE, debug=False).listen(port, HOST)
+    ioloop.IOLoop.instance().start()
+
+
+def wait_for_port(port, timeout=10):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        try:
+            socket.create_connection((HOST, port), 0.1).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError('Messagebus service did not start')
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(len(values) * pct / 100), len(values) - 1)]
+
+
+class RssSampler(Thread):
+    """Track peak resident memory of a process."""
+
+    def __init__(self, pid, interval=0.05):
+        super().__init__(daemon=True)
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.peak = self.process.memory_info().rss
+        self.stopped = Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        return self.peak
+
+
+class Scenario(object):
+    """One benchmark run with fixed fan-out, payload and handler cost."""
+
+    def __init__(self, port, clients, size, cost, messages, codec):
+        self.port = port
+        self.fan_out = clients
+        self.payload = 'x' * size
+        self.size = size
+        self.cost = cost
+        self.messages = messages
+        self.codec = codec
+
+        self.latencies = []
+        self.lock = Lock()
+        self.done = Event()
+        self.expected = clients * messages
+
+    def connect(self):
+        client = WebsocketClient(HOST, self.port, ROUTE, codec=self.codec)
+        Thread(target=client.run_forever, daemon=True).start()
+        client.connected_event.wait(10)
+        return client
+
+    def handler(self, message):
+        received = time.monotonic()
+        if self.cost:
+            time.sleep(self.cost)
+        with self.lock:
+            self.latencies.append(received - message.data['sent'])
+            if len(self.latencies) >= self.expected:
+                self.done.set()
+
+    def run(self, timeout):
+        receivers = [self.connect() for _ in range(self.fan_out)]
+        sender = self.connect()
+        sender.subscribe('bench.none')  # Don't receive own messages
+        for client in receivers:
+            client.on('bench.message', self.handler)
+        time.sleep(0.2)
+
+        start = time.monotonic()
+        for _ in range(self.messages):
+            sender.emit(Message('bench.message', {
+                'sent': time.monotonic(), 'payload': self.payload}))
+        sent = time.monotonic()
+        completed = self.done.wait(timeout)
+        elapsed = time.monotonic() - start
+
+        for client in receivers + [sender]:
+            client.close()
+            client.dispatcher.shutdown()
+
+        latencies = [l * 1000 for l in self.latencies]
+        return {
+            'clients': self.fan_out,
+            'payload_bytes': self.size,
+            'handler_cost_ms': self.cost * 1000,
+            'codec': self.codec or 'json',
+            'sent': self.messages,
+            'delivered': len(latencies),
+            'completed': completed,
+            'send_rate': self.messages / max(sent - start, 1e-9),
+            'delivered_per_second': len(latencies) / elapsed,
+            'latency_ms': {
+                'p50': percentile(latencies, 50),
+                'p99': percentile(latencies, 99),
+                'max': max(latencies) if latencies else None
+            }
+        }
+
+
+def int_list(value):
+    return [int(v) for v in value.split(',')]
+
+
+def float_list(value):
+    return [float(v) for v in value.split(',')]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--port', type=int, default=18182,
+                        help='loopback port for the service')
+    parser.add_argument('--clients', type=int_list, default=[1, 4, 8],
+                        help='comma separated fan-out values')
+    parser.add_argument('--sizes', type=int_list, default=[100, 10000],
+                        help='comma separated payload sizes in bytes')
+    parser.add_argument('--costs', type=float_list, default=[0, 0.001],
+                        help='comma separated handler costs in seconds')
+    parser.add_argument('--messages', type=int, default=1000,
+                        help='messages sent per scenario')
+    parser.add_argument('--codec', default=None,
+                        help='bus codec to request, e.g. msgpack')
+    parser.add_argument('--timeout', type=float, default=60,
+                        help='seconds to wait for delivery per scenario')
+    parser.add_argument('-o', '--output', help='write JSON report here')
+    args = parser.parse_args(argv)
+
+    service = Process(target=serve, args=(args.port,), daemon=True)
+    service.start()
+    try:
+        wait_for_port(args.port)
+        service_process = psutil.Process(service.pid)
+        results = []
+        for clients in args.clients:
+            for size in args.sizes:
+                for cost in args.costs:
+                    rss_before = service_process.memory_info().rss
+                    sampler = RssSampler(service.pid)
+                    sampler.start()
+                    result = Scenario(args.port, clients, size, cost,
+                                      args.messages, args.codec).run(
+                                          args.timeout)
+                    result['service_rss'] = {'before': rss_before,
+                                             'peak': sampler.stop()}
+                    results.append(result)
+                    print(json.dumps(result), file=sys.stderr)
+    finally:
+        service.terminate()
+        service.join()
+
+    report = {
+        'benchmark': 'messagebus',
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': psutil.cpu_count(),
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == '__main__':
+    main()
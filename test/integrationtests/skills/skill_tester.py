@@ -32,6 +32,7 @@ To set up a test the test runner can
 
 """
 from queue import Queue, Empty
+from concurrent.futures import Future
 import json
 import time
 import os
@@ -207,6 +208,20 @@ class InterceptEmitter(object):
     def once(self, event, f):
         self.emitter.once(event, f)
 
+    def request(self, message, reply_types):
+        # Handlers run synchronously, the reply arrives before emit returns
+        future = Future()
+
+        def resolve(reply):
+            if not future.done():
+                future.set_result(reply)
+        for reply_type in reply_types:
+            self.emitter.on(reply_type, resolve)
+        self.emit(message)
+        for reply_type in reply_types:
+            self.emitter.remove_listener(reply_type, resolve)
+        return future
+
     def remove(self, event_name, func):
         pass
 
@@ -0,0 +1,103 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from tornado import gen, web
+from tornado.testing import AsyncHTTPTestCase, gen_test
+
+from mycroft.messagebus.client.async_ws import AsyncWebsocketClient
+from mycroft.messagebus.message import Message
+from mycroft.messagebus.service.ws import WebsocketEventHandler
+
+
+class TestAsyncWebsocketClient(AsyncHTTPTestCase):
+    def get_app(self):
+        return web.Application([('/core', WebsocketEventHandler)])
+
+    def create_client(self):
+        client = AsyncWebsocketClient('127.0.0.1', self.get_http_port(),
+                                      '/core')
+        client.start()
+        self.clients.append(client)
+        return client
+
+    def setUp(self):
+        super().setUp()
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        super().tearDown()
+
+    @gen_test
+    def test_handlers(self):
+        client = self.create_client()
+        received = []
+
+        @gen.coroutine
+        def coroutine_handler(message):
+            yield gen.moment
+            received.append(('coroutine', message.data))
+
+        client.on('test', lambda m: received.append(('sync', m.data)))
+        client.on('test', coroutine_handler)
+        yield client.emit(Message('test', {'n': 1}))
+        while len(received) < 2:
+            yield gen.sleep(0.01)
+        self.assertIn(('sync', {'n': 1}), received)
+        self.assertIn(('coroutine', {'n': 1}), received)
+
+    @gen_test
+    def test_wait_for_response(self):
+        requester = self.create_client()
+        responder = self.create_client()
+
+        @gen.coroutine
+        def respond(message):
+            yield responder.emit(message.response({'answer': 42}))
+        responder.on('question', respond)
+        yield responder.connected_event.wait()
+
+        reply = yield requester.wait_for_response(Message('question'))
+        self.assertEqual(reply.data, {'answer': 42})
+        reply = yield requester.wait_for_response(Message('nobody.home'),
+                                                  timeout=0.1)
+        self.assertIsNone(reply)
+
+    @gen_test
+    def test_iterator(self):
+        client = self.create_client()
+        messages = client.messages(['wanted'])
+        yield client.emit(Message('unwanted'))
+        yield client.emit(Message('wanted', {'n': 1}))
+        message = yield messages.next()
+        self.assertEqual(message.data, {'n': 1})
+        messages.close()
+        self.assertEqual(client.iterators, [])
+
+    @gen_test
+    def test_unsubscribe(self):
+        client = self.create_client()
+        messages = client.messages()
+        yield client.connected_event.wait()
+        yield client.subscribe(['wanted'])
+        yield client.unsubscribe()
+        self.assertEqual(client.subscriptions, set())
+
+        # Sent back on the same connection, after the unsubscribe
+        yield client.emit(Message('other'))
+        message = yield messages.next()
+        while message.type != 'other':
+            message = yield messages.next()
+        messages.close()
@@ -0,0 +1,172 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+
+import mock
+
+from mycroft.messagebus.client.ws import WebsocketClient
+from mycroft.messagebus.message import Message
+
+
+def create_client():
+    """ Create a connected WebsocketClient without a real socket. """
+    with mock.patch.object(WebsocketClient, 'create_client'):
+        client = WebsocketClient()
+    client.connected_event.set()
+    return client
+
+
+class TestRequests(unittest.TestCase):
+    def setUp(self):
+        self.client = create_client()
+        self.sent = []
+        self.client.client.send.side_effect = self.sent.append
+
+    def receive(self, message):
+        self.client.on_message(None, message.serialize())
+
+    def test_response(self):
+        def respond(frame):
+            self.receive(Message.deserialize(frame).response({'ok': True}))
+        self.client.client.send.side_effect = respond
+
+        reply = self.client.wait_for_response(Message('test'))
+        self.assertEqual(reply.data, {'ok': True})
+        self.assertEqual(self.client.pending_requests, {})
+
+    def test_correlation(self):
+        first = self.client.request(Message('test'))
+        second = self.client.request(Message('test'))
+        requests = [Message.deserialize(frame) for frame in self.sent]
+        # The echoed request itself doesn't resolve anything
+        self.receive(requests[1])
+        self.assertFalse(second.done())
+
+        self.receive(requests[1].response({'n': 2}))
+        self.assertFalse(first.done())
+        self.assertEqual(second.result(0).data, {'n': 2})
+
+        self.receive(requests[0].response({'n': 1}))
+        self.assertEqual(first.result(0).data, {'n': 1})
+
+    def test_existing_correlation_id(self):
+        future = self.client.request(Message('test', context={
+            'correlation_id': 'forwarded'}))
+        request = Message.deserialize(self.sent[0])
+        self.assertEqual(request.context['correlation_id'], 'forwarded')
+        self.receive(request.response({'ok': True}))
+        self.assertEqual(future.result(0).data, {'ok': True})
+
+    def test_unknown_correlation_id(self):
+        future = self.client.request(Message('test'))
+        with mock.patch('mycroft.messagebus.client.ws.LOG') as log:
+            self.receive(Message('test.response', {},
+                                 {'correlation_id': 'unknown'}))
+        self.assertFalse(future.done())
+        self.assertTrue(log.debug.called)
+
+    def test_uncorrelated_reply(self):
+        future = self.client.request(Message('test'), 'test.reply')
+        self.receive(Message('test.reply', {'legacy': True}))
+        self.assertEqual(future.result(0).data, {'legacy': True})
+
+    def test_reply_types(self):
+        future = self.client.request(Message('test'),
+                                     ('test.response', 'test.error'))
+        request = Message.deserialize(self.sent[0])
+        self.receive(request.reply('test.error', {'error': 'failed'}))
+        self.assertEqual(future.result(0).type, 'test.error')
+
+    def test_timeout_and_cancel(self):
+        self.assertIsNone(self.client.wait_for_response(Message('test'),
+                                                        timeout=0.01))
+        future = self.client.request(Message('test'))
+        future.cancel()
+        self.assertEqual(self.client.pending_requests, {})
+
+
+class TestSubscribe(unittest.TestCase):
+    def test_subscribe(self):
+        client = create_client()
+        client.subscribe(['speak', 'enclosure.*'])
+        sent = Message.deserialize(client.client.send.call_args[0][0])
+        self.assertEqual(sent.type, 'mycroft.bus.subscribe')
+        self.assertEqual(sorted(sent.data['types']), ['enclosure.*', 'speak'])
+
+        client.unsubscribe()
+        sent = Message.deserialize(client.client.send.call_args[0][0])
+        self.assertEqual(sent.type, 'mycroft.bus.unsubscribe')
+        self.assertFalse(sent.data['none'])
+        self.assertEqual(client.subscriptions, set())
+
+    def test_unsubscribe_last_type(self):
+        client = create_client()
+        client.subscribe(['speak'])
+        client.unsubscribe(['speak'])
+        sent = Message.deserialize(client.client.send.call_args[0][0])
+        self.assertEqual(sent.data, {'types': ['speak'], 'none': True})
+
+        # Restored as an explicit subscription to nothing
+        client.on_open(None)
+        sent = Message.deserialize(client.client.send.call_args[0][0])
+        self.assertEqual(sent.type, 'mycroft.bus.subscribe')
+        self.assertEqual(sent.data, {'types': [], 'none': True})
+
+
+class TestOutboundBuffer(unittest.TestCase):
+    def setUp(self):
+        self.client = create_client()
+        self.client.connected_event.clear()
+        self.sent = []
+        self.client.client.send.side_effect = self.sent.append
+
+    def sent_types(self):
+        return [Message.deserialize(frame).type for frame in self.sent]
+
+    def test_flush_on_open(self):
+        self.client.emit(Message('first'))
+        self.client.emit(Message('second'))
+        self.assertEqual(self.sent, [])
+
+        self.client.on_open(None)
+        self.client.emit(Message('third'))
+        self.assertEqual(self.sent_types(), ['first', 'second', 'third'])
+
+    def test_ttl_and_size(self):
+        self.client.outbound_size = 2
+        self.client.emit(Message('expired'), ttl=-1)
+        self.client.emit(Message('dropped'))
+        self.client.emit(Message('kept'))
+        self.client.emit(Message('newest'))
+        self.client.on_open(None)
+        self.assertEqual(self.sent_types(), ['kept', 'newest'])
+
+    def test_expired_warning(self):
+        self.client.emit(Message('a'), ttl=-1)
+        self.client.emit(Message('b'), ttl=-1)
+        self.client.emit(Message('a'), ttl=-1)
+        self.client.emit(Message('kept'))
+        with mock.patch('mycroft.messagebus.client.ws.LOG') as log:
+            self.client.on_open(None)
+        self.assertEqual(self.sent_types(), ['kept'])
+        log.warning.assert_called_once_with(
+            'Dropped 3 expired outbound messages: a, b')
+
+    def test_configured_ttl(self):
+        self.client.outbound_ttl = -1
+        self.client.emit(Message('expired'))
+        self.client.emit(Message('kept'), ttl=10)
+        self.client.on_open(None)
+        self.assertEqual(self.sent_types(), ['kept'])
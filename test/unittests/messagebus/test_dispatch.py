@@ -0,0 +1,95 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import time
+import unittest
+from threading import Event
+
+from mycroft.messagebus.client.dispatch import MessageDispatcher
+from mycroft.messagebus.message import Message
+
+
+class TestMessageDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.dispatcher = MessageDispatcher({
+            'workers': 2,
+            'priority': ['mycroft.stop'],
+            'priority_workers': 1,
+            'ordered': ['speak']
+        })
+        self.release = Event()
+
+    def tearDown(self):
+        self.release.set()
+        self.dispatcher.shutdown()
+
+    def test_priority_not_blocked(self):
+        stopped = Event()
+
+        def handler(msg_type, message):
+            if msg_type == 'mycroft.stop':
+                stopped.set()
+            else:
+                self.release.wait()
+
+        for i in range(5):
+            self.dispatcher.dispatch(handler, Message('slow'))
+        self.dispatcher.dispatch(handler, Message('mycroft.stop'))
+        self.assertTrue(stopped.wait(1))
+        while self.dispatcher.default.active < 2:
+            time.sleep(0.01)
+        self.assertEqual(self.dispatcher.queue_depth(),
+                         {'default': 3, 'priority': 0})
+
+    def test_stop_not_blocked_by_utterances(self):
+        dispatcher = MessageDispatcher({
+            'priority': ['mycroft.stop'],
+            'priority_workers': 2,
+            'interactive': ['recognizer_loop:utterance'],
+            'interactive_workers': 2
+        })
+        self.addCleanup(dispatcher.shutdown)
+        stopped = Event()
+
+        def handler(msg_type, message):
+            if msg_type == 'mycroft.stop':
+                stopped.set()
+            else:
+                self.release.wait()  # Waiting for converse, Padatious...
+
+        for i in range(4):
+            dispatcher.dispatch(handler,
+                                Message('recognizer_loop:utterance'))
+        dispatcher.dispatch(handler, Message('mycroft.stop'))
+        self.assertTrue(stopped.wait(0.5))
+        while dispatcher.interactive.active < 2:
+            time.sleep(0.01)
+        self.assertEqual(dispatcher.queue_depth(),
+                         {'default': 0, 'priority': 0, 'interactive': 2})
+
+    def test_ordered(self):
+        handled = []
+        done = Event()
+
+        def handler(msg_type, message):
+            # Earlier messages sleep longer, only ordering keeps them first
+            time.sleep(0.01 * (5 - message.data['n']))
+            handled.append(message.data['n'])
+            if len(handled) == 5:
+                done.set()
+
+        for i in range(5):
+            self.dispatcher.dispatch(handler, Message('speak', {'n': i}))
+        self.assertTrue(done.wait(2))
+        self.assertEqual(handled, list(range(5)))
@@ -0,0 +1,83 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+from threading import Event
+
+import mock
+
+from mycroft.messagebus.client.local import (BridgeClient, InProcessBus,
+                                             InProcessClient)
+from mycroft.messagebus.message import Message
+
+
+class TestInProcessClient(unittest.TestCase):
+    def setUp(self):
+        InProcessBus.instance = None
+        self.skills = InProcessClient(bridge=False)
+        self.audio = InProcessClient(bridge=False)
+
+    def tearDown(self):
+        InProcessBus.instance.dispatcher.shutdown()
+        InProcessBus.instance = None
+
+    def test_emit(self):
+        received = []
+        done = Event()
+
+        def handler(message):
+            received.append(message)
+            done.set()
+        self.audio.on('speak', handler)
+
+        message = Message('speak', {'utterance': 'hello'})
+        self.skills.emit(message)
+        message.data['utterance'] = 'changed after emit'
+        self.assertTrue(done.wait(1))
+        self.assertEqual(received[0].data, {'utterance': 'hello'})
+
+    def test_wait_for_response(self):
+        self.audio.on('mycroft.audio.service.track_info',
+                      lambda m: self.audio.emit(m.response({'title': 'x'})))
+        reply = self.skills.wait_for_response(
+            Message('mycroft.audio.service.track_info'))
+        self.assertEqual(reply.data, {'title': 'x'})
+
+    def test_remove(self):
+        def handler(message):
+            pass
+        self.audio.on('speak', handler)
+        self.skills.remove('speak', handler)
+        self.assertEqual(self.audio.emitter._events['speak'], [])
+
+
+class TestBridgeClient(unittest.TestCase):
+    def setUp(self):
+        InProcessBus.instance = None
+        with mock.patch.object(BridgeClient, 'create_client'):
+            self.bridge = BridgeClient(InProcessBus.get())
+        self.sent = []
+        self.bridge.client.send.side_effect = self.sent.append
+
+    def tearDown(self):
+        InProcessBus.instance.dispatcher.shutdown()
+        InProcessBus.instance = None
+
+    def test_echo_off_before_flush(self):
+        self.bridge.emit(Message('buffered'))
+        self.bridge.on_open(None)
+        sent = [Message.deserialize(frame) for frame in self.sent]
+        self.assertEqual([m.type for m in sent],
+                         ['mycroft.bus.subscribe', 'buffered'])
+        self.assertEqual(sent[0].data, {'types': [], 'echo': False})
@@ -0,0 +1,72 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+from threading import Thread
+
+from mycroft.messagebus.message import LazyMessage, Message, peek_type
+
+
+class TestLazyMessage(unittest.TestCase):
+    def test_peek_type(self):
+        frame = Message('enclosure.mouth.viseme', {'type': 'x'}).serialize()
+        self.assertEqual(peek_type(frame), 'enclosure.mouth.viseme')
+        self.assertEqual(peek_type('{"type": "a \\"quoted\\" type"}'),
+                         'a "quoted" type')
+        # Other key orders need a full decode
+        self.assertIsNone(peek_type('{"data": {}, "type": "speak"}'))
+
+    def test_lazy_decode(self):
+        frame = Message('speak', {'utterance': 'hi'}, {'ident': 1}).serialize()
+        message = Message.deserialize(frame, lazy=True)
+        self.assertIsInstance(message, LazyMessage)
+        self.assertEqual(message.type, 'speak')
+        self.assertFalse(message._decoded)
+        # Unmodified messages are forwarded as received
+        self.assertIs(message.serialize(), frame)
+
+        self.assertEqual(message.data, {'utterance': 'hi'})
+        self.assertEqual(message.context, {'ident': 1})
+        self.assertEqual(message.reply('speak.reply').context, {'ident': 1})
+
+    def test_concurrent_decode(self):
+        frame = Message('speak', {'utterance': 'hi'}).serialize()
+        for _ in range(20):
+            message = Message.deserialize(frame, lazy=True)
+            results = []
+            threads = [Thread(target=lambda: results.append(message.data))
+                       for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(results, [{'utterance': 'hi'}] * 4)
+
+    def test_modified(self):
+        frame = Message('speak', {'utterance': 'hi'}).serialize()
+        message = Message.deserialize(frame, lazy=True)
+        message.type = 'speak.again'
+        self.assertEqual(Message.deserialize(message.serialize()).type,
+                         'speak.again')
+
+        message = Message.deserialize(frame, lazy=True)
+        message.data['utterance'] = 'bye'
+        self.assertEqual(Message.deserialize(message.serialize()).data,
+                         {'utterance': 'bye'})
+
+    def test_fallback(self):
+        message = Message.deserialize('{"data": {}, "type": "speak"}',
+                                      lazy=True)
+        self.assertNotIsInstance(message, LazyMessage)
+        self.assertEqual(message.type, 'speak')
@@ -0,0 +1,186 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import json
+import unittest
+
+import mock
+
+from mycroft.messagebus.message import Message
+from mycroft.messagebus.service import ws
+from mycroft.messagebus.service.ws import WebsocketEventHandler, Subscription
+
+
+class BytesCodec(object):
+    """ Stand-in binary codec not depending on optional packages. """
+    name = 'bytes'
+    binary = True
+
+    @staticmethod
+    def dumps(obj):
+        return json.dumps(obj).encode()
+
+    @staticmethod
+    def loads(value):
+        return json.loads(value.decode())
+
+
+def create_handler():
+    """ Create a service connection handler without a real socket. """
+    with mock.patch('tornado.websocket.WebSocketHandler.__init__'):
+        handler = WebsocketEventHandler(mock.MagicMock(), mock.MagicMock())
+    handler.request = mock.MagicMock()
+    handler.write_message = mock.MagicMock()
+    return handler
+
+
+class TestSubscription(unittest.TestCase):
+    def test_empty_matches_all(self):
+        self.assertTrue(Subscription().matches('anything'))
+
+    def test_exact_and_prefix(self):
+        sub = Subscription()
+        sub.add(['speak', 'enclosure.*'])
+        self.assertTrue(sub.matches('speak'))
+        self.assertTrue(sub.matches('enclosure.mouth.viseme'))
+        self.assertFalse(sub.matches('speak.response'))
+        self.assertFalse(sub.matches('mycroft.stop'))
+
+        sub.remove(['enclosure.*'])
+        self.assertFalse(sub.matches('enclosure.mouth.viseme'))
+        sub.clear()
+        self.assertTrue(sub.matches('enclosure.mouth.viseme'))
+
+    def test_last_type_removed(self):
+        sub = Subscription()
+        sub.add(['speak'])
+        sub.remove(['speak'])
+        self.assertFalse(sub.matches('speak'))
+        self.assertFalse(sub.matches('anything'))
+
+
+class TestWebsocketEventHandler(unittest.TestCase):
+    def setUp(self):
+        self.all = create_handler()
+        self.speech = create_handler()
+        ws.client_connections[:] = [self.all, self.speech]
+
+    def tearDown(self):
+        ws.client_connections[:] = []
+
+    def test_routing(self):
+        self.speech.on_message(Message('mycroft.bus.subscribe',
+                                       {'types': ['speak']}).serialize())
+        # The subscription request itself is not forwarded
+        self.all.write_message.assert_not_called()
+
+        speak = Message('speak', {'utterance': 'hi'}).serialize()
+        viseme = Message('enclosure.mouth.viseme').serialize()
+        self.all.on_message(speak)
+        self.all.on_message(viseme)
+
+        self.assertEqual(self.all.write_message.call_count, 2)
+        self.speech.write_message.assert_called_once_with(
+            speak, binary=False)
+
+    def test_invalid_frame(self):
+        # Starts like a serialized message but isn't valid json
+        self.all.on_message('{"type": "speak", "data": {')
+        self.speech.write_message.assert_not_called()
+
+    def test_unsubscribe_all(self):
+        self.speech.on_message(Message('mycroft.bus.subscribe',
+                                       {'types': ['speak']}).serialize())
+        self.speech.on_message(Message('mycroft.bus.unsubscribe',
+                                       {}).serialize())
+        self.all.on_message(Message('enclosure.mouth.viseme').serialize())
+        self.assertEqual(self.speech.write_message.call_count, 1)
+
+    def test_subscribe_none(self):
+        self.speech.on_message(Message('mycroft.bus.subscribe',
+                                       {'types': [], 'none': True})
+                               .serialize())
+        self.all.on_message(Message('speak').serialize())
+        self.speech.write_message.assert_not_called()
+
+    def test_mixed_codecs(self):
+        self.speech.codec = BytesCodec
+        speak = Message('speak', {'utterance': 'hi'})
+
+        self.all.on_message(speak.serialize())
+        frame = self.speech.write_message.call_args[0][0]
+        self.assertEqual(self.speech.write_message.call_args[1],
+                         {'binary': True})
+        self.assertEqual(Message.deserialize(frame, BytesCodec).data,
+                         speak.data)
+
+        # Binary frames from the client are decoded with its codec and
+        # re-encoded as json for other connections
+        self.speech.on_message(speak.serialize(BytesCodec))
+        self.assertEqual(self.all.write_message.call_args[0][0],
+                         speak.serialize())
+
+    def test_no_echo(self):
+        self.all.on_message(Message('mycroft.bus.subscribe',
+                                    {'echo': False}).serialize())
+        self.all.on_message(Message('speak').serialize())
+        self.all.write_message.assert_not_called()
+        self.assertEqual(self.speech.write_message.call_count, 1)
+
+
+class TestSendQueue(unittest.TestCase):
+    def setUp(self):
+        self.sender = create_handler()
+        self.slow = create_handler()
+        self.slow.send_queue_size = 2
+        # First write is never flushed
+        self.slow.write_message.return_value.done.return_value = False
+        ws.client_connections[:] = [self.slow]
+
+    def tearDown(self):
+        ws.client_connections[:] = []
+
+    def queued_types(self):
+        return [queued[2] for queued in self.slow.send_queue]
+
+    @mock.patch('mycroft.messagebus.service.ws.IOLoop')
+    def test_drop_oldest(self, mock_loop):
+        self.slow.send_policy = ws.DROP_OLDEST
+        for msg_type in ['first', 'a', 'b', 'c']:
+            self.sender.on_message(Message(msg_type).serialize())
+        self.assertEqual(self.slow.write_message.call_count, 1)
+        self.assertEqual(self.queued_types(), ['b', 'c'])
+        self.assertEqual(self.slow.stats['dropped'], 1)
+
+        # Queue drains when the pending write completes
+        self.slow.write_message.return_value.done.return_value = True
+        self.slow._on_written(None)
+        self.assertEqual(self.slow.write_message.call_count, 3)
+        self.assertEqual(self.queued_types(), [])
+
+    @mock.patch('mycroft.messagebus.service.ws.IOLoop')
+    def test_drop_type(self, mock_loop):
+        self.slow.send_policy = ws.DROP_TYPE
+        self.slow.drop_types = {'viseme'}
+        for msg_type in ['first', 'a', 'viseme', 'b', 'viseme']:
+            self.sender.on_message(Message(msg_type).serialize())
+        self.assertEqual(self.queued_types(), ['a', 'b'])
+
+    @mock.patch('mycroft.messagebus.service.ws.IOLoop')
+    def test_disconnect(self, mock_loop):
+        self.slow.send_policy = ws.DISCONNECT
+        self.slow.close = mock.MagicMock()
+        for msg_type in ['first', 'a', 'b', 'c']:
+            self.sender.on_message(Message(msg_type).serialize())
+        self.slow.close.assert_called_once_with()
@@ -14,6 +14,7 @@
 # limitations under the License.
 #
 import sys
+import time
 import unittest
 
 import mock
@@ -21,6 +22,7 @@ from adapt.intent import IntentBuilder
 from os.path import join, dirname, abspath
 from re import error
 from datetime import datetime
+from threading import Event
 
 from mycroft.configuration import Configuration
 from mycroft.messagebus.message import Message
@@ -28,6 +30,7 @@ from mycroft.skills.skill_data import load_regex_from_file, load_regex, \
     load_vocab_from_file, load_vocabulary
 from mycroft.skills.core import MycroftSkill, load_skill, \
     create_skill_descriptor, open_intent_envelope
+from mycroft.skills.handler_stats import handler_stats
 
 from test.util import base_config
 
@@ -41,6 +44,7 @@ class MockEmitter(object):
     def emit(self, message):
         self.types.append(message.type)
         self.results.append(message.data)
+        self.contexts.append(message.context)
 
     def get_types(self):
         return self.types
@@ -54,6 +58,7 @@ class MockEmitter(object):
     def reset(self):
         self.types = []
         self.results = []
+        self.contexts = []
 
 
 class MycroftSkillTest(unittest.TestCase):
@@ -389,6 +394,21 @@ class MycroftSkillTest(unittest.TestCase):
 
         self.emitter.reset()
 
+    def test_context_in_session(self):
+        s = SimpleSkill1()
+        s.bind(self.emitter)
+
+        def handler(message):
+            s.set_context('TurtlePower')
+            s.remove_context('TurtlePower')
+            s.make_active()
+        handler(Message('A:Intent', context={'session': 'kitchen'}))
+        self.assertEqual(self.emitter.get_types(),
+                         ['add_context', 'remove_context',
+                          'active_skill_request'])
+        for context in self.emitter.contexts:
+            self.assertEqual(context['session'], 'kitchen')
+
     def test_failing_remove_context(self):
         s = SimpleSkill1()
         s.bind(self.emitter)
@@ -478,12 +498,69 @@ class MycroftSkillTest(unittest.TestCase):
             s.schedule_event(s.handler, datetime.now(), name='sched_handler1')
             # Check that the handler was registered with the emitter
             emitter.once.call_args[0][1](Message('message'))
+            # Wait for the handler executor to run the handler
+            s.handler_executor.shutdown(wait=True)
             # Check that the handler was run
             self.assertTrue(s.handler_run)
             # Check that the handler was removed from the list of registred
             # handler
             self.assertTrue('A:sched_handler1' not in [e[0] for e in s.events])
 
+    @mock.patch.dict(Configuration._Configuration__config, BASE_CONF)
+    def test_handler_executor(self):
+        emitter = mock.MagicMock()
+        s = SimpleSkill1()
+        s.skill_id = 'executor_test'
+        s.bind(emitter)
+        release = Event()
+
+        def blocking(message):
+            release.wait(5)
+
+        def failing(message):
+            raise ValueError
+
+        s.add_event('blocking', blocking)
+        s.add_event('failing', failing)
+        handlers = dict(c[0] for c in emitter.on.call_args_list)
+        handlers['blocking'](Message('blocking'))
+        handlers['failing'](Message('failing'))
+        # The handler doesn't block the thread delivering the message
+        self.assertFalse(release.is_set())
+        release.set()
+        s.handler_executor.shutdown(wait=True)
+
+        stats = handler_stats.report('executor_test')['executor_test']
+        self.assertEqual(stats['blocking']['count'], 1)
+        self.assertEqual(stats['blocking']['failures'], 0)
+        self.assertEqual(stats['failing']['failures'], 1)
+        self.assertLessEqual(stats['blocking']['p50'],
+                             stats['blocking']['p99'])
+
+    @mock.patch.dict(Configuration._Configuration__config, BASE_CONF)
+    def test_handler_timeout(self):
+        emitter = mock.MagicMock()
+        s = SimpleSkill1()
+        s.skill_id = 'timeout_test'
+        s.bind(emitter)
+        s.handler_timeout = 0.05
+
+        def slow(message):
+            time.sleep(0.3)
+
+        s.add_event('slow', slow)
+        emitter.on.call_args[0][1](Message('slow'))
+        s.handler_executor.shutdown(wait=True)
+        messages = [c[0][0] for c in emitter.emit.call_args_list]
+        timeouts = [m for m in messages
+                    if m.type == 'mycroft.skill.handler.timeout']
+        self.assertEqual(len(timeouts), 1)
+        self.assertEqual(timeouts[0].data, {'skill_id': 'timeout_test',
+                                            'name': 'slow',
+                                            'timeout': 0.05})
+        stats = handler_stats.report('timeout_test')['timeout_test']
+        self.assertEqual(stats['slow']['timeouts'], 1)
+
 
 class _TestSkill(MycroftSkill):
     def __init__(self):
@@ -0,0 +1,67 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+
+import mock
+
+from mycroft.messagebus.message import Message
+from mycroft.skills.handler_stats import HandlerStats
+
+
+class HandlerStatsTest(unittest.TestCase):
+    def setUp(self):
+        self.stats = HandlerStats(samples=100)
+        for i in range(1, 101):
+            self.stats.record('a', 'A.handler', i / 100, failed=i > 95)
+        self.stats.record_timeout('a', 'A.handler')
+        self.stats.record('b', 'B.handler', 0.5)
+
+    def test_report(self):
+        report = self.stats.report()
+        self.assertEqual(sorted(report), ['a', 'b'])
+        self.assertEqual(report['a']['A.handler'], {
+            'count': 100,
+            'failures': 5,
+            'timeouts': 1,
+            'p50': 0.5,
+            'p99': 0.99,
+            'max': 1.0
+        })
+
+    def test_report_skill(self):
+        self.assertEqual(list(self.stats.report('b')), ['b'])
+        self.assertEqual(self.stats.report('c'), {})
+
+    def test_samples(self):
+        self.stats.record('a', 'A.handler', 2.0)
+        report = self.stats.report('a')['a']['A.handler']
+        self.assertEqual(report['count'], 101)
+        self.assertEqual(report['max'], 2.0)
+        self.assertEqual(report['p50'], 0.51)
+
+    def test_timeout_only(self):
+        self.stats.record_timeout('c', 'C.handler')
+        self.assertEqual(self.stats.report('c')['c']['C.handler'],
+                         {'count': 0, 'failures': 0, 'timeouts': 1})
+
+    def test_bus_request(self):
+        bus = mock.Mock()
+        self.stats.bind(bus)
+        event, handler = bus.on.call_args[0]
+        self.assertEqual(event, 'mycroft.skill.handler.stats')
+        handler(Message(event, {'skill_id': 'b'}))
+        response = bus.emit.call_args[0][0]
+        self.assertEqual(response.type, 'mycroft.skill.handler.stats.response')
+        self.assertEqual(list(response.data['skills']), ['b'])
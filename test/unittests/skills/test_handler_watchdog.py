@@ -0,0 +1,53 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import threading
+import time
+import unittest
+from queue import Queue
+
+from mycroft.skills.handler_watchdog import HandlerWatchdog
+
+
+class HandlerWatchdogTest(unittest.TestCase):
+    def setUp(self):
+        self.watchdog = HandlerWatchdog()
+        self.expired = Queue()
+
+    def watch(self, timeout, name):
+        return self.watchdog.watch(timeout, self.expired.put, (name,))
+
+    def test_expired_in_deadline_order(self):
+        self.watch(0.2, 'late')
+        self.watch(0.05, 'early')
+        self.assertEqual(self.expired.get(timeout=1), 'early')
+        self.assertEqual(self.expired.get(timeout=1), 'late')
+
+    def test_cancel(self):
+        entry = self.watch(0.05, 'cancelled')
+        self.watch(0.1, 'expired')
+        self.watchdog.cancel(entry)
+        self.assertEqual(self.expired.get(timeout=1), 'expired')
+        self.assertTrue(self.expired.empty())
+
+    def test_single_thread(self):
+        threads = threading.active_count()
+        entries = [self.watch(10, i) for i in range(200)]
+        self.assertLessEqual(threading.active_count(), threads + 1)
+        for entry in entries:
+            self.watchdog.cancel(entry)
+        # Cancelled entries don't pile up
+        self.assertLess(len(self.watchdog.heap), 200)
+        time.sleep(0.05)
+        self.assertTrue(self.expired.empty())
@@ -0,0 +1,69 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+
+from adapt.engine import IntentDeterminationEngine
+from adapt.intent import IntentBuilder
+
+from mycroft.skills.intent_index import IntentIndex
+
+
+class IntentIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = IntentIndex()
+        self.index.add('a:One', 1)
+        self.index.add('b:One', 2)
+        self.index.add('a:Two', 3)
+
+    def test_order(self):
+        self.assertEqual(list(self.index), [1, 2, 3])
+        self.assertEqual(self.index.skill_intents('a'), ['a:One', 'a:Two'])
+        self.assertEqual(self.index.names(), ['a:One', 'b:One', 'a:Two'])
+
+    def test_replace(self):
+        self.index.add('a:One', 4)
+        self.assertEqual(list(self.index), [4, 2, 3])
+
+    def test_remove(self):
+        self.assertTrue(self.index.remove('a:One'))
+        self.assertFalse(self.index.remove('a:One'))
+        self.assertEqual(list(self.index), [2, 3])
+        self.assertNotIn('a:One', self.index)
+        self.assertEqual(self.index.skill_intents('a'), ['a:Two'])
+
+    def test_remove_skill(self):
+        self.index.add('ab:One', 4)
+        self.assertEqual(self.index.remove_skill('a:'), ['a:One', 'a:Two'])
+        self.assertEqual(self.index.remove_skill('a'), [])
+        self.assertEqual(list(self.index), [2, 4])
+        self.assertEqual(len(self.index), 2)
+
+    def test_modify_while_iterating(self):
+        for _ in self.index:
+            self.index.remove_skill('a')
+            self.index.add('c:One', 5)
+        self.assertEqual(list(self.index), [2, 5])
+
+    def test_adapt_engine(self):
+        engine = IntentDeterminationEngine()
+        engine.intent_parsers = IntentIndex()
+        engine.register_entity('time', 'TimeKeyword')
+        engine.register_intent_parser(
+            IntentBuilder('a:TimeIntent').require('TimeKeyword').build())
+        intent = next(engine.determine_intent('what time is it'))
+        self.assertEqual(intent['intent_type'], 'a:TimeIntent')
+        engine.intent_parsers.remove_skill('a:')
+        self.assertEqual(list(engine.determine_intent('what time is it')),
+                         [])
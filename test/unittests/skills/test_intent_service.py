@@ -12,9 +12,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import time
 import unittest
+from concurrent.futures import Future
+from types import SimpleNamespace
 
-from mycroft.skills.intent_service import ContextManager
+import mock
+from adapt.intent import IntentBuilder
+
+from mycroft.messagebus.message import Message
+from mycroft.skills.intent_service import ContextManager, IntentService
 
 
 class MockEmitter(object):
@@ -67,6 +74,290 @@ class ContextManagerTest(unittest.TestCase):
         self.context_manager.remove_context('TestContext')
         self.assertEqual(len(self.context_manager.frame_stack), 0)
 
+    def inject(self, word, context, origin=''):
+        self.context_manager.inject_context({'data': [(word, context)],
+                                             'match': word, 'key': word,
+                                             'confidence': 1.0,
+                                             'origin': origin})
+
+    def test_latest_keyword_used(self):
+        self.inject('jazz', 'Genre', 'a')
+        self.inject('Miles', 'Artist', 'a')
+        self.inject('rock', 'Genre', 'b')
+        context = self.context_manager.get_context()
+        self.assertEqual([e['key'] for e in context], ['rock', 'Miles'])
+        # Frames further back get a lower confidence
+        self.assertEqual([e['confidence'] for e in context], [1 / 2, 1 / 3])
+        # The stored entities are left untouched
+        self.assertEqual(self.context_manager.keywords['Genre'][0]
+                         .entities[0]['confidence'], 1.0)
+
+    def test_missing_entities(self):
+        self.inject('jazz', 'Genre', 'a')
+        self.inject('Miles', 'Artist', 'a')
+        self.inject('rock', 'Genre', 'b')
+        context = self.context_manager.get_context(
+            missing_entities=['Artist', 'Genre', 'Place'])
+        self.assertEqual([e['key'] for e in context], ['Miles', 'rock'])
+        context = self.context_manager.get_context(
+            max_frames=1, missing_entities=['Artist', 'Genre'])
+        self.assertEqual([e['key'] for e in context], ['rock'])
+
+    def test_remove_keeps_other_frames(self):
+        self.inject('jazz', 'Genre', 'a')
+        self.inject('Miles', 'Artist', 'b')
+        self.context_manager.remove_context('Genre')
+        self.assertEqual(len(self.context_manager.frame_stack), 1)
+        self.assertNotIn('Genre', self.context_manager.keywords)
+        self.assertEqual([e['key'] for e in
+                          self.context_manager.get_context()], ['Miles'])
+
+    def test_expired_frames_evicted(self):
+        self.context_manager.timeout = 0.1
+        self.inject('jazz', 'Genre', 'a')
+        time.sleep(0.2)
+        self.inject('Miles', 'Artist', 'b')
+        self.assertEqual([e['key'] for e in
+                          self.context_manager.get_context()], ['Miles'])
+        self.assertEqual(len(self.context_manager.frame_stack), 1)
+        self.assertEqual(list(self.context_manager.keywords), ['Artist'])
+
+
+class ConverseTest(unittest.TestCase):
+    def setUp(self):
+        self.bus = mock.MagicMock()
+        self.intent_service = IntentService(self.bus)
+        self.intent_service.converse_response_timeout = 0.5
+        self.answers = {}
+        self.requested = []
+        self.bus.request.side_effect = self.answer
+
+    def answer(self, message, reply_types):
+        """ Answer converse requests like the skill manager would. """
+        self.assertEqual(message.type, 'skill.converse.request')
+        skill_id = message.data['skill_id']
+        self.requested.append(skill_id)
+        future = Future()
+        if self.answers.get(skill_id) == 'error':
+            future.set_result(message.reply(
+                'skill.converse.error',
+                {'skill_id': skill_id, 'error': 'skill id does not exist'}))
+        elif skill_id in self.answers:
+            future.set_result(message.reply(
+                'skill.converse.response',
+                {'skill_id': skill_id, 'result': self.answers[skill_id]}))
+        return future
+
+    def test_priority_wins(self):
+        self.answers = {'a': False, 'b': True, 'c': True}
+        self.assertEqual(
+            self.intent_service.converse_all(['hi'], ['a', 'b', 'c'], 'en'),
+            'b')
+        # All skills are asked in one round
+        self.assertEqual(self.requested, ['a', 'b', 'c'])
+
+    def test_deadline(self):
+        # 'a' never answers, 'b' only wins once the deadline passed
+        self.answers = {'b': True}
+        start = time.monotonic()
+        self.assertEqual(
+            self.intent_service.converse_all(['hi'], ['a', 'b'], 'en'), 'b')
+        self.assertGreaterEqual(time.monotonic() - start, 0.5)
+
+    def test_none_handle(self):
+        self.answers = {'a': False, 'b': False}
+        start = time.monotonic()
+        self.assertIsNone(
+            self.intent_service.converse_all(['hi'], ['a', 'b'], 'en'))
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_error(self):
+        self.answers = {'a': 'error', 'b': True}
+        self.intent_service.add_active_skill('b')
+        self.intent_service.add_active_skill('a')
+        self.assertTrue(self.intent_service._converse(['hi'], 'en'))
+        self.assertEqual([s[0] for s in
+                          self.intent_service.get_session().active_skills],
+                         ['b'])
+
+    def test_converse_updates_active_skills(self):
+        self.answers = {'a': False, 'b': True}
+        self.intent_service.add_active_skill('b')
+        self.intent_service.add_active_skill('a')
+        self.assertTrue(self.intent_service._converse(['hi'], 'en'))
+        self.assertEqual(
+            self.intent_service.get_session().active_skills[0][0], 'b')
+
+    def test_sessions(self):
+        self.answers = {'a': True}
+        self.intent_service.add_active_skill('a', 'kitchen')
+        self.assertFalse(self.intent_service._converse(['hi'], 'en',
+                                                       'bedroom'))
+        self.assertEqual(self.requested, [])
+        self.assertTrue(self.intent_service._converse(['hi'], 'en',
+                                                      'kitchen'))
+        self.assertEqual(self.requested, ['a'])
+
+
+class UtteranceTest(unittest.TestCase):
+    @mock.patch('mycroft.skills.intent_service.PadatiousService')
+    def test_padatious_result_passed_on(self, mock_padatious):
+        padatious = mock_padatious.instance
+        padatious.match_utterances.return_value = (mock.Mock(conf=0.2), 0)
+        bus = mock.MagicMock()
+        intent_service = IntentService(bus)
+
+        intent_service.handle_utterance(
+            Message('recognizer_loop:utterance',
+                    {'utterances': ['no adapt match'], 'lang': 'en-us'},
+                    {'ident': 'abc'}))
+        # Padatious is evaluated once with the ident, the fallback can
+        # reuse the result
+        padatious.match_utterances.assert_called_once_with(
+            ['no adapt match'], 'abc', 0.95)
+        reply = bus.emit.call_args[0][0]
+        self.assertEqual(reply.type, 'intent_failure')
+        self.assertEqual(reply.context['ident'], 'abc')
+
+
+class SessionTest(unittest.TestCase):
+    def setUp(self):
+        self.intent_service = IntentService(mock.MagicMock())
+
+    def add_context(self, session_id, context):
+        self.intent_service.handle_add_context(
+            Message('add_context', {'context': context, 'word': 'w'},
+                    {'session': session_id}))
+
+    def context(self, session_id):
+        session = self.intent_service.get_session(session_id)
+        return [e['data'][0][1] for e in
+                session.context_manager.get_context()]
+
+    def test_context_per_session(self):
+        self.add_context('kitchen', 'Kitchen')
+        self.add_context(None, 'Default')
+        self.assertEqual(self.context('kitchen'), ['Kitchen'])
+        self.assertEqual(self.context('bedroom'), [])
+        self.assertEqual(self.context(None), ['Default'])
+        self.intent_service.handle_clear_context(
+            Message('clear_context', {}, {'session': 'kitchen'}))
+        self.assertEqual(self.context('kitchen'), [])
+        self.assertEqual(self.context(None), ['Default'])
+
+    def test_eviction(self):
+        self.intent_service.session_ttl = 0.1
+        self.add_context('kitchen', 'Kitchen')
+        self.add_context(None, 'Default')
+        time.sleep(0.2)
+        self.intent_service.evict_sessions()
+        self.assertEqual(list(self.intent_service.sessions), [None])
+
+
+class IntentMatchTestBase(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch('mycroft.skills.intent_service.PadatiousService')
+        self.padatious = patcher.start().instance
+        self.addCleanup(patcher.stop)
+        match = SimpleNamespace(name=None, sent=[], matches={}, conf=0.2)
+        self.padatious.match_utterances.return_value = (match, 0)
+        self.bus = mock.MagicMock()
+        self.bus.request.side_effect = self.decline_converse
+        self.intent_service = IntentService(self.bus)
+        self.register_vocab('time', 'TimeKeyword')
+        intent = IntentBuilder('a:TimeIntent').require('TimeKeyword').build()
+        self.intent_service.handle_register_intent(
+            Message('register_intent', intent.__dict__))
+
+    @staticmethod
+    def decline_converse(message, reply_types):
+        future = Future()
+        future.set_result(message.reply('skill.converse.response',
+                                        {'skill_id': message.data['skill_id'],
+                                         'result': False}))
+        return future
+
+    def register_vocab(self, word, keyword):
+        self.intent_service.handle_register_vocab(
+            Message('register_vocab', {'start': word, 'end': keyword}))
+
+    def utterances(self, utterances):
+        self.intent_service.handle_utterance(
+            Message('recognizer_loop:utterance',
+                    {'utterances': utterances, 'lang': 'en-us'}))
+        return self.bus.emit.call_args[0][0]
+
+    def utterance(self, utt):
+        return self.utterances([utt])
+
+
+class IntentCacheTest(IntentMatchTestBase):
+    def test_repeated_utterance_skips_engines(self):
+        with mock.patch.object(self.intent_service.engine, 'determine_intent',
+                               wraps=self.intent_service.engine.
+                               determine_intent) as determine_intent:
+            first = self.utterance("what's the time")
+            second = self.utterance('what is the time')
+            self.assertEqual(determine_intent.call_count, 1)
+        self.assertEqual(self.padatious.match_utterances.call_count, 1)
+        self.assertEqual(first.type, 'a:TimeIntent')
+        self.assertEqual(second.type, 'a:TimeIntent')
+        self.assertEqual(second.data['utterance'], 'what is the time')
+        self.padatious.remember_result.assert_called_once_with(
+            'what is the time', None,
+            self.padatious.match_utterances.return_value[0])
+
+    def test_cached_match_data_copied(self):
+        _, first, _ = self.intent_service._match_intents(['hello'], 'en-us',
+                                                         None)
+        # Padatious updates the match data it returned
+        first.matches['key'] = 'value'
+        first.conf = 1.0
+        _, second, _ = self.intent_service._match_intents(['hello'], 'en-us',
+                                                          None)
+        self.assertEqual(self.padatious.match_utterances.call_count, 1)
+        self.assertEqual(second.matches, {})
+        self.assertEqual(second.conf, 0.2)
+
+    def test_registration_invalidates(self):
+        self.assertEqual(self.utterance('hello there').type,
+                         'intent_failure')
+        self.register_vocab('hello', 'HelloKeyword')
+        intent = IntentBuilder('b:HelloIntent').require('HelloKeyword')\
+            .build()
+        self.intent_service.handle_register_intent(
+            Message('register_intent', intent.__dict__))
+        self.assertEqual(self.utterance('hello there').type,
+                         'b:HelloIntent')
+        self.intent_service.handle_detach_skill(
+            Message('detach_skill', {'skill_id': 'b:'}))
+        self.assertEqual(self.utterance('hello there').type,
+                         'intent_failure')
+
+
+class NBestTest(IntentMatchTestBase):
+    def test_most_confident_hypothesis(self):
+        self.intent_service.early_exit_confidence = 1.1
+        reply = self.utterances(['time', 'spend some time on the sofa',
+                                 'no match'])
+        self.assertEqual(reply.type, 'a:TimeIntent')
+        self.assertEqual(reply.data['utterance'], 'time')
+
+    def test_early_exit(self):
+        with mock.patch.object(self.intent_service.engine, 'determine_intent',
+                               wraps=self.intent_service.engine.
+                               determine_intent) as determine_intent:
+            reply = self.utterances(['time', 'spend some time'])
+            self.assertEqual(determine_intent.call_count, 1)
+        self.assertEqual(reply.data['utterance'], 'time')
+
+    def test_fallback_gets_padatious_hypothesis(self):
+        self.padatious.match_utterances.return_value = (mock.Mock(conf=0.8),
+                                                        1)
+        reply = self.utterances(['hello there', 'yellow bear'])
+        self.assertEqual(reply.type, 'intent_failure')
+        self.assertEqual(reply.data['utterance'], 'yellow bear')
+
 
 if __name__ == '__main__':
     unittest.main()
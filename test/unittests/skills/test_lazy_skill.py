@@ -0,0 +1,163 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import json
+import sys
+import tempfile
+import time
+import unittest
+from os.path import abspath, dirname, join
+
+import mock
+from pyee import EventEmitter
+
+from mycroft.messagebus.message import Message
+from mycroft.skills.lazy_skill import LazySkill, create_manifest, \
+    load_manifest, save_manifest
+
+SKILL_DIR = abspath(join(dirname(__file__), 'intent_file'))
+sys.path.append(abspath(dirname(__file__)))
+TestSkill = __import__('decorator_test_skill').TestSkill
+
+
+class MockBus(EventEmitter):
+    """ Bus delivering messages to the handlers directly. """
+
+    def __init__(self):
+        super(MockBus, self).__init__()
+        self.emitter = self
+        self.emitted = []
+
+    def emit(self, message, *args):
+        if isinstance(message, Message):
+            self.emitted.append(message)
+            super(MockBus, self).emit(message.type, message)
+        else:
+            super(MockBus, self).emit(message, *args)
+
+    def remove(self, event, func):
+        self.remove_listener(event, func)
+
+    def types(self):
+        return [m.type for m in self.emitted]
+
+
+def create_test_skill(bus, handled=None):
+    skill = TestSkill()
+    skill.skill_id = 'A'
+    skill.bind(bus)
+    skill.root_dir = SKILL_DIR
+    if handled is not None:
+        def handler(message):
+            handled.append(message)
+        handler.intents = TestSkill.handler.intents
+        skill.handler = handler
+    skill._register_decorated()
+    skill.initialize()
+    return skill
+
+
+class CreateManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.skill = create_test_skill(MockBus())
+
+    def test_manifest(self):
+        manifest = create_manifest(self.skill, 1.5, 'en-us')
+        self.assertTrue(manifest['lazy'])
+        self.assertEqual(manifest['name'], 'TestSkill')
+        self.assertEqual(manifest['events'], ['A:a', 'A:test.intent'])
+        self.assertEqual(manifest['adapt_intents'][0]['name'], 'A:a')
+        self.assertEqual(manifest['padatious_intents'],
+                         [{'name': 'A:test.intent',
+                           'file_name': join(SKILL_DIR, 'vocab', 'en-us',
+                                             'test.intent')}])
+        self.assertEqual(manifest['padatious_entities'],
+                         [{'name': 'A:test_ent',
+                           'file_name': join(SKILL_DIR, 'vocab', 'en-us',
+                                             'test_ent.entity')}])
+
+    def test_not_lazy(self):
+        self.skill.add_event('play:query', lambda: None)
+        self.assertFalse(create_manifest(self.skill, 1.5, 'en-us')['lazy'])
+
+    def test_save_and_load(self):
+        manifest = create_manifest(self.skill, 1.5, 'en-us')
+        file_name = join(tempfile.mkdtemp(), 'manifests', 'A.json')
+        save_manifest(file_name, manifest)
+        self.assertEqual(load_manifest(file_name, 1.5, 'en-us'),
+                         json.loads(json.dumps(manifest)))
+        self.assertIsNone(load_manifest(file_name, 2.5, 'en-us'))
+        self.assertIsNone(load_manifest(file_name, 1.5, 'de-de'))
+        self.assertIsNone(load_manifest(file_name + '.missing', 1.5,
+                                        'en-us'))
+
+
+class LazySkillTest(unittest.TestCase):
+    def setUp(self):
+        manifest = create_manifest(create_test_skill(MockBus()), 1.5, 'en-us')
+        self.bus = MockBus()
+        self.handled = []
+        self.loaded = []
+        self.lazy_skill = LazySkill(manifest, SKILL_DIR, 'A', self.bus,
+                                    self.load)
+        self.lazy_skill.register()
+
+    def load(self):
+        skill = create_test_skill(self.bus, self.handled)
+        self.loaded.append(skill)
+        return skill
+
+    def test_register(self):
+        self.assertEqual(self.bus.types(),
+                         ['register_intent', 'padatious:register_entity',
+                          'padatious:register_intent'])
+        self.assertEqual(self.loaded, [])
+
+    def wait_handled(self, count):
+        """ Wait for the handler threads of the skill. """
+        for _ in range(100):
+            if len(self.handled) >= count:
+                break
+            time.sleep(0.01)
+        self.assertEqual(len(self.handled), count)
+
+    def test_load_on_first_event(self):
+        self.bus.emit(Message('A:a', {'utterance': 'test'}))
+        self.assertEqual(len(self.loaded), 1)
+        self.wait_handled(1)
+        # Delivered locally, not sent on the bus again
+        self.assertEqual(self.bus.types().count('A:a'), 1)
+        self.bus.emit(Message('A:a', {'utterance': 'test'}))
+        self.assertEqual(len(self.loaded), 1)
+        self.wait_handled(2)
+
+    def test_load_in_skill_host(self):
+        remote = mock.Mock()
+        self.lazy_skill.loader = lambda: remote
+        message = Message('A:a')
+        self.bus.emit(message)
+        remote.dispatch.assert_called_once_with(message)
+        self.assertEqual(self.bus.types().count('A:a'), 1)
+
+    def test_failed_load(self):
+        self.lazy_skill.loader = lambda: None
+        self.bus.emit(Message('A:a'))
+        self.assertEqual(self.bus.types()[-1], 'detach_skill')
+        self.assertEqual(self.bus.listeners('A:a'), [])
+
+    def test_shutdown(self):
+        self.lazy_skill.default_shutdown()
+        self.bus.emit(Message('A:a'))
+        self.assertEqual(self.loaded, [])
+        self.assertIn('detach_skill', self.bus.types())
@@ -0,0 +1,95 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import sys
+import tempfile
+import unittest
+from os.path import join
+
+import mock
+
+from mycroft.messagebus.message import Message
+from mycroft.skills.padatious_service import PadatiousService
+
+
+class RegisterTest(unittest.TestCase):
+    """ Registration of intent and entity files with a mocked container. """
+
+    def setUp(self):
+        patchers = [
+            mock.patch.dict(sys.modules, {'padatious': mock.Mock()}),
+            mock.patch('mycroft.skills.padatious_service.PadatiousWorker')
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(setattr, PadatiousService, 'instance', None)
+        self.service = PadatiousService(mock.Mock(), mock.Mock())
+        self.container = self.service.container
+        self.dir = tempfile.mkdtemp()
+
+    def write(self, file_name, content):
+        file_name = join(self.dir, file_name)
+        with open(file_name, 'w') as f:
+            f.write(content)
+        return file_name
+
+    def register_intent(self, name, file_name):
+        self.service.register_intent(Message('padatious:register_intent',
+                                             {'name': name,
+                                              'file_name': file_name}))
+
+    def register_entity(self, name, file_name):
+        self.service.register_entity(Message('padatious:register_entity',
+                                             {'name': name,
+                                              'file_name': file_name}))
+
+    def test_unchanged_intent(self):
+        file_name = self.write('hello.intent', 'hello\nhi')
+        self.register_intent('a:hello', file_name)
+        self.container.load_intent.assert_called_once_with('a:hello',
+                                                           file_name)
+        train_time = self.service.train_time
+
+        self.register_intent('a:hello', file_name)
+        self.assertEqual(self.container.load_intent.call_count, 1)
+        self.assertFalse(self.container.remove_intent.called)
+        # No training scheduled for the unchanged file
+        self.assertEqual(self.service.train_time, train_time)
+
+    def test_changed_intent(self):
+        file_name = self.write('hello.intent', 'hello')
+        self.register_intent('a:hello', file_name)
+        self.write('hello.intent', 'hello\nhi')
+        self.register_intent('a:hello', file_name)
+        self.container.remove_intent.assert_called_once_with('a:hello')
+        self.assertEqual(self.container.load_intent.call_args_list,
+                         [mock.call('a:hello', file_name)] * 2)
+
+    def test_entity(self):
+        file_name = self.write('name.entity', 'bob')
+        self.register_entity('a:name', file_name)
+        self.register_entity('a:name', file_name)
+        self.container.load_entity.assert_called_once_with('a:name',
+                                                           file_name)
+        self.assertFalse(self.container.remove_entity.called)
+
+        self.write('name.entity', 'bob\nalice')
+        self.register_entity('a:name', file_name)
+        self.container.remove_entity.assert_called_once_with('a:name')
+        self.assertEqual(self.container.load_entity.call_count, 2)
+
+    def test_missing_file(self):
+        self.register_intent('a:hello', join(self.dir, 'missing.intent'))
+        self.assertFalse(self.container.load_intent.called)
@@ -0,0 +1,171 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import sys
+import tempfile
+import time
+import unittest
+from os import makedirs
+from os.path import join
+from threading import Thread
+
+import mock
+
+from mycroft.messagebus.message import Message
+from mycroft.skills.padatious_service import PadatiousService
+from mycroft.skills.padatious_worker import PadatiousWorker, WorkerError
+
+
+# Fake padatious package, imported by the worker process
+FAKE_PADATIOUS = """
+import time
+
+
+class Objects(object):
+    def __init__(self):
+        self.objects_to_train = []
+
+
+class IntentContainer(object):
+    \"\"\" Matches the lines of the intent files exactly.
+
+    Training intents with a name starting with 'slow' takes half a second
+    and matching the utterance 'hang' takes a second.
+    \"\"\"
+
+    def __init__(self, cache_dir):
+        self.files = {}
+        self.intents = Objects()
+        self.entities = Objects()
+
+    def load_intent(self, name, file_name):
+        self.files[name] = file_name
+        self.intents.objects_to_train.append(name)
+
+    def load_entity(self, name, file_name):
+        self.entities.objects_to_train.append(name)
+
+    def train(self, single_thread=False):
+        if any(name.startswith('slow') for name in self.files):
+            time.sleep(0.5)
+
+    def calc_intent(self, utt):
+        if utt == 'hang':
+            time.sleep(1)
+        for name, file_name in self.files.items():
+            with open(file_name) as f:
+                if utt in f.read().splitlines():
+                    return {'name': name, 'conf': 1.0}
+        return {'name': None, 'conf': 0.0}
+"""
+
+FAKE_MATCH_DATA = """
+def MatchData(name, sent):
+    return {'name': None, 'conf': 0.0}
+"""
+
+
+def install_fake_padatious(test):
+    """ Make the fake padatious importable in test and worker processes. """
+    path = tempfile.mkdtemp()
+    makedirs(join(path, 'padatious'))
+    for file_name, content in (('__init__.py', FAKE_PADATIOUS),
+                               ('match_data.py', FAKE_MATCH_DATA)):
+        with open(join(path, 'padatious', file_name), 'w') as f:
+            f.write(content)
+    # Spawned processes get the sys.path of the parent
+    sys.path.insert(0, path)
+    test.addCleanup(sys.path.remove, path)
+
+
+class PadatiousWorkerTest(unittest.TestCase):
+    def setUp(self):
+        install_fake_padatious(self)
+        self.dir = tempfile.mkdtemp()
+        self.worker = PadatiousWorker(join(self.dir, 'cache'), timeout=10)
+        self.addCleanup(self.worker.shutdown)
+
+    def add_intent(self, name, *lines):
+        file_name = join(self.dir, name + '.intent')
+        with open(file_name, 'w') as f:
+            f.write('\n'.join(lines))
+        self.worker.load_intent(name, file_name)
+
+    def match(self, utt):
+        return self.worker.calc_intent(utt)['name']
+
+    def test_match(self):
+        self.add_intent('a:hello', 'hello')
+        self.assertIsNone(self.match('hello'))  # Not trained yet
+        self.assertEqual(self.worker.train(), 1)
+        self.assertEqual(self.match('hello'), 'a:hello')
+        self.worker.remove_intent('a:hello')
+        self.worker.train()
+        self.assertIsNone(self.match('hello'))
+
+    def test_previous_model_until_trained(self):
+        self.add_intent('a:hello', 'hello')
+        self.worker.train()
+        self.add_intent('slow:goodbye', 'goodbye')
+        training = Thread(target=self.worker.train)
+        training.start()
+        self.assertEqual(self.match('hello'), 'a:hello')
+        self.assertIsNone(self.match('goodbye'))
+        training.join()
+        self.assertEqual(self.match('goodbye'), 'slow:goodbye')
+
+    def test_restart(self):
+        self.add_intent('a:hello', 'hello')
+        self.worker.train()
+        pid = self.worker.process.pid
+        self.worker.process.terminate()
+        self.worker.process.join()
+
+        # Restarted with the registered files, trained in the background
+        for _ in range(50):
+            if self.match('hello') == 'a:hello':
+                break
+            time.sleep(0.1)
+        self.assertEqual(self.match('hello'), 'a:hello')
+        self.assertNotEqual(self.worker.process.pid, pid)
+
+    def test_timeout(self):
+        self.worker.train()
+        self.worker.timeout = 0.3
+        with self.assertRaises(WorkerError):
+            self.worker.calc_intent('hang')
+        self.assertEqual(self.worker.pending, {})
+
+
+class PadatiousServiceErrorTest(unittest.TestCase):
+    def setUp(self):
+        patchers = [
+            mock.patch.dict(sys.modules, {'padatious': mock.Mock()}),
+            mock.patch('mycroft.skills.padatious_service.PadatiousWorker')
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(setattr, PadatiousService, 'instance', None)
+        self.service = PadatiousService(mock.Mock(), mock.Mock())
+        self.service.container.calc_intent.side_effect = WorkerError('hung')
+
+    def test_no_match_on_worker_error(self):
+        self.assertEqual(self.service.match_utterances(['a', 'b']), (None, 0))
+        self.assertEqual(self.service.container.calc_intent.call_count, 1)
+
+    def test_fallback(self):
+        self.service.finished_training_event.set()
+        self.assertFalse(self.service.handle_fallback(
+            Message('intent_failure', {'utterance': 'hello'})))
@@ -0,0 +1,90 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+from os.path import abspath, dirname, join
+from queue import Queue
+
+import mock
+
+from mycroft.messagebus.message import Message
+from mycroft.skills.skill_host import SkillHost, SkillHostTimeout, _Host
+
+SKILL_PATH = abspath(join(dirname(__file__), 'test_skill'))
+
+
+class SkillHostTest(unittest.TestCase):
+    """ Runs skills in a host process without a messagebus service. """
+
+    def setUp(self):
+        self.stopped = Queue()
+        self.host = SkillHost(0, lambda host, skills: self.stopped.put(skills),
+                              timeout=0.5)
+        self.addCleanup(self.host.stop)
+
+    def test_load(self):
+        skill = self.host.load(SKILL_PATH, 'test_skill', 1.0, 'en-us')
+        self.assertEqual(skill.name, 'LoadTestSkill')
+        self.assertFalse(skill.fallback)
+        self.assertTrue(skill.manifest['lazy'])
+        self.assertEqual(list(self.host.skills), ['test_skill'])
+        self.assertFalse(skill.converse(['hello'], 'en-us'))
+
+        skill.default_shutdown()
+        self.assertEqual(self.host.skills, {})
+
+    def test_blacklisted(self):
+        self.assertIsNone(self.host.load(SKILL_PATH, 'test_skill', 1.0,
+                                         'en-us', ['test_skill']))
+
+    def test_crash(self):
+        self.host.load(SKILL_PATH, 'test_skill', 1.0, 'en-us')
+        pid = self.host.process.pid
+        self.host.process.terminate()
+        self.assertEqual(self.stopped.get(timeout=5), ['test_skill'])
+        # The host is started again for the next skill
+        self.assertIsNotNone(self.host.load(SKILL_PATH, 'test_skill', 1.0,
+                                            'en-us'))
+        self.assertNotEqual(self.host.process.pid, pid)
+
+    def test_restart(self):
+        self.host.load(SKILL_PATH, 'test_skill', 1.0, 'en-us')
+        self.assertEqual(self.host.restart(), ['test_skill'])
+        self.assertEqual(self.host.skills, {})
+        self.assertTrue(self.stopped.empty())
+
+    def test_load_timeout(self):
+        self.host.load(SKILL_PATH, 'test_skill', 1.0, 'en-us')
+        with mock.patch.object(self.host, 'call') as call:
+            call.side_effect = SkillHostTimeout('hanging')
+            self.assertIsNone(self.host.load(SKILL_PATH, 'hanging_skill',
+                                             1.0, 'en-us'))
+            self.assertEqual(call.call_args[1],
+                             {'timeout': self.host.load_timeout})
+        # The host is restarted and its other skills are loaded again
+        self.assertEqual(self.stopped.get(timeout=5), ['test_skill'])
+        self.assertEqual(self.host.skills, {})
+        self.assertTrue(self.host.process.is_alive())
+
+
+class HostTest(unittest.TestCase):
+    def test_dispatch(self):
+        bus = mock.Mock()
+        host = _Host(mock.Mock(), bus)
+        frame = Message('a:Intent', {'n': 1}).serialize()
+        host.handle(None, 'dispatch', (frame,))
+        msg_type, message = bus.emitter.emit.call_args[0]
+        self.assertEqual(msg_type, 'a:Intent')
+        self.assertEqual(message.data, {'n': 1})
+        self.assertFalse(bus.emit.called)
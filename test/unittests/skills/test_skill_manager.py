@@ -0,0 +1,176 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import tempfile
+import time
+import unittest
+from os import makedirs
+from os.path import basename, join
+from threading import Event, Lock
+
+import mock
+
+from mycroft.messagebus.message import Message
+from mycroft.skills.lazy_skill import LazySkill
+from mycroft.skills.skill_host import RemoteSkill
+from mycroft.skills.skill_manager import SkillManager
+
+
+def touch(*path):
+    with open(join(*path), 'w') as f:
+        f.write('')
+
+
+class SkillManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.skills_dir = tempfile.mkdtemp()
+        msm = mock.MagicMock()
+        msm.skills_dir = self.skills_dir
+        patcher = mock.patch.object(SkillManager, 'create_msm',
+                                    return_value=msm)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.bus = mock.MagicMock()
+        self.skill_manager = SkillManager(self.bus)
+        self.addCleanup(self.skill_manager.stop)
+
+    def add_skills(self, count):
+        paths = []
+        for i in range(count):
+            path = join(self.skills_dir, 'skill-{}'.format(i))
+            makedirs(path)
+            paths.append(path)
+        return paths
+
+    def run_once(self):
+        """ Run one scan of the skill manager loop. """
+        self.skill_manager._connected_event.set()
+        self.skill_manager._start_watcher = mock.Mock(return_value=None)
+        with mock.patch('mycroft.skills.skill_manager.Configuration') as conf,\
+                mock.patch('mycroft.skills.skill_manager.time.sleep',
+                           side_effect=lambda _: self.skill_manager.stop()):
+            conf.get.return_value = {'skills': {'auto_update': False}}
+            self.skill_manager.run()
+
+    def test_parallel_load(self):
+        paths = self.add_skills(4)
+        active = []
+        lock = Lock()
+
+        def load(path):
+            with lock:
+                active.append(path)
+            time.sleep(0.2)
+            return True
+
+        self.skill_manager._load_or_reload_skill = load
+        start = time.monotonic()
+        self.assertTrue(self.skill_manager._load_skills(paths))
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual(sorted(active), paths)
+
+    def test_initialized_after_first_batch(self):
+        self.add_skills(3)
+        loaded = []
+
+        def load(path):
+            loaded.append(path)
+            # Not emitted before all skills are loaded
+            self.assertFalse(self.bus.emit.called)
+            return True
+
+        self.skill_manager._load_or_reload_skill = load
+        self.run_once()
+        self.assertEqual(len(loaded), 3)
+        message = self.bus.emit.call_args[0][0]
+        self.assertEqual(message.type, 'mycroft.skills.initialized')
+
+    def test_watch_reloads_changed_skills(self):
+        paths = [p + '/' for p in self.add_skills(3)]
+        loaded = []
+        initialized = Event()
+        self.bus.emit.side_effect = lambda m: initialized.set()
+        self.skill_manager._load_or_reload_skill = loaded.append
+        self.skill_manager._start_watcher = mock.Mock()
+        self.skill_manager._connected_event.set()
+        with mock.patch('mycroft.skills.skill_manager.Configuration') as conf:
+            conf.get.return_value = {'skills': {'auto_update': False}}
+            self.skill_manager.start()
+            self.assertTrue(initialized.wait(5))
+            self.assertEqual(sorted(loaded), paths)
+
+            del loaded[:]
+            self.skill_manager._queue_changed([paths[1]])
+            for _ in range(50):
+                if loaded:
+                    break
+                time.sleep(0.1)
+            self.skill_manager.stop()
+            self.skill_manager.join(5)
+        self.assertEqual(loaded, [paths[1]])
+
+    def test_lazy_load(self):
+        path = self.add_skills(1)[0]
+        touch(path, '__init__.py')
+        instance = mock.Mock(events=[('skill-0:Intent', None)],
+                             registered_intents=[], scheduled_repeats=[],
+                             instance_fallback_handlers=[], skill_id='skill-0')
+        instance.name = 'Skill'
+        del instance.dispatch  # Loaded in this process
+        self.skill_manager.lazy_load = True
+        self.skill_manager.manifest_dir = join(self.skills_dir, '.manifests')
+        load_skill = 'mycroft.skills.skill_manager.load_skill'
+        with mock.patch(load_skill, return_value=instance) as load:
+            # The first time the skill is loaded to create the manifest
+            self.assertTrue(self.skill_manager._load_or_reload_skill(path))
+            self.assertEqual(load.call_count, 1)
+
+            # Then it is registered without being loaded
+            self.skill_manager.loaded_skills = {}
+            self.assertTrue(self.skill_manager._load_or_reload_skill(path))
+            self.assertEqual(load.call_count, 1)
+            lazy_skill = self.skill_manager.loaded_skills[path]['instance']
+            self.assertIsInstance(lazy_skill, LazySkill)
+            self.bus.on.assert_any_call('skill-0:Intent',
+                                        lazy_skill.handle_event)
+
+            # Until the first intent arrives
+            message = Message('skill-0:Intent')
+            lazy_skill.handle_event(message)
+            self.assertEqual(load.call_count, 2)
+            self.assertEqual(
+                self.skill_manager.loaded_skills[path]['instance'], instance)
+            self.bus.emitter.emit.assert_called_with('skill-0:Intent',
+                                                     message)
+            self.assertNotIn(mock.call(message), self.bus.emit.call_args_list)
+
+    def test_host_stopped(self):
+        host = mock.Mock()
+        paths = self.add_skills(2)
+        for i, path in enumerate(paths):
+            skill_id = basename(path)
+            self.skill_manager.loaded_skills[path] = {
+                'id': skill_id,
+                'loaded': True,
+                'instance': RemoteSkill(host if i == 0 else mock.Mock(),
+                                        skill_id, {'name': skill_id,
+                                                   'reload_skill': True})
+            }
+        self.skill_manager._host_stopped(host, ['skill-0'])
+        self.assertFalse(self.skill_manager.loaded_skills[paths[0]]['loaded'])
+        self.assertTrue(self.skill_manager.loaded_skills[paths[1]]['loaded'])
+        self.assertEqual(self.skill_manager._take_changed(), {paths[0]})
+        message = self.bus.emit.call_args[0][0]
+        self.assertEqual(message.type, 'detach_skill')
+        self.assertEqual(message.data, {'skill_id': 'skill-0:'})
@@ -0,0 +1,82 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import shutil
+import tempfile
+import unittest
+from os import makedirs
+from os.path import join
+from queue import Queue, Empty
+
+from mycroft.skills.skill_watcher import Inotify, SkillWatcher
+
+try:
+    Inotify().close()
+    HAS_INOTIFY = True
+except OSError:
+    HAS_INOTIFY = False
+
+
+def touch(*path):
+    with open(join(*path), 'w') as f:
+        f.write('')
+
+
+@unittest.skipUnless(HAS_INOTIFY, 'inotify is not available')
+class SkillWatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.skills_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.skills_dir)
+        self.skill = join(self.skills_dir, 'skill-a')
+        makedirs(join(self.skill, 'vocab', 'en-us'))
+        makedirs(join(self.skill, '.git'))
+        self.changes = Queue()
+        self.watcher = SkillWatcher(self.skills_dir, self.changes.put,
+                                    debounce=0.2)
+        self.watcher.start()
+        self.addCleanup(self.watcher.join)
+        self.addCleanup(self.watcher.stop)
+
+    def assertChanged(self, skill_dirs):
+        self.assertEqual(self.changes.get(timeout=5), set(skill_dirs))
+
+    def assertUnchanged(self):
+        with self.assertRaises(Empty):
+            self.changes.get(timeout=0.5)
+
+    def test_debounce(self):
+        touch(self.skill, '__init__.py')
+        touch(self.skill, 'vocab', 'en-us', 'Hello.voc')
+        self.assertChanged([self.skill])
+        self.assertUnchanged()
+
+    def test_ignored_files(self):
+        touch(self.skill, 'settings.json')
+        touch(self.skill, 'skill.pyc')
+        touch(self.skill, '.git', 'index')
+        self.assertUnchanged()
+
+    def test_new_skill(self):
+        skill_b = join(self.skills_dir, 'skill-b')
+        makedirs(skill_b)
+        self.assertChanged([skill_b])
+        # The directories of the new skill are watched
+        makedirs(join(skill_b, 'dialog'))
+        self.assertChanged([skill_b])
+        touch(skill_b, 'dialog', 'hello.dialog')
+        self.assertChanged([skill_b])
+
+    def test_removed_skill(self):
+        shutil.rmtree(self.skill)
+        self.assertChanged([self.skill])